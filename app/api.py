@@ -1,7 +1,8 @@
 import os
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
 from starlette.middleware.sessions import SessionMiddleware
 from starlette.staticfiles import StaticFiles
 
@@ -12,6 +13,7 @@ from routes.managers import router as managers_router
 from routes.ui_api import router as ui_api_router
 from routes.ui_pages import router as ui_pages_router
 from routes.users import router as users_router
+from services.rpc_client import ScoringError
 
 app = FastAPI(title="Credit Scoring API")
 
@@ -29,3 +31,19 @@ app.include_router(clients_router)
 app.include_router(managers_router)
 
 
+@app.exception_handler(ScoringError)
+async def scoring_error_handler(_req: Request, exc: ScoringError) -> JSONResponse:
+    """ml-worker failures as structured errors: 422 bad request, 503 + Retry-After when a retry may help."""
+    if exc.code == "invalid_request":
+        status, headers = 422, None
+    elif exc.retryable:
+        status, headers = 503, {"Retry-After": "1"}
+    else:
+        status, headers = 500, None
+    return JSONResponse(
+        status_code=status,
+        content={"detail": str(exc), "code": exc.code, "retryable": exc.retryable},
+        headers=headers,
+    )
+
+
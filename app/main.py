@@ -6,9 +6,23 @@ So this script must exit with code 0 to allow uvicorn to start.
 """
 
 
+from loguru import logger
+from sqlmodel import Session
+
+from database.database import get_database_engine, init_db
+from models import client, credit, manager, scoring, user  # noqa: F401 - register all tables for create_all
+from services.crud.scoring import backfill_latest_scores
+
+
 def main() -> None:
     # Place for migrations / warmups if needed.
-    return
+    # init_db is idempotent: create_all adds new tables, upgrade_schema adds columns and indexes
+    # introduced after the DB was first created (create_all alone never alters existing tables).
+    init_db()
+    with Session(get_database_engine()) as session:
+        created = backfill_latest_scores(session)
+    if created:
+        logger.info(f"Backfilled LatestScore for {created} clients")
 
 
 if __name__ == "__main__":
@@ -8,7 +8,41 @@ class Settings(BaseSettings):
     RABBITMQ_PASSWORD: Optional[str] = None
     RABBITMQ_HOST: Optional[str] = None
     RABBITMQ_PORT: Optional[int] = None
-        
+
+    # Micro-batching: prefetch up to ML_BATCH_SIZE messages and score them in one
+    # predict_proba call; a partial batch is flushed after ML_BATCH_WAIT_MS.
+    # ML_BATCH_SIZE=1 keeps the classic one-message-at-a-time behaviour.
+    ML_BATCH_SIZE: int = 1
+    ML_BATCH_WAIT_MS: int = 10
+
+    # Process pool (python -m ml_worker.pool): number of forked consumers, 0 = one per CPU.
+    ML_WORKERS: int = 1
+    ML_SHUTDOWN_TIMEOUT_S: float = 30.0
+
+    # Priority lanes: ml_scoring_queue (interactive) and ml_scoring_bulk_queue (batch jobs).
+    # While both have messages waiting, ML_INTERACTIVE_WEIGHT interactive batches are scored per
+    # bulk batch. Per-lane depth/wait/latency is logged every ML_LANE_STATS_INTERVAL_S (0 = off).
+    ML_INTERACTIVE_WEIGHT: int = 9
+    ML_LANE_STATS_INTERVAL_S: float = 60.0
+
+    # Delivery: a request that failed transiently (model_error) is retried up to ML_MAX_RETRIES
+    # times through delay queues (ML_RETRY_BACKOFF_MS, doubling per attempt), then answered with
+    # a retries_exhausted error. Final replies are remembered by request id (ML_IDEMPOTENCY_CACHE
+    # entries), so a redelivered request is answered without scoring it again.
+    ML_MAX_RETRIES: int = 3
+    ML_RETRY_BACKOFF_MS: int = 500
+    ML_IDEMPOTENCY_CACHE: int = 10_000
+
+    # Model hot reload: model.cbm is checked every ML_MODEL_POLL_S seconds (0 = only on SIGHUP).
+    ML_MODEL_POLL_S: float = 5.0
+
+    # Shadow scoring: a challenger model scores the same batches in the background and its
+    # predictions are logged next to the champion's to ML_SHADOW_DB_PATH (SQLite). Empty path = off.
+    # At most ML_SHADOW_QUEUE batches wait for the challenger; more are dropped.
+    ML_CHALLENGER_MODEL_PATH: str = ""
+    ML_SHADOW_DB_PATH: str = "shadow_scores.sqlite"
+    ML_SHADOW_QUEUE: int = 64
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -20,6 +54,22 @@ class Settings(BaseSettings):
         """Validate critical configuration settings"""
         if not all([self.RABBITMQ_USER, self.RABBITMQ_PASSWORD, self.RABBITMQ_HOST, self.RABBITMQ_PORT]):
             raise ValueError("Missing required database configuration")
+        if self.ML_BATCH_SIZE < 1:
+            raise ValueError("ML_BATCH_SIZE must be >= 1")
+        if self.ML_BATCH_WAIT_MS < 0:
+            raise ValueError("ML_BATCH_WAIT_MS must be >= 0")
+        if self.ML_WORKERS < 0:
+            raise ValueError("ML_WORKERS must be >= 0")
+        if self.ML_MODEL_POLL_S < 0:
+            raise ValueError("ML_MODEL_POLL_S must be >= 0")
+        if self.ML_INTERACTIVE_WEIGHT < 1:
+            raise ValueError("ML_INTERACTIVE_WEIGHT must be >= 1")
+        if self.ML_MAX_RETRIES < 0:
+            raise ValueError("ML_MAX_RETRIES must be >= 0")
+        if self.ML_RETRY_BACKOFF_MS < 1:
+            raise ValueError("ML_RETRY_BACKOFF_MS must be >= 1")
+        if self.ML_SHADOW_QUEUE < 1:
+            raise ValueError("ML_SHADOW_QUEUE must be >= 1")
 
 @lru_cache()
 def get_settings() -> Settings:
@@ -0,0 +1,82 @@
+import threading
+from collections import OrderedDict
+
+# Failed requests (bad payload, retries exhausted) are parked here for inspection.
+DEAD_LETTER_QUEUE = "ml_scoring_dead"
+DEAD_LETTER_TTL_MS = 24 * 3600 * 1000
+DEAD_LETTER_MAX_LENGTH = 10_000
+
+# Header with the number of retries a request has already been through.
+RETRIES_HEADER = "x-retries"
+
+
+def retry_queue_name(queue_name: str, attempt: int) -> str:
+    return f"{queue_name}.retry.{attempt}"
+
+
+def retry_backoff_ms(base_ms: int, attempt: int) -> int:
+    """Exponential backoff: base, 2*base, 4*base, ..."""
+    return base_ms * 2 ** (attempt - 1)
+
+
+def declare_topology(channel, queue_names, *, max_retries: int, backoff_ms: int) -> None:
+    """
+    Work queues plus, for each of them, one delay queue per retry attempt.
+
+    A request that failed transiently is published to `<queue>.retry.<n>`. That queue has no
+    consumers: its x-message-ttl is the n-th backoff step, after which RabbitMQ dead-letters
+    the message (x-dead-letter-exchange "" = default exchange) back to `<queue>`. One queue per
+    attempt keeps every message in a queue with a single TTL, so expiry is never stuck behind
+    a message with a longer delay.
+    """
+    for queue_name in queue_names:
+        channel.queue_declare(queue=queue_name, durable=False)
+        for attempt in range(1, max_retries + 1):
+            channel.queue_declare(
+                queue=retry_queue_name(queue_name, attempt),
+                durable=False,
+                arguments={
+                    "x-message-ttl": retry_backoff_ms(backoff_ms, attempt),
+                    "x-dead-letter-exchange": "",
+                    "x-dead-letter-routing-key": queue_name,
+                },
+            )
+    channel.queue_declare(
+        queue=DEAD_LETTER_QUEUE,
+        durable=False,
+        arguments={"x-message-ttl": DEAD_LETTER_TTL_MS, "x-max-length": DEAD_LETTER_MAX_LENGTH},
+    )
+
+
+class ReplyCache:
+    """
+    Final replies by request id (AMQP message_id), most recent `maxsize`.
+
+    A redelivered or re-sent request with a known id is answered from here instead of
+    being scored again.
+    """
+
+    def __init__(self, maxsize: int = 10_000) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+
+    def get(self, request_id: str | None) -> dict | None:
+        if not request_id or self.maxsize <= 0:
+            return None
+        with self._lock:
+            reply = self._data.get(request_id)
+            if reply is not None:
+                self._data.move_to_end(request_id)
+                self.hits += 1
+            return reply
+
+    def put(self, request_id: str | None, reply: dict) -> None:
+        if not request_id or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[request_id] = reply
+            self._data.move_to_end(request_id)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
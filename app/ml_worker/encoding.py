@@ -0,0 +1,56 @@
+from typing import Any, Iterable
+
+import numpy as np
+from catboost import CatBoostClassifier, Pool
+
+
+class FeatureEncoder:
+    """
+    Turns request feature dicts straight into a catboost.Pool, bypassing pandas.
+
+    Column order and categorical indices are resolved once (from the loaded model),
+    rows are written into a reusable object buffer that grows to the largest batch seen.
+    Pool copies the data, so the buffer is safe to reuse right after encode() returns.
+    An encoder instance is not thread-safe: use one per consumer.
+    """
+
+    def __init__(self, columns: Iterable[str], cat_features: Iterable[int], capacity: int = 1) -> None:
+        self.columns = list(columns)
+        self.cat_features = sorted(int(i) for i in cat_features)
+        self._num_features = [j for j in range(len(self.columns)) if j not in set(self.cat_features)]
+        self._buffer = np.empty((max(1, capacity), len(self.columns)), dtype=object)
+
+    @classmethod
+    def from_model(
+        cls,
+        model: CatBoostClassifier,
+        fallback_columns: Iterable[str],
+        capacity: int = 1,
+    ) -> "FeatureEncoder":
+        # Prefer model-declared order (feature_names_), fallback to the expected API order.
+        columns = list(getattr(model, "feature_names_", []) or []) or list(fallback_columns)
+        return cls(columns, model.get_cat_feature_indices(), capacity=capacity)
+
+    def encode(self, rows: list[dict[str, Any]]) -> Pool:
+        n = len(rows)
+        if n > self._buffer.shape[0]:
+            self._buffer = np.empty((n, len(self.columns)), dtype=object)
+        buf = self._buffer[:n]
+
+        columns = self.columns
+        for i, features in enumerate(rows):
+            values = [features.get(c) for c in columns]
+            if None in values:
+                self._fill_missing(values)
+            buf[i] = values
+        return Pool(buf, cat_features=self.cat_features, feature_names=columns)
+
+    def _fill_missing(self, values: list[Any]) -> None:
+        # Missing numeric values become NaN (CatBoost treats them as missing);
+        # categorical features have no such notion, so a missing one is a request error.
+        for j in self.cat_features:
+            if values[j] is None:
+                raise ValueError(f"Categorical feature {self.columns[j]!r} is missing")
+        for j in self._num_features:
+            if values[j] is None:
+                values[j] = np.nan
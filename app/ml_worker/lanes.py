@@ -0,0 +1,73 @@
+import threading
+from collections import deque
+from typing import Any
+
+
+class LaneScheduler:
+    """
+    Per-lane buffers of prefetched messages and the choice of the next batch.
+
+    A batch is taken from a single lane. Among the lanes that have messages waiting, lanes are
+    picked by smooth weighted round-robin: with weights {"interactive": 9, "bulk": 1} and both
+    lanes busy, nine interactive batches go out for every bulk batch, so interactive traffic is
+    served first while a saturating bulk job still makes progress. An idle lane does not bank
+    credit, and a lane that is alone gets every batch. Ties go to the lane listed first.
+    """
+
+    def __init__(self, weights: dict[str, int]) -> None:
+        self.weights = dict(weights)
+        self._queues: dict[str, deque] = {lane: deque() for lane in weights}
+        self._credit = {lane: 0 for lane in weights}
+
+    def push(self, lane: str, item: Any) -> None:
+        self._queues[lane].append(item)
+
+    def size(self, lane: str) -> int:
+        return len(self._queues[lane])
+
+    def __len__(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def next_batch(self, max_items: int) -> tuple[str, list] | None:
+        ready = [lane for lane, q in self._queues.items() if q]
+        if not ready:
+            return None
+        total = sum(self.weights[lane] for lane in ready)
+        for lane in self._credit:
+            self._credit[lane] = self._credit[lane] + self.weights[lane] if lane in ready else 0
+        lane = max(ready, key=lambda name: self._credit[name])
+        self._credit[lane] -= total
+        q = self._queues[lane]
+        return lane, [q.popleft() for _ in range(min(max_items, len(q)))]
+
+
+class LaneStats:
+    """Queue wait (publish -> batch start) and end-to-end latency of one lane, in ms, over the last `window` messages."""
+
+    def __init__(self, window: int = 1000) -> None:
+        self._lock = threading.Lock()
+        self._waits: deque[float] = deque(maxlen=window)
+        self._latencies: deque[float] = deque(maxlen=window)
+        self.processed = 0
+
+    def record(self, wait_s: float, latency_s: float) -> None:
+        with self._lock:
+            self._waits.append(wait_s)
+            self._latencies.append(latency_s)
+            self.processed += 1
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            waits, latencies, processed = sorted(self._waits), sorted(self._latencies), self.processed
+
+        def pct(values: list[float], p: float) -> float:
+            return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else 0.0
+
+        return {
+            "processed": processed,
+            "wait_ms_p50": pct(waits, 0.50),
+            "wait_ms_p99": pct(waits, 0.99),
+            "latency_ms_p50": pct(latencies, 0.50),
+            "latency_ms_p95": pct(latencies, 0.95),
+            "latency_ms_p99": pct(latencies, 0.99),
+        }
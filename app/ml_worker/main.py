@@ -1,90 +1,76 @@
+import functools
 import json
+import signal
 import sys
+import threading
 import time
 from pathlib import Path
 
-import pandas as pd
 import pika
-from catboost import CatBoostClassifier
 from loguru import logger
 
 from ml_worker.config import get_settings
+from ml_worker.delivery import (
+    DEAD_LETTER_QUEUE,
+    RETRIES_HEADER,
+    ReplyCache,
+    declare_topology,
+    retry_backoff_ms,
+    retry_queue_name,
+)
+from ml_worker.lanes import LaneScheduler, LaneStats
+from ml_worker.registry import LoadedModel, ModelRegistry
+from ml_worker.scoring import EXPECTED_FEATURES, error_result, predict_batch, score_payloads, score_request
+from ml_worker.shadow import ShadowScorer, ShadowStore
 
 # Logging
 logger.remove()
 logger.add(sys.stderr, level="INFO")
 
 QUEUE_NAME = "ml_scoring_queue"
+BULK_QUEUE_NAME = "ml_scoring_bulk_queue"
+# Lane -> queue, in priority order (same names as services.rpc_client.LANE_QUEUES).
+LANE_QUEUES = {"interactive": QUEUE_NAME, "bulk": BULK_QUEUE_NAME}
 MODEL_PATH = Path(__file__).resolve().parent / "model.cbm"
 
-EXPECTED_FEATURES = [
-    "code_gender",
-    "flag_own_car",
-    "flag_own_realty",
-    "cnt_children",
-    "amt_income_total",
-    "name_income_type",
-    "name_education_type",
-    "name_family_status",
-    "name_housing_type",
-    "days_birth",
-    "days_employed",
-    "flag_work_phone",
-    "flag_phone",
-    "flag_email",
-    "occupation_type",
-    "cnt_fam_members",
-    "age_group",
-    "days_employed_bin",
-]
-
-def _load_model() -> CatBoostClassifier:
-    if not MODEL_PATH.exists():
-        raise FileNotFoundError(
-            f"CatBoost model file not found at {MODEL_PATH}. "
-            f"Put your .cbm model there (e.g. model.cbm)."
-        )
-    model = CatBoostClassifier()
-    model.load_model(str(MODEL_PATH))
-    return model
+# Loaded once here (before ml_worker.pool forks), hot-swapped later by the watcher thread.
+models = ModelRegistry(MODEL_PATH, EXPECTED_FEATURES)
+logger.info(f"Model {models.current.version} expects {len(models.current.encoder.columns)} features: "
+            f"{models.current.encoder.columns}")
 
 
-model = _load_model()
-MODEL_FEATURES = list(getattr(model, "feature_names_", []) or [])
-if MODEL_FEATURES:
-    logger.info(f"Model expects {len(MODEL_FEATURES)} features: {MODEL_FEATURES}")
-else:
-    logger.warning("Model has no feature_names_; will use EXPECTED_FEATURES order.")
+def _predict_batch(payloads: list[dict], loaded: LoadedModel | None = None) -> list[dict]:
+    return predict_batch(payloads, loaded or models.current)
 
 
-def _predict(payload: dict) -> dict:
-    """
-    Expected request payload:
-      {
-        "client_id": 123,              # optional, echoed back
-        "features": { "f1": 1, ... }   # required
-      }
-    Response:
-      { "client_id": 123, "proba": 0.42, "pred": 0, "status": "success" }
-    """
-    features = payload.get("features") or {}
-    if not isinstance(features, dict):
-        raise TypeError("payload.features must be a dict")
+def _predict(payload: dict, loaded: LoadedModel | None = None) -> dict:
+    return _predict_batch([payload], loaded)[0]
 
-    # Prefer model-declared order (feature_names_), fallback to the expected API order.
-    columns = MODEL_FEATURES if MODEL_FEATURES else EXPECTED_FEATURES
-    row = {c: features.get(c) for c in columns}
-    df = pd.DataFrame([row], columns=columns)
 
-    proba = float(model.predict_proba(df)[0][1])
-    pred = int(proba >= 0.5)
+def _score_messages(bodies: list[bytes]) -> list[dict]:
+    """
+    Decode and score a batch of raw message bodies (request/response formats: see
+    ml_worker.scoring.score_request). Single requests of the whole batch go through one
+    predict_proba call. The batch is scored by the model that is current when it starts,
+    and every reply names that model's version.
+    """
+    loaded = models.current
+    results: list[dict | None] = [None] * len(bodies)
+    singles: list[tuple[int, dict]] = []
+    for i, body in enumerate(bodies):
+        try:
+            payload = json.loads(body)
+        except Exception as e:
+            results[i] = error_result(None, e, loaded.version)
+            continue
+        if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+            results[i] = score_request(payload, loaded)
+        else:
+            singles.append((i, payload))
 
-    return {
-        "client_id": payload.get("client_id"),
-        "proba": proba,
-        "pred": pred,
-        "status": "success",
-    }
+    for (i, _), result in zip(singles, score_payloads([p for _, p in singles], loaded)):
+        results[i] = result
+    return results
 
 
 def main() -> None:
@@ -104,7 +90,32 @@ def main() -> None:
     )
 
     channel = connection.channel()
-    channel.queue_declare(queue=QUEUE_NAME, durable=False)
+    declare_topology(
+        channel,
+        LANE_QUEUES.values(),
+        max_retries=settings.ML_MAX_RETRIES,
+        backoff_ms=settings.ML_RETRY_BACKOFF_MS,
+    )
+
+    batch_size = settings.ML_BATCH_SIZE
+    batch_wait_s = settings.ML_BATCH_WAIT_MS / 1000.0
+    pending = LaneScheduler({"interactive": settings.ML_INTERACTIVE_WEIGHT, "bulk": 1})
+    lane_stats = {lane: LaneStats() for lane in LANE_QUEUES}
+    replies = ReplyCache(settings.ML_IDEMPOTENCY_CACHE)
+    expired = 0
+    flush_timer = None
+
+    stop_watching = threading.Event()
+    models.watch(settings.ML_MODEL_POLL_S, stop_watching)
+    challenger: ModelRegistry | None = None
+    shadow: ShadowScorer | None = None
+    if settings.ML_CHALLENGER_MODEL_PATH:
+        challenger = ModelRegistry(Path(settings.ML_CHALLENGER_MODEL_PATH), EXPECTED_FEATURES)
+        challenger.watch(settings.ML_MODEL_POLL_S, stop_watching)
+        shadow = ShadowScorer(
+            challenger, ShadowStore(Path(settings.ML_SHADOW_DB_PATH)), max_queue=settings.ML_SHADOW_QUEUE
+        )
+        logger.info(f"Shadow scoring with challenger {challenger.current.version} -> {settings.ML_SHADOW_DB_PATH}")
 
     def send_result(result_data: dict, properties: pika.BasicProperties) -> None:
         channel.basic_publish(
@@ -114,29 +125,166 @@ def main() -> None:
             properties=pika.BasicProperties(correlation_id=properties.correlation_id),
         )
 
-    def on_request(ch, method, properties, body) -> None:
-        started = time.time()
+    def republish(queue_name: str, body: bytes, properties: pika.BasicProperties, **headers) -> None:
+        channel.basic_publish(
+            exchange="",
+            routing_key=queue_name,
+            body=body,
+            properties=pika.BasicProperties(
+                reply_to=properties.reply_to,
+                correlation_id=properties.correlation_id,
+                message_id=properties.message_id,
+                headers={**(properties.headers or {}), **headers},
+            ),
+        )
+
+    def try_retry(lane: str, body: bytes, properties: pika.BasicProperties, now: float) -> int | None:
+        """Send a transiently failed request to its next delay queue; returns the attempt, None if exhausted."""
+        headers = properties.headers or {}
+        attempt = int(headers.get(RETRIES_HEADER, 0)) + 1
+        deadline_ms = headers.get("deadline_ms")
+        backoff_ms = retry_backoff_ms(settings.ML_RETRY_BACKOFF_MS, attempt)
+        if attempt > settings.ML_MAX_RETRIES:
+            return None
+        if isinstance(deadline_ms, int) and now * 1000 + backoff_ms >= deadline_ms:
+            # The caller would have given up before the retry runs.
+            return None
         try:
-            payload = json.loads(body)
-            result = _predict(payload)
-            result["processing_time"] = time.time() - started
-            send_result(result, properties)
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+            republish(retry_queue_name(LANE_QUEUES[lane], attempt), body, properties, **{RETRIES_HEADER: attempt})
         except Exception as e:
-            logger.exception(f"ml_worker error: {e}")
+            logger.exception(f"ml_worker retry publish error: {e}")
+            return None
+        return attempt
+
+    def flush() -> None:
+        """Score one batch (see LaneScheduler for which lane it comes from)."""
+        nonlocal flush_timer
+        if flush_timer is not None:
+            connection.remove_timeout(flush_timer)
+            flush_timer = None
+        picked = pending.next_batch(batch_size)
+        if picked is None:
+            return
+        lane, batch = picked
+
+        batch_started = time.time()
+        bodies = [body for _, _, body, _ in batch]
+        results = _score_messages(bodies)
+        finished = time.time()
+        for (method, properties, body, started), result in zip(batch, results):
+            result["processing_time"] = finished - started
+            sent_at_ms = (properties.headers or {}).get("sent_at_ms")
+            sent_at = sent_at_ms / 1000.0 if isinstance(sent_at_ms, int) else started
+            lane_stats[lane].record(batch_started - sent_at, finished - sent_at)
+            failed = result.get("status") != "success"
+            if failed and result.get("retryable"):
+                attempt = try_retry(lane, body, properties, finished)
+                if attempt is not None:
+                    logger.warning(f"ml_worker retry {attempt}/{settings.ML_MAX_RETRIES}: {result.get('error')}")
+                    channel.basic_ack(delivery_tag=method.delivery_tag)
+                    continue
+                result["code"] = "retries_exhausted"
+                result["retries"] = int((properties.headers or {}).get(RETRIES_HEADER, 0))
+            try:
+                send_result(result, properties)
+            except Exception as e:
+                logger.exception(f"ml_worker reply error: {e}")
+            if not (failed and result.get("retryable")):
+                # Final answer: a redelivery of the same request gets it again without rescoring.
+                replies.put(properties.message_id, result)
+            if failed:
+                try:
+                    republish(DEAD_LETTER_QUEUE, body, properties, **{"x-code": result.get("code"),
+                                                                     "x-error": str(result.get("error"))[:500]})
+                except Exception as e:
+                    logger.exception(f"ml_worker dead-letter publish error: {e}")
+            # Every message is answered, retried or parked, so it is always acked (one by one,
+            # so one failure does not take the whole batch with it).
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+        if shadow is not None:
+            # After the replies are out: the challenger never delays the champion.
+            shadow.submit(bodies, results)
+        if len(batch) > 1:
+            logger.debug(f"ml_worker scored {lane} batch of {len(batch)} messages")
+        if len(pending) and flush_timer is None:
+            # The rest has already waited for this batch; let new deliveries in, then go on.
+            flush_timer = connection.call_later(0, on_timer)
+
+    def on_timer() -> None:
+        nonlocal flush_timer
+        flush_timer = None
+        flush()
+
+    def on_request(lane: str, ch, method, properties, body) -> None:
+        nonlocal flush_timer, expired
+        received = time.time()
+        deadline_ms = (properties.headers or {}).get("deadline_ms")
+        if isinstance(deadline_ms, int) and deadline_ms < received * 1000:
+            # The caller has already given up waiting: do not spend model time on it.
+            expired += 1
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        cached = replies.get(properties.message_id)
+        if cached is not None:
+            send_result({**cached, "duplicate": True}, properties)
+            channel.basic_ack(delivery_tag=method.delivery_tag)
+            return
+        pending.push(lane, (method, properties, body, received))
+        if pending.size(lane) >= batch_size:
+            flush()
+        elif flush_timer is None:
+            flush_timer = connection.call_later(batch_wait_s, on_timer)
+
+    def log_lane_stats() -> None:
+        for lane, queue_name in LANE_QUEUES.items():
             try:
-                send_result(
-                    {"status": "error", "error": str(e), "processing_time": time.time() - started},
-                    properties,
-                )
-            except Exception:
-                pass
-            ch.basic_nack(delivery_tag=method.delivery_tag, requeue=False)
-
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(queue=QUEUE_NAME, on_message_callback=on_request, auto_ack=False)
+                depth = channel.queue_declare(queue=queue_name, passive=True).method.message_count
+            except Exception as e:
+                logger.warning(f"ml_worker cannot read depth of {queue_name}: {e}")
+                depth = None
+            logger.info(f"ml_worker lane {lane}: queued={depth} prefetched={pending.size(lane)} "
+                        f"{lane_stats[lane].stats()}")
+        logger.info(f"ml_worker delivery: expired={expired} duplicate_replies={replies.hits}")
+        connection.call_later(settings.ML_LANE_STATS_INTERVAL_S, log_lane_stats)
+
+    def on_sigterm(signum, _frame) -> None:
+        logger.info(f"ml_worker got signal {signum}, stopping consumer")
+        connection.add_callback_threadsafe(channel.stop_consuming)
+
+    def on_sighup(_signum, _frame) -> None:
+        # Reload the model files now instead of waiting for the next poll.
+        models.wake.set()
+        if challenger is not None:
+            challenger.wake.set()
+
+    signal.signal(signal.SIGTERM, on_sigterm)
+    signal.signal(signal.SIGHUP, on_sighup)
+
+    # Per-consumer prefetch: an interactive message never waits behind a full bulk prefetch window.
+    channel.basic_qos(prefetch_count=batch_size)
+    for lane, queue_name in LANE_QUEUES.items():
+        channel.basic_consume(
+            queue=queue_name, on_message_callback=functools.partial(on_request, lane), auto_ack=False
+        )
+    if settings.ML_LANE_STATS_INTERVAL_S > 0:
+        connection.call_later(settings.ML_LANE_STATS_INTERVAL_S, log_lane_stats)
+    logger.info(
+        f"ml_worker consuming {list(LANE_QUEUES.values())} (batch_size={batch_size}, wait={batch_wait_s}s, "
+        f"interactive_weight={settings.ML_INTERACTIVE_WEIGHT}, model={models.current.version})"
+    )
     channel.start_consuming()
 
+    # Graceful shutdown: answer whatever is already prefetched, then close.
+    while len(pending):
+        flush()
+    stop_watching.set()
+    models.wake.set()
+    if challenger is not None:
+        challenger.wake.set()
+    if shadow is not None:
+        shadow.close()
+    connection.close()
+
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,121 @@
+"""
+Process pool supervisor for ml_worker.
+
+    python -m ml_worker.pool
+
+The CatBoost model is loaded once in the supervisor (importing ml_worker.main does that)
+and then ML_WORKERS consumers are forked from it, so the model pages are shared
+copy-on-write instead of being loaded K times. Each child opens its own RabbitMQ
+connection/channel. Crashed children are restarted; SIGTERM/SIGINT are forwarded to the
+children, which finish their current batch and exit. SIGHUP is forwarded too and makes
+every child reload model.cbm right away (each child also polls the file on its own).
+"""
+import os
+import signal
+import sys
+import time
+from typing import Callable
+
+from loguru import logger
+
+from ml_worker import main as worker
+from ml_worker.config import get_settings
+
+RESTART_DELAY_S = 1.0
+POLL_INTERVAL_S = 0.2
+
+
+def _spawn(target: Callable[[], None]) -> int:
+    pid = os.fork()
+    if pid != 0:
+        return pid
+
+    # Child: default signal handling; the consumer installs its own SIGTERM handler.
+    # SIGHUP is ignored until then: a reload forwarded while the child is still connecting
+    # must not kill it (SIG_DFL would terminate it).
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    code = 0
+    try:
+        target()
+    except Exception as e:
+        logger.exception(f"ml_worker pid={os.getpid()} crashed: {e}")
+        code = 1
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def supervise(workers: int, target: Callable[[], None], *, shutdown_timeout_s: float = 30.0) -> None:
+    """
+    Keep `workers` forked copies of `target` running until SIGTERM/SIGINT.
+    """
+    children: dict[int, int] = {}  # pid -> slot
+    stopping = False
+    deadline = 0.0
+
+    def on_signal(signum, _frame) -> None:
+        nonlocal stopping, deadline
+        if stopping:
+            return
+        stopping = True
+        deadline = time.monotonic() + shutdown_timeout_s
+        logger.info(f"ml_worker pool got signal {signum}, stopping {len(children)} workers")
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def on_sighup(_signum, _frame) -> None:
+        # Model reload request: every child swaps its own model.
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGHUP)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGHUP, on_sighup)
+
+    for slot in range(workers):
+        children[_spawn(target)] = slot
+    logger.info(f"ml_worker pool started {workers} workers: {sorted(children)}")
+
+    while children:
+        pid, status = os.waitpid(-1, os.WNOHANG)
+        if pid == 0:
+            if stopping and time.monotonic() > deadline:
+                logger.warning(f"ml_worker pool: killing {len(children)} workers after {shutdown_timeout_s}s")
+                for child in list(children):
+                    try:
+                        os.kill(child, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+                deadline = float("inf")
+            time.sleep(POLL_INTERVAL_S)
+            continue
+
+        slot = children.pop(pid, None)
+        if slot is None or stopping:
+            continue
+        code = os.waitstatus_to_exitcode(status)
+        logger.warning(f"ml_worker pid={pid} (slot {slot}) exited with code {code}; restarting")
+        time.sleep(RESTART_DELAY_S)
+        if not stopping:
+            children[_spawn(target)] = slot
+
+    logger.info("ml_worker pool stopped")
+
+
+def main() -> None:
+    settings = get_settings()
+    workers = settings.ML_WORKERS or os.cpu_count() or 1
+    supervise(workers, worker.main, shutdown_timeout_s=settings.ML_SHUTDOWN_TIMEOUT_S)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import hashlib
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable
+
+from catboost import CatBoostClassifier
+from loguru import logger
+
+from ml_worker.encoding import FeatureEncoder
+
+
+def model_version(blob: bytes) -> str:
+    """Short content hash of a model file (same scheme as services.prediction_cache.model_version)."""
+    return hashlib.sha256(blob).hexdigest()[:12]
+
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """A validated, warmed-up model together with the encoder built for it."""
+
+    model: CatBoostClassifier
+    encoder: FeatureEncoder
+    version: str
+    loaded_at: float = field(default_factory=time.time)
+
+
+def _smoke_row(encoder: FeatureEncoder) -> dict:
+    cat = set(encoder.cat_features)
+    return {name: ("" if j in cat else 0.0) for j, name in enumerate(encoder.columns)}
+
+
+def load_model(path: Path, allowed_features: Iterable[str]) -> LoadedModel:
+    """
+    Load, validate and warm up a model file. Raises if the file is missing or unusable,
+    e.g. half-copied, or expecting features the API does not send.
+    """
+    if not path.exists():
+        raise FileNotFoundError(
+            f"CatBoost model file not found at {path}. "
+            f"Put your .cbm model there (e.g. model.cbm)."
+        )
+    # Hash and model come from the same bytes even if the file is being replaced meanwhile.
+    blob = path.read_bytes()
+    model = CatBoostClassifier()
+    model.load_model(blob=blob)
+
+    allowed = list(allowed_features)
+    encoder = FeatureEncoder.from_model(model, allowed)
+    unknown = sorted(set(encoder.columns) - set(allowed))
+    if unknown:
+        raise ValueError(f"Model expects features the API does not send: {unknown}")
+
+    # Smoke prediction: validates the model end to end and pays the first-call cost here,
+    # not on the first real request.
+    proba = model.predict_proba(encoder.encode([_smoke_row(encoder)]))
+    if proba.shape != (1, 2) or not all(0.0 <= p <= 1.0 and math.isfinite(p) for p in proba[0]):
+        raise ValueError(f"Model smoke prediction is invalid: {proba!r}")
+    return LoadedModel(model=model, encoder=encoder, version=model_version(blob))
+
+
+class ModelRegistry:
+    """
+    Holds the active model of a worker process and hot-swaps it.
+
+    reload() runs on the watcher thread: the new file is loaded, validated and warmed up
+    there, and only then published by a single reference assignment. The consume thread
+    reads `current` once per batch, so a batch is always scored by one consistent
+    model/encoder pair and in-flight messages are never dropped. A file that fails to load
+    is logged and the previous model stays active.
+    """
+
+    def __init__(self, path: Path, allowed_features: Iterable[str]) -> None:
+        self.path = path
+        self.allowed_features = list(allowed_features)
+        self._stat = self._file_stat()
+        self.current = load_model(path, self.allowed_features)
+        self._reload_lock = threading.Lock()
+        self.wake = threading.Event()
+
+    def _file_stat(self) -> tuple[int, int] | None:
+        try:
+            st = self.path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def reload(self, *, force: bool = False) -> bool:
+        """Swap in the model file if it changed (or force). Returns True if a new version went live."""
+        with self._reload_lock:
+            stat = self._file_stat()
+            if stat is None or (stat == self._stat and not force):
+                return False
+            self._stat = stat
+            try:
+                loaded = load_model(self.path, self.allowed_features)
+            except Exception as e:
+                logger.error(f"Model reload failed, keeping version {self.current.version}: {e}")
+                return False
+            if loaded.version == self.current.version:
+                return False
+            previous, self.current = self.current, loaded
+            logger.info(f"Model swapped: {previous.version} -> {loaded.version}")
+            return True
+
+    def watch(self, interval_s: float, stop: threading.Event) -> threading.Thread:
+        """
+        Poll the model file every interval_s seconds. Setting `wake` (e.g. from a SIGHUP
+        handler) forces an immediate reload.
+        """
+
+        def run() -> None:
+            while not stop.is_set():
+                forced = self.wake.wait(interval_s if interval_s > 0 else None)
+                self.wake.clear()
+                if stop.is_set():
+                    return
+                try:
+                    self.reload(force=forced)
+                except Exception as e:
+                    logger.exception(f"Model watcher error: {e}")
+
+        thread = threading.Thread(target=run, name="model-watcher", daemon=True)
+        thread.start()
+        return thread
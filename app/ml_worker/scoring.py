@@ -0,0 +1,113 @@
+from loguru import logger
+
+from ml_worker.registry import LoadedModel
+
+EXPECTED_FEATURES = [
+    "code_gender",
+    "flag_own_car",
+    "flag_own_realty",
+    "cnt_children",
+    "amt_income_total",
+    "name_income_type",
+    "name_education_type",
+    "name_family_status",
+    "name_housing_type",
+    "days_birth",
+    "days_employed",
+    "flag_work_phone",
+    "flag_phone",
+    "flag_email",
+    "occupation_type",
+    "cnt_fam_members",
+    "age_group",
+    "days_employed_bin",
+]
+
+# Errors caused by the request itself: retrying cannot help.
+PERMANENT_ERRORS = (ValueError, TypeError, KeyError)
+
+
+def error_result(client_id, error: Exception, version: str) -> dict:
+    """
+    Structured error reply. `code` is "invalid_request" (the request cannot be scored) or
+    "model_error" (the worker failed; `retryable`, the request is retried with backoff).
+    """
+    permanent = isinstance(error, PERMANENT_ERRORS)
+    return {
+        "client_id": client_id,
+        "status": "error",
+        "error": str(error),
+        "code": "invalid_request" if permanent else "model_error",
+        "retryable": not permanent,
+        "model_version": version,
+    }
+
+
+def check_payload(payload: dict) -> dict:
+    # A JSON body that is not an object (5, "x", [...]) is a bad request, never worth a retry.
+    if not isinstance(payload, dict):
+        raise TypeError(f"payload must be a JSON object, got {type(payload).__name__}")
+    features = payload.get("features") or {}
+    if not isinstance(features, dict):
+        raise TypeError("payload.features must be a dict")
+    return features
+
+
+def predict_batch(payloads: list[dict], loaded: LoadedModel) -> list[dict]:
+    """
+    Score several requests with a single predict_proba call.
+    Results are returned in the same order as payloads (see score_request for the format).
+    """
+    if not payloads:
+        return []
+    features = [check_payload(p) for p in payloads]
+    probas = loaded.model.predict_proba(loaded.encoder.encode(features))[:, 1]
+    results = []
+    for payload, p in zip(payloads, probas):
+        proba = float(p)
+        results.append(
+            {
+                "client_id": payload.get("client_id"),
+                "proba": proba,
+                "pred": int(proba >= 0.5),
+                "status": "success",
+                "model_version": loaded.version,
+            }
+        )
+    return results
+
+
+def score_payloads(payloads: list[dict], loaded: LoadedModel) -> list[dict]:
+    """
+    Score decoded payloads in one batch.
+    One bad payload must not fail its neighbours: if the batched call raises,
+    every payload is re-scored on its own so the error is attributed to the right reply.
+    """
+    try:
+        return predict_batch(payloads, loaded)
+    except Exception:
+        results = []
+        for payload in payloads:
+            try:
+                results.append(predict_batch([payload], loaded)[0])
+            except Exception as e:
+                logger.exception(f"ml_worker error: {e}")
+                client_id = payload.get("client_id") if isinstance(payload, dict) else None
+                results.append(error_result(client_id, e, loaded.version))
+        return results
+
+
+def score_request(payload: dict, loaded: LoadedModel) -> dict:
+    """
+    Score one decoded request.
+
+    Single request:
+      request:  { "client_id": 123, "features": { "f1": 1, ... } }   # client_id is optional, echoed back
+      response: { "client_id": 123, "proba": 0.42, "pred": 0, "status": "success", "model_version": "3f2a9c01b7de" }
+    Chunk of requests:
+      request:  { "items": [ {"client_id": 1, "features": {...}}, ... ] }
+      response: { "status": "success", "model_version": "...", "items": [ <single response>, ... ] }
+    """
+    if isinstance(payload, dict) and isinstance(payload.get("items"), list):
+        return {"status": "success", "model_version": loaded.version, "items": score_payloads(payload["items"], loaded)}
+    return score_payloads([payload], loaded)[0]
@@ -0,0 +1,143 @@
+import json
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from loguru import logger
+
+from ml_worker.registry import ModelRegistry
+
+
+SHADOW_SCHEMA = """
+CREATE TABLE IF NOT EXISTS shadow_score (
+    ts REAL NOT NULL,
+    client_id INTEGER,
+    champion_version TEXT NOT NULL,
+    champion_proba REAL NOT NULL,
+    challenger_version TEXT NOT NULL,
+    challenger_proba REAL NOT NULL
+)
+"""
+
+
+class ShadowStore:
+    """Append-only SQLite log of champion/challenger predictions for offline comparison."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        # Forked consumers share the file: WAL lets them append without blocking each other's readers.
+        self._conn = sqlite3.connect(str(path), timeout=30.0, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(SHADOW_SCHEMA)
+        self._conn.commit()
+
+    def write(self, rows: list[tuple]) -> None:
+        self._conn.executemany("INSERT INTO shadow_score VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self._conn.commit()
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _champion_pairs(bodies: list[bytes], results: list[dict]) -> list[tuple[dict, dict]]:
+    """(request payload, champion reply) for every successfully scored request, chunk items included."""
+    pairs = []
+    for body, result in zip(bodies, results):
+        if result.get("status") != "success":
+            continue
+        payload = json.loads(body)
+        if "items" in result:
+            pairs.extend(
+                (item, reply) for item, reply in zip(payload["items"], result["items"])
+                if reply.get("status") == "success"
+            )
+        else:
+            pairs.append((payload, result))
+    return pairs
+
+
+class ShadowScorer:
+    """
+    Scores the champion's traffic with a challenger model, off the reply path.
+
+    submit() only enqueues the raw bodies and the replies already sent; decoding, the
+    challenger's predict_proba and the SQLite write all happen on a background thread.
+    The queue holds at most `max_queue` batches: when the challenger falls behind, new
+    batches are dropped (and counted) instead of slowing down or buffering for the champion.
+    """
+
+    def __init__(self, models: ModelRegistry, store: ShadowStore, *, max_queue: int = 64) -> None:
+        self.models = models
+        self.store = store
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.dropped = 0
+        self.scored = 0
+        self.failed = 0
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def submit(self, bodies: list[bytes], results: list[dict]) -> bool:
+        """Never blocks. Returns False if the batch was dropped."""
+        try:
+            self._queue.put_nowait((time.time(), bodies, results))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return False
+        with self._lock:
+            self.submitted += 1
+        return True
+
+    def close(self, timeout_s: float = 5.0) -> None:
+        """Score what is already queued (for at most timeout_s), then stop."""
+        try:
+            self._queue.put(None, timeout=timeout_s)
+        except queue.Full:
+            pass
+        self._thread.join(timeout_s)
+        logger.info(f"Shadow scorer stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "dropped": self.dropped,
+                "scored": self.scored,
+                "failed": self.failed,
+                "queued": self._queue.qsize(),
+            }
+
+    def _score(self, ts: float, bodies: list[bytes], results: list[dict]) -> None:
+        pairs = _champion_pairs(bodies, results)
+        if not pairs:
+            return
+        loaded = self.models.current
+        # One thread: the challenger must not compete with the champion for every core.
+        probas = loaded.model.predict_proba(
+            loaded.encoder.encode([payload["features"] for payload, _ in pairs]), thread_count=1
+        )[:, 1]
+        self.store.write(
+            [
+                (ts, reply.get("client_id"), reply["model_version"], reply["proba"], loaded.version, float(p))
+                for (_, reply), p in zip(pairs, probas)
+            ]
+        )
+        with self._lock:
+            self.scored += len(pairs)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._score(*item)
+            except Exception as e:
+                with self._lock:
+                    self.failed += 1
+                logger.warning(f"Shadow scoring failed: {e}")
@@ -1,3 +1,4 @@
+from sqlalchemy import Index
 from sqlmodel import Field, Relationship, SQLModel
 from typing import List, Optional
 from typing import TYPE_CHECKING
@@ -40,3 +41,8 @@ class Client(SQLModel, table=True):
     manager: Optional["Manager"] = Relationship(back_populates="clients")
     credits: List["Credit"] = Relationship(back_populates="client")
     scores: List["Score"] = Relationship(back_populates="client")
+
+
+# Keyset-пагинация списка клиентов по user_id: внутри портфеля менеджера и с фильтром по age_group.
+Index("ix_client_manager_id_user_id", Client.manager_id, Client.user_id)
+Index("ix_client_age_group_user_id", Client.age_group, Client.user_id)
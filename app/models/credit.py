@@ -1,7 +1,6 @@
-from typing import Any, Optional, TYPE_CHECKING
+from typing import Any, Iterable, Optional, TYPE_CHECKING
 
-from sqlalchemy import Column, JSON
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, LargeBinary
 from sqlmodel import Field, Relationship
 from models.base_model import BaseModel
 
@@ -9,6 +8,64 @@ if TYPE_CHECKING:
     from models.client import Client
 
 
+# Статусы credit_history.csv: C - выплачен в этом месяце, X - нет кредита, 0..5 - просрочка
+# (0: 1-29 дней, 1: 30-59, ..., 5: более 150 дней / списание).
+# Месяц без записи в истории хранится как NO_RECORD.
+NO_RECORD = "-"
+OVERDUE_STATUSES = "012345"
+# Окно для worst_delinquency_12m.
+RECENT_MONTHS = 12
+
+
+def delinquency_level(status: str) -> int:
+    """Уровень просрочки статуса: 0 - без просрочки (C/X), 1..6 - статусы 0..5."""
+    return OVERDUE_STATUSES.index(status) + 1 if status and status in OVERDUE_STATUSES else 0
+
+
+def encode_payment_history(items: Iterable[dict[str, Any]]) -> bytes:
+    """
+    [{months_ago, status}, ...] -> один байт (ASCII-код статуса) на месяц, индекс = months_ago.
+    """
+    by_month = {int(item["months_ago"]): str(item["status"]) for item in items}
+    if not by_month:
+        return b""
+    if min(by_month) < 0:
+        raise ValueError(f"months_ago не может быть отрицательным: {min(by_month)}")
+    buf = bytearray(NO_RECORD.encode() * (max(by_month) + 1))
+    for months_ago, status in by_month.items():
+        # Один байт на месяц: статус - один ASCII-символ.
+        if len(status) != 1 or status == NO_RECORD or not status.isascii():
+            raise ValueError(f"Неверный статус платежа: {status!r} (ожидается один ASCII-символ)")
+        buf[months_ago] = ord(status)
+    return bytes(buf)
+
+
+def decode_payment_history(blob: bytes | None) -> list[dict[str, Any]]:
+    """Обратное к encode_payment_history: список по возрастанию months_ago."""
+    if not blob:
+        return []
+    return [
+        {"months_ago": months_ago, "status": status}
+        for months_ago, status in enumerate(blob.decode("ascii"))
+        if status != NO_RECORD
+    ]
+
+
+def payment_status_aggregates(blob: bytes) -> dict[str, int | None]:
+    """
+    Агрегаты по закодированной истории: худшая просрочка (за всё время и за последние 12 месяцев),
+    число месяцев с просрочкой и сколько месяцев прошло с последней просрочки (None - не было).
+    """
+    levels = [delinquency_level(chr(code)) for code in blob]
+    late = [months_ago for months_ago, level in enumerate(levels) if level > 0]
+    return {
+        "worst_delinquency": max(levels, default=0),
+        "worst_delinquency_12m": max(levels[:RECENT_MONTHS], default=0),
+        "overdue_months": len(late),
+        "months_since_last_late": late[0] if late else None,
+    }
+
+
 class Credit(BaseModel, table=True):
     """
     Кредит, привязанный к конкретному клиенту.
@@ -16,11 +73,32 @@ class Credit(BaseModel, table=True):
     client_id: int = Field(foreign_key="client.user_id", index=True, unique=True)
     amount_total: float = Field(description="Первоначально выданная сумма кредита")
     annual_rate: float = Field(description="Годовая процентная ставка в долях (например 0.12)")
-    # История выплат из credit_history.csv (по месяцам относительно текущего: 0 = текущий месяц)
-    payment_history: list[dict[str, Any]] = Field(
-        default_factory=list,
-        sa_column=Column(JSONB().with_variant(JSON, "sqlite"), nullable=False),
-        description="Список объектов вида {months_ago: int, status: str}",
+    # История выплат из credit_history.csv в компактном виде (см. encode_payment_history):
+    # байт i - статус за месяц months_ago=i.
+    payment_status: bytes = Field(
+        default=b"",
+        sa_column=Column(LargeBinary, nullable=False),
+        description="Статусы платежей по месяцам (0 = текущий месяц)",
+    )
+    # Агрегаты по истории, пересчитываются вместе с payment_status (set_payment_history).
+    # Индексы - для фильтров по риску по всему портфелю без разбора истории.
+    worst_delinquency: int = Field(default=0, index=True, description="Худший уровень просрочки за всю историю (0..6)")
+    worst_delinquency_12m: int = Field(
+        default=0, index=True, description="Худший уровень просрочки за последние 12 месяцев (0..6)"
+    )
+    overdue_months: int = Field(default=0, index=True, description="Количество месяцев с просрочкой")
+    months_since_last_late: Optional[int] = Field(
+        default=None, index=True, description="Месяцев с последней просрочки (None - просрочек не было)"
     )
     # Связи
     client: Optional["Client"] = Relationship(back_populates="credits")
+
+    @property
+    def payment_history(self) -> list[dict[str, Any]]:
+        """Список объектов вида {months_ago: int, status: str} (формат CreditRead)."""
+        return decode_payment_history(self.payment_status)
+
+    def set_payment_history(self, items: Iterable[dict[str, Any]]) -> None:
+        self.payment_status = encode_payment_history(items)
+        for name, value in payment_status_aggregates(self.payment_status).items():
+            setattr(self, name, value)
@@ -7,3 +7,11 @@ class UserRole(str, Enum):
     CLIENT = "client"
     DISMISSED = "dismissed"
     DEFAULT = "default"
+
+
+class ScoringJobStatus(str, Enum):
+    """Статусы пакетного пересчёта скоров"""
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
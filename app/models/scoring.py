@@ -1,8 +1,12 @@
+from datetime import datetime
 from typing import Optional, TYPE_CHECKING
 
-from sqlmodel import Field, Relationship
+from sqlalchemy import Column, Index
+from sqlalchemy import Enum as SAEnum
+from sqlmodel import Field, Relationship, SQLModel
 
 from models.base_model import BaseModel
+from models.enum import ScoringJobStatus
 
 if TYPE_CHECKING:
     from models.client import Client
@@ -15,5 +19,60 @@ class Score(BaseModel, table=True):
     """
     client_id: int = Field(index=True, foreign_key="client.user_id")
     score: float = Field(description="Скоринговый балл / вероятность дефолта")
+    model_version: Optional[str] = Field(
+        default=None, index=True, max_length=32, description="Версия (хэш файла) модели, посчитавшей скор"
+    )
+    # Ключ идемпотентности запроса: повторный запрос с тем же ключом не создаёт второй скор.
+    request_id: Optional[str] = Field(default=None, unique=True, max_length=96)
+    # Короткий хэш входа (признаки + версия модели): по нему воркеры API, ждавшие advisory lock,
+    # находят скор, только что сохранённый другим процессом для того же входа.
+    input_hash: Optional[str] = Field(default=None, max_length=16)
     # Связи
     client: Optional["Client"] = Relationship(back_populates="scores")
+
+
+# История скорингов клиента читается "последние сначала".
+Index("ix_score_client_id_timestamp", Score.client_id, Score.timestamp.desc())
+
+
+class LatestScore(SQLModel, table=True):
+    """
+    Текущий (последний) скор клиента: денормализованная копия последней записи Score.
+    Обновляется в той же транзакции, что и вставка Score, поэтому чтение "текущего скора"
+    - это поиск по первичному ключу, независимо от длины истории скорингов.
+    """
+    client_id: int = Field(foreign_key="client.user_id", primary_key=True)
+    score_id: int = Field(foreign_key="score.id", unique=True)
+    score: float = Field(index=True)
+    timestamp: datetime
+    # По ней пересчёт "только устаревших" находит клиентов, чей текущий скор посчитан другой моделью.
+    model_version: Optional[str] = Field(default=None, index=True, max_length=32)
+
+
+class ScoringJob(BaseModel, table=True):
+    """
+    Пакетный пересчёт скоров: все клиенты менеджера (или вся база при all_clients=True).
+    При stale_only=True пересчитываются только клиенты, чей текущий скор посчитан не моделью
+    model_version (версия на момент создания задачи).
+    Прогресс (processed/failed из total) обновляется после каждого чанка.
+    """
+    manager_id: int = Field(foreign_key="manager.user_id", index=True)
+    all_clients: bool = Field(default=False)
+    stale_only: bool = Field(default=False)
+    model_version: Optional[str] = Field(default=None, max_length=32)
+    status: ScoringJobStatus = Field(
+        default=ScoringJobStatus.PENDING,
+        sa_column=Column(
+            SAEnum(
+                ScoringJobStatus,
+                name="scoringjobstatus",
+                values_callable=lambda enum: [e.value for e in enum],
+            ),
+            nullable=False,
+        ),
+    )
+    total: int = Field(default=0)
+    processed: int = Field(default=0)
+    failed: int = Field(default=0)
+    finished_at: Optional[datetime] = Field(default=None)
+    error: Optional[str] = Field(default=None, max_length=1000)
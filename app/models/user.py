@@ -1,4 +1,4 @@
-from sqlalchemy import Column
+from sqlalchemy import DDL, Column, Index, event, func
 from sqlalchemy import Enum as SAEnum
 from sqlmodel import Field, Relationship
 from typing import Optional
@@ -61,3 +61,32 @@ class User(BaseModel, table=True):
         if not re.match(r"^[а-яА-ЯёЁ]+$", last_name):
             raise ValueError("Неверный формат фамилии")
         return last_name
+
+
+# Поиск клиентов по префиксу фамилии/имени (без учёта регистра) в списке менеджера.
+Index(
+    "ix_user_last_name_lower",
+    func.lower(User.last_name).label("last_name_lower"),
+    postgresql_ops={"last_name_lower": "text_pattern_ops"},
+)
+Index(
+    "ix_user_first_name_lower",
+    func.lower(User.first_name).label("first_name_lower"),
+    postgresql_ops={"first_name_lower": "text_pattern_ops"},
+)
+
+# Поиск по подстроке/с опечатками (GET /api/manager/clients/search): GIN-индексы pg_trgm.
+# На других СУБД это обычные индексы по выражению, поиск идёт через in-memory индекс.
+for _name, _col in (("last_name", User.last_name), ("first_name", User.first_name), ("login", User.login)):
+    Index(
+        f"ix_user_{_name}_trgm",
+        func.lower(_col).label(f"{_name}_trgm"),
+        postgresql_using="gin",
+        postgresql_ops={f"{_name}_trgm": "gin_trgm_ops"},
+    )
+
+event.listen(
+    User.__table__,
+    "before_create",
+    DDL("CREATE EXTENSION IF NOT EXISTS pg_trgm").execute_if(dialect="postgresql"),
+)
@@ -3,7 +3,8 @@ from pydantic import BaseModel
 from sqlmodel import Session
 
 from database.database import get_session
-from services.crud.user import get_user_by_login, verify_password
+from services.crud.user import get_user_by_login
+from services.password_hasher import HasherBusyError, get_password_hasher
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -16,7 +17,14 @@ class LoginRequest(BaseModel):
 @router.post("/login")
 async def login(req: Request, body: LoginRequest, session: Session = Depends(get_session)) -> dict:
     user = get_user_by_login(body.login, session=session)
-    if user is None or not verify_password(body.password, user.password_hash):
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid credentials")
+    try:
+        # bcrypt takes ~100 ms of CPU; keep it off the event loop.
+        ok = await get_password_hasher().verify(body.password, user.password_hash)
+    except HasherBusyError:
+        raise HTTPException(status_code=429, detail="Too many login attempts, retry later", headers={"Retry-After": "1"})
+    if not ok:
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     req.session["user_id"] = int(user.id)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException
 from sqlmodel import Session
 
 from database.database import get_session
@@ -7,7 +7,7 @@ from schemas.client import ClientRead
 from schemas.credit import CreditRead
 from schemas.scoring import ScoreRead
 from services.crud.credit import get_credit_by_client_id
-from services.crud.scoring import score_client
+from services.crud.scoring import score_client_async
 
 router = APIRouter(prefix="/clients", tags=["clients"])
 
@@ -34,11 +34,15 @@ async def get_client_credits(user_id: int, session: Session = Depends(get_sessio
 
 
 @router.post("/{user_id}/score", response_model=ScoreRead)
-async def score_client_endpoint(user_id: int, session: Session = Depends(get_session)) -> ScoreRead:
+async def score_client_endpoint(
+    user_id: int,
+    session: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, max_length=64),
+) -> ScoreRead:
     client = session.get(Client, user_id)
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
-    score_obj = score_client(client=client, session=session)
+    score_obj = await score_client_async(client=client, session=session, idempotency_key=idempotency_key)
     return ScoreRead.model_validate(score_obj)
 
 
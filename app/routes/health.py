@@ -1,5 +1,11 @@
 from fastapi import APIRouter
 
+from services.password_hasher import get_password_hasher
+from services.prediction_cache import get_prediction_cache, model_version
+from services.rpc_client import get_rpc_client
+from services.scoring_backend import get_scoring_backend
+from services.single_flight import get_single_flight
+
 router = APIRouter(tags=["health"])
 
 
@@ -8,3 +14,25 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
+@router.get("/health/prediction-cache")
+async def prediction_cache_stats() -> dict:
+    return {
+        "model_version": model_version(),
+        **get_prediction_cache().stats(),
+        "single_flight": get_single_flight().stats(),
+    }
+
+
+@router.get("/health/password-hasher")
+async def password_hasher_stats() -> dict:
+    return get_password_hasher().stats()
+
+
+@router.get("/health/scoring-lanes")
+async def scoring_lane_stats() -> dict:
+    return get_rpc_client().stats()
+
+
+@router.get("/health/scoring-backend")
+async def scoring_backend_stats() -> dict:
+    return get_scoring_backend().stats()
@@ -1,24 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
-from database.database import get_session
+from database.database import get_async_session, get_session
 from models.client import Client
+from models.enum import UserRole
 from models.manager import Manager
-from schemas.client import ClientRead, ClientSummary, ClientUpdate
+from schemas.client import ClientPage, ClientRead, ClientSearchHit, ClientSummary, ClientUpdate
 from schemas.credit import CreditRead
-from schemas.manager import ManagerRead, ManagerSummary
-from schemas.scoring import ScoreRead
+from schemas.dashboard import ClientDashboard
+from schemas.scoring import ScoreRead, ScoringJobRead
 from services.crud.client import (
     get_client_by_user_id,
-    get_client_with_user,
-    list_client_summaries,
-    list_clients,
+    get_client_with_user_async,
+    list_client_page_async,
+    list_client_summaries_async,
+    list_clients_async,
+    search_clients_async,
     update_client,
 )
-from services.crud.credit import get_credit_by_client_id
-from services.crud.manager import get_manager_by_user_id, get_manager_summary
-from services.crud.scoring import get_latest_score, score_client
+from services.crud.credit import get_credit_by_client_id_async
+from services.crud.dashboard import get_client_dashboard_async
+from services.crud.manager import get_manager_role_async
+from services.crud.scoring import (
+    create_scoring_job,
+    get_latest_score_async,
+    get_scoring_job,
+    run_scoring_job,
+    score_client_async,
+)
 from schemas.user import UserRead
+from services.principal import Principal, get_principal_cache
 
 router = APIRouter(prefix="/api", tags=["ui-api"])
 
@@ -31,97 +43,143 @@ def _require_auth(req: Request) -> tuple[int, str]:
     return int(user_id), str(role)
 
 
-@router.get("/client/dashboard")
-async def client_dashboard(req: Request, session: Session = Depends(get_session)) -> dict:
+async def _require_manager(req: Request, session: AsyncSession = Depends(get_async_session)) -> Principal:
+    """
+    Authenticated manager of this request. The Manager lookup is cached per user_id
+    (services.principal), so repeated calls of the same manager skip that query.
+    """
+    user_id, role = _require_auth(req)
+    if role != "manager":
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    cache = get_principal_cache()
+    principal = cache.get(user_id)
+    if principal is None:
+        current_role = await get_manager_role_async(user_id, session=session)
+        if current_role is None:
+            raise HTTPException(status_code=404, detail="Manager not found")
+        if current_role != UserRole.MANAGER:
+            # Dismissed after login: the session cookie still says "manager".
+            raise HTTPException(status_code=403, detail="Forbidden")
+        principal = Principal(user_id=user_id, role=role)
+        cache.put(principal)
+    return principal
+
+
+@router.get("/client/dashboard", response_model=ClientDashboard)
+async def client_dashboard(req: Request, session: AsyncSession = Depends(get_async_session)) -> ClientDashboard:
     user_id, role = _require_auth(req)
     if role != "client":
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    client = get_client_by_user_id(user_id, session=session)
-    if client is None:
+    dashboard = await get_client_dashboard_async(user_id, session=session)
+    if dashboard is None:
         raise HTTPException(status_code=404, detail="Client not found")
-
-    manager_summary: dict | None = None
-    if client.manager_id is not None:
-        manager_summary = get_manager_summary(client.manager_id, session=session)
-
-    credit = get_credit_by_client_id(client_id=user_id, session=session)
-    latest = get_latest_score(client_id=user_id, session=session)
-
-    return {
-        "client": ClientRead.model_validate(client),
-        "manager": ManagerSummary(**manager_summary) if manager_summary else None,
-        "credit": CreditRead.model_validate(credit) if credit else None,
-        "score": ScoreRead.model_validate(latest) if latest else None,
-    }
+    return ClientDashboard.model_validate(dashboard)
 
 
 @router.post("/client/score", response_model=ScoreRead)
-async def client_score(req: Request, session: Session = Depends(get_session)) -> ScoreRead:
+async def client_score(
+    req: Request,
+    session: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, max_length=64),
+) -> ScoreRead:
     user_id, role = _require_auth(req)
     if role != "client":
         raise HTTPException(status_code=403, detail="Forbidden")
     client = get_client_by_user_id(user_id, session=session)
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
-    s = score_client(client=client, session=session)
+    s = await score_client_async(client=client, session=session, idempotency_key=idempotency_key)
     return ScoreRead.model_validate(s)
 
 
 @router.get("/client/credit", response_model=CreditRead | None)
-async def client_credit(req: Request, session: Session = Depends(get_session)) -> CreditRead | None:
+async def client_credit(req: Request, session: AsyncSession = Depends(get_async_session)) -> CreditRead | None:
     user_id, role = _require_auth(req)
     if role != "client":
         raise HTTPException(status_code=403, detail="Forbidden")
-    credit = get_credit_by_client_id(client_id=user_id, session=session)
+    credit = await get_credit_by_client_id_async(client_id=user_id, session=session)
     return CreditRead.model_validate(credit) if credit else None
 
 
 @router.get("/manager/clients", response_model=list[ClientRead])
-async def manager_clients(req: Request, session: Session = Depends(get_session), all: bool = False) -> list[ClientRead]:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
-
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
-
-    clients = list_clients(session=session, manager_id=None if all else manager.user_id)
+async def manager_clients(
+    manager: Principal = Depends(_require_manager),
+    session: AsyncSession = Depends(get_async_session),
+    all: bool = False,
+) -> list[ClientRead]:
+    clients = await list_clients_async(session=session, manager_id=None if all else manager.user_id)
     return [ClientRead.model_validate(c) for c in clients]
 
 
 @router.get("/manager/clients/summary", response_model=list[ClientSummary])
 async def manager_clients_summary(
-    req: Request, session: Session = Depends(get_session), all: bool = False
+    manager: Principal = Depends(_require_manager),
+    session: AsyncSession = Depends(get_async_session),
+    all: bool = False,
 ) -> list[ClientSummary]:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
+    rows = await list_client_summaries_async(session=session, manager_id=None if all else manager.user_id)
+    return [ClientSummary(**r) for r in rows]
 
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
 
-    rows = list_client_summaries(session=session, manager_id=None if all else manager.user_id)
-    return [ClientSummary(**r) for r in rows]
+@router.get("/manager/clients/page", response_model=ClientPage)
+async def manager_clients_page(
+    manager: Principal = Depends(_require_manager),
+    session: AsyncSession = Depends(get_async_session),
+    all: bool = False,
+    limit: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = None,
+    name: str | None = Query(default=None, max_length=255),
+    age_group: str | None = None,
+    has_score: bool | None = None,
+    score_min: float | None = None,
+    score_max: float | None = None,
+    sort: str = Query(default="user_id", pattern="^(user_id|score|-score)$"),
+    delinquency_min: int | None = Query(default=None, ge=0, le=6),
+    overdue_months_min: int | None = Query(default=None, ge=0),
+    late_within_months: int | None = Query(default=None, ge=0),
+) -> ClientPage:
+    try:
+        items, next_cursor = await list_client_page_async(
+            session,
+            manager_id=None if all else manager.user_id,
+            limit=limit,
+            cursor=cursor,
+            name=name,
+            age_group=age_group,
+            has_score=has_score,
+            score_min=score_min,
+            score_max=score_max,
+            sort=sort,
+            delinquency_min=delinquency_min,
+            overdue_months_min=overdue_months_min,
+            late_within_months=late_within_months,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return ClientPage(items=items, next_cursor=next_cursor)
+
+
+@router.get("/manager/clients/search", response_model=list[ClientSearchHit])
+async def manager_clients_search(
+    manager: Principal = Depends(_require_manager),
+    q: str = Query(min_length=1, max_length=255),
+    limit: int = Query(default=10, ge=1, le=50),
+    all: bool = False,
+    session: AsyncSession = Depends(get_async_session),
+) -> list[ClientSearchHit]:
+    hits = await search_clients_async(session, q, manager_id=None if all else manager.user_id, limit=limit)
+    return [ClientSearchHit(**h) for h in hits]
 
 
 @router.get("/manager/clients/{client_id}")
 async def manager_client_detail(
     client_id: int,
-    req: Request,
-    session: Session = Depends(get_session),
+    manager: Principal = Depends(_require_manager),
+    session: AsyncSession = Depends(get_async_session),
 ) -> dict:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
-
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
-
-    row = get_client_with_user(session=session, client_id=client_id)
+    row = await get_client_with_user_async(session=session, client_id=client_id)
     if row is None:
         raise HTTPException(status_code=404, detail="Client not found")
     client, user = row
@@ -134,55 +192,34 @@ async def manager_client_detail(
 @router.get("/manager/clients/{client_id}/score", response_model=ScoreRead | None)
 async def manager_client_score(
     client_id: int,
-    req: Request,
-    session: Session = Depends(get_session),
+    manager: Principal = Depends(_require_manager),
+    session: AsyncSession = Depends(get_async_session),
 ) -> ScoreRead | None:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
-
-    s = get_latest_score(client_id=client_id, session=session)
+    s = await get_latest_score_async(client_id=client_id, session=session)
     return ScoreRead.model_validate(s) if s else None
 
 
 @router.post("/manager/clients/{client_id}/score", response_model=ScoreRead)
 async def manager_client_rescore(
     client_id: int,
-    req: Request,
+    manager: Principal = Depends(_require_manager),
     session: Session = Depends(get_session),
+    idempotency_key: str | None = Header(default=None, max_length=64),
 ) -> ScoreRead:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
-
     client = get_client_by_user_id(client_id, session=session)
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
-    s = score_client(client=client, session=session)
+    s = await score_client_async(client=client, session=session, idempotency_key=idempotency_key)
     return ScoreRead.model_validate(s)
 
 
 @router.patch("/manager/clients/{client_id}", response_model=ClientRead)
 async def manager_update_client(
     client_id: int,
-    req: Request,
     body: ClientUpdate,
+    manager: Principal = Depends(_require_manager),
     session: Session = Depends(get_session),
 ) -> ClientRead:
-    user_id, role = _require_auth(req)
-    if role != "manager":
-        raise HTTPException(status_code=403, detail="Forbidden")
-
-    manager = get_manager_by_user_id(user_id, session=session)
-    if manager is None:
-        raise HTTPException(status_code=404, detail="Manager not found")
-
     client = get_client_by_user_id(client_id, session=session)
     if client is None:
         raise HTTPException(status_code=404, detail="Client not found")
@@ -191,3 +228,27 @@ async def manager_update_client(
     return ClientRead.model_validate(updated)
 
 
+@router.post("/manager/score-jobs", response_model=ScoringJobRead, status_code=202)
+async def manager_start_scoring_job(
+    background_tasks: BackgroundTasks,
+    manager: Principal = Depends(_require_manager),
+    session: Session = Depends(get_session),
+    all: bool = False,
+    stale_only: bool = False,
+) -> ScoringJobRead:
+    job = create_scoring_job(manager.user_id, session=session, all_clients=all, stale_only=stale_only)
+    # Sync task -> runs in the threadpool with its own session, the event loop stays free.
+    background_tasks.add_task(run_scoring_job, job.id, session.get_bind())
+    return ScoringJobRead.model_validate(job)
+
+
+@router.get("/manager/score-jobs/{job_id}", response_model=ScoringJobRead)
+async def manager_scoring_job(
+    job_id: int,
+    manager: Principal = Depends(_require_manager),
+    session: Session = Depends(get_session),
+) -> ScoringJobRead:
+    job = get_scoring_job(job_id, session=session)
+    if job is None or job.manager_id != manager.user_id:
+        raise HTTPException(status_code=404, detail="Scoring job not found")
+    return ScoringJobRead.model_validate(job)
@@ -60,3 +60,24 @@ class ClientSummary(BaseModel):
     last_name: str
 
 
+class ClientListItem(BaseModel):
+    user_id: int
+    first_name: str
+    last_name: str
+    age_group: str | None = None
+    score: float | None = None
+
+
+class ClientPage(BaseModel):
+    """
+    One page of the manager client list; pass next_cursor back to get the following page.
+    """
+    items: list[ClientListItem]
+    next_cursor: str | None = None
+
+
+class ClientSearchHit(BaseModel):
+    user_id: int
+    first_name: str
+    last_name: str
+    login: str
@@ -12,5 +12,22 @@ class CreditRead(BaseModel):
     amount_total: float
     annual_rate: float
     payment_history: list[dict]
+    worst_delinquency: int = 0
+    worst_delinquency_12m: int = 0
+    overdue_months: int = 0
+    months_since_last_late: int | None = None
 
 
+
+
+class CreditSummary(BaseModel):
+    """
+    Credit without payment_history (dashboard view).
+    """
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    timestamp: datetime
+    client_id: int
+    amount_total: float
+    annual_rate: float
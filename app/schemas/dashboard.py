@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+from schemas.client import ClientRead
+from schemas.credit import CreditSummary
+from schemas.manager import ManagerSummary
+from schemas.scoring import ScoreRead
+
+
+class ClientDashboard(BaseModel):
+    client: ClientRead
+    manager: ManagerSummary | None = None
+    credit: CreditSummary | None = None
+    score: ScoreRead | None = None
@@ -10,5 +10,21 @@ class ScoreRead(BaseModel):
     timestamp: datetime
     client_id: int
     score: float
+    model_version: str | None = None
 
 
+class ScoringJobRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    timestamp: datetime
+    manager_id: int
+    all_clients: bool
+    stale_only: bool = False
+    model_version: str | None = None
+    status: str
+    total: int
+    processed: int
+    failed: int
+    finished_at: datetime | None = None
+    error: str | None = None
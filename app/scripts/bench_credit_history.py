@@ -0,0 +1,89 @@
+"""
+Benchmark: building the client_id -> payment_history map from credit_history.csv.
+
+Compares the previous groupby-per-ID implementation with the vectorized
+scripts.seed_db._credit_history_map (whole file and chunked read). Generates a synthetic
+file of the Kaggle size by default, or uses a real one:
+
+    python -m scripts.bench_credit_history --ids 45000 --months 24
+    python -m scripts.bench_credit_history --path app/scripts/test_data/credit_history.csv --max-id 1510
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from scripts.seed_db import _credit_history_map
+
+
+def _groupby_credit_history_map(path: str, max_id: int) -> dict[int, list[dict[str, int | str]]]:
+    # Implementation before the vectorized rewrite, kept for comparison.
+    df = pd.read_csv(path)
+    df = df[df["ID"].between(1, max_id)]
+    df["months_ago"] = (-df["MONTHS_BALANCE"]).astype(int)
+    df["status"] = df["STATUS"].astype(str)
+
+    out: dict[int, list[dict[str, int | str]]] = {}
+    for client_id, g in df.groupby("ID", sort=False):
+        g = g.sort_values("months_ago", ascending=True)
+        out[int(client_id)] = [
+            {"months_ago": int(m), "status": str(s)}
+            for m, s in zip(g["months_ago"].tolist(), g["status"].tolist())
+        ]
+    return out
+
+
+def _write_synthetic(path: Path, n_ids: int, max_months: int, seed: int = 42) -> int:
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, max_months + 1, size=n_ids)
+    ids = np.repeat(np.arange(1, n_ids + 1), lengths)
+    # months_balance 0, -1, ... per ID, rows shuffled like an unsorted export.
+    offsets = np.arange(len(ids)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    statuses = rng.choice(np.array(["C", "X", "0", "1", "2", "3", "4", "5"]), size=len(ids))
+    df = pd.DataFrame({"ID": ids, "MONTHS_BALANCE": -offsets, "STATUS": statuses}).sample(frac=1, random_state=seed)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def _run(name: str, fn) -> dict:
+    started = time.perf_counter()
+    result = fn()
+    print(f"{name:<28} {time.perf_counter() - started:8.2f}s  ids={len(result)}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--path", default=None, help="Existing credit_history.csv (default: synthetic file)")
+    parser.add_argument("--ids", type=int, default=45_000, help="Synthetic: number of IDs")
+    parser.add_argument("--months", type=int, default=44, help="Synthetic: max history length per ID")
+    parser.add_argument("--max-id", type=int, default=None, help="Keep IDs in [1, max-id] (default: all)")
+    parser.add_argument("--chunk-rows", type=int, default=200_000)
+    parser.add_argument("--skip-groupby", action="store_true", help="Do not run the slow groupby version")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path
+        if path is None:
+            path = str(Path(tmp) / "credit_history.csv")
+            rows = _write_synthetic(Path(path), args.ids, args.months)
+            print(f"synthetic file: ids={args.ids} rows={rows}")
+        max_id = args.max_id or int(pd.read_csv(path, usecols=["ID"])["ID"].max())
+
+        vectorized = _run("vectorized", lambda: _credit_history_map(path, max_id))
+        chunked = _run(
+            f"vectorized, chunks={args.chunk_rows}",
+            lambda: _credit_history_map(path, max_id, chunksize=args.chunk_rows),
+        )
+        assert chunked == vectorized
+        if not args.skip_groupby:
+            assert _run("groupby (previous)", lambda: _groupby_credit_history_map(path, max_id)) == vectorized
+
+
+if __name__ == "__main__":
+    main()
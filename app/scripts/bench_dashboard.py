@@ -0,0 +1,126 @@
+"""
+Benchmark: client dashboard read path.
+
+Compares the previous handler (4 separate CRUD calls: client, manager summary, credit with
+full payment_history, latest score) with the single-statement read model in
+services.crud.dashboard. Runs against a throwaway SQLite DB by default, or any database URL:
+
+    python -m scripts.bench_dashboard --clients 2000 --scores 20
+    python -m scripts.bench_dashboard --url postgresql+psycopg2://... (uses a fresh schema!)
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import time
+
+from sqlalchemy import event
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from models.client import Client
+from models.credit import Credit
+from models.enum import UserRole
+from models.manager import Manager
+from models.scoring import Score
+from models.user import User
+from services.crud.client import get_client_by_user_id
+from services.crud.credit import get_credit_by_client_id
+from services.crud.dashboard import get_client_dashboard
+from services.crud.manager import get_manager_summary
+from services.crud.scoring import backfill_latest_scores
+
+
+def _populate(session: Session, n_clients: int, n_scores: int, n_months: int) -> list[int]:
+    statuses = ["C", "X", "0", "1", "2"]
+    manager_user = User(login="bench_manager", password_hash="x" * 10, first_name="М", last_name="М",
+                        role=UserRole.MANAGER)
+    session.add(manager_user)
+    session.flush()
+    session.add(Manager(user_id=manager_user.id))
+
+    client_ids: list[int] = []
+    for i in range(n_clients):
+        user = User(login=f"bench_client_{i}", password_hash="x" * 10, first_name="К", last_name="К",
+                    role=UserRole.CLIENT)
+        session.add(user)
+        session.flush()
+        session.add(Client(user_id=user.id, manager_id=manager_user.id, age_group="25-35"))
+        credit = Credit(client_id=user.id, amount_total=1000.0, annual_rate=0.16)
+        credit.set_payment_history([{"months_ago": m, "status": random.choice(statuses)} for m in range(n_months)])
+        session.add(credit)
+        session.add_all(Score(client_id=user.id, score=random.random()) for _ in range(n_scores))
+        client_ids.append(user.id)
+    session.commit()
+    # Scores are inserted directly (no RPC), so the LatestScore read model is built afterwards.
+    backfill_latest_scores(session)
+    return client_ids
+
+
+def _old_latest_score(client_id: int, session: Session) -> Score | None:
+    # The previous "current score" lookup: newest row of the client's Score history.
+    return session.exec(select(Score).where(Score.client_id == client_id).order_by(Score.timestamp.desc())).first()
+
+
+def _old_dashboard(user_id: int, session: Session) -> dict:
+    client = get_client_by_user_id(user_id, session=session)
+    manager = get_manager_summary(client.manager_id, session=session) if client.manager_id else None
+    return {
+        "client": client,
+        "manager": manager,
+        "credit": get_credit_by_client_id(client_id=user_id, session=session),
+        "score": _old_latest_score(user_id, session),
+    }
+
+
+def _run(name: str, fn, engine, client_ids: list[int], requests: int) -> None:
+    statements = 0
+
+    def _count(*_args) -> None:
+        nonlocal statements
+        statements += 1
+
+    event.listen(engine, "before_cursor_execute", _count)
+    timings: list[float] = []
+    try:
+        for _ in range(requests):
+            user_id = random.choice(client_ids)
+            # Fresh session per request, like the FastAPI dependency.
+            with Session(engine) as session:
+                started = time.perf_counter()
+                fn(user_id, session)
+                timings.append(time.perf_counter() - started)
+    finally:
+        event.remove(engine, "before_cursor_execute", _count)
+
+    timings.sort()
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[int(len(timings) * 0.99) - 1] * 1000
+    print(f"{name:<12} queries/request={statements / requests:.1f}  p50={p50:.3f}ms  p99={p99:.3f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="sqlite+pysqlite://")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--scores", type=int, default=20, help="Score rows per client")
+    parser.add_argument("--months", type=int, default=60, help="payment_history length per credit")
+    parser.add_argument("--requests", type=int, default=2000)
+    args = parser.parse_args()
+
+    random.seed(42)
+    kwargs = {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool} if args.url.startswith("sqlite") else {}
+    engine = create_engine(args.url, **kwargs)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        client_ids = _populate(session, args.clients, args.scores, args.months)
+
+    print(f"clients={args.clients} scores/client={args.scores} history={args.months} months")
+    _run("4 queries", _old_dashboard, engine, client_ids, args.requests)
+    _run("read model", get_client_dashboard, engine, client_ids, args.requests)
+
+
+if __name__ == "__main__":
+    main()
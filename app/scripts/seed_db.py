@@ -1,33 +1,74 @@
 from __future__ import annotations
 
-import os
+import argparse
+import io
 import random
 import re
 import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import Iterable
 
 import bcrypt
+import numpy as np
 import pandas as pd
 from russian_names import RussianNames
 from transliterate import translit
+from sqlalchemy import LargeBinary, Table, func, text
+from sqlalchemy.engine import Connection, Engine
 from sqlmodel import SQLModel, Session, select
 
 from database.database import get_database_engine
 from models.user import User
 from models.client import Client
 from models.manager import Manager
-from models.credit import Credit
+from models.credit import Credit, encode_payment_history, payment_status_aggregates
 from models.scoring import Score 
 from models.enum import UserRole
 from loguru import logger
 
-from services.crud.user import create_user
-from services.crud.client import create_client
-from services.crud.manager import create_manager
 from services.crud.credit import assign_credit
 
 
+TEST_DATA_DIR = Path(__file__).resolve().parent / "test_data"
+# Rows per COPY buffer / executemany batch: keeps memory flat for large seeds.
+BULK_CHUNK_ROWS = 50_000
+# credit_history.csv is streamed in chunks of this many rows (the full Kaggle file is ~1M rows).
+HISTORY_CHUNK_ROWS = 200_000
+# Columns of df_to_keep.csv copied into Client (CSV header is the upper-cased name).
+CLIENT_FEATURES = [
+    "code_gender",
+    "flag_own_car",
+    "flag_own_realty",
+    "cnt_children",
+    "amt_income_total",
+    "name_income_type",
+    "name_education_type",
+    "name_family_status",
+    "name_housing_type",
+    "days_birth",
+    "days_employed",
+    "flag_work_phone",
+    "flag_phone",
+    "flag_email",
+    "occupation_type",
+    "cnt_fam_members",
+    "age_group",
+    "days_employed_bin",
+]
+INT_FEATURES = [
+    "cnt_children",
+    "days_birth",
+    "days_employed",
+    "flag_work_phone",
+    "flag_phone",
+    "flag_email",
+    "cnt_fam_members",
+]
+
+
 def _wait_for_db(timeout_s: int = 60) -> None:
     """Ping DB using configured engine until it responds or timeout."""
     engine = get_database_engine()
@@ -44,6 +85,7 @@ def _wait_for_db(timeout_s: int = 60) -> None:
     raise RuntimeError(f"DB is not ready after {timeout_s}s: {last_err}")
 
 
+@lru_cache(maxsize=None)
 def _ru_to_lat(s: str) -> str:
     try:
         return translit(s, "ru", reversed=True)
@@ -83,70 +125,246 @@ def _df_clients(path: str) -> pd.DataFrame:
     return pd.read_csv(path)
 
 
-def _credit_history_map(path: str, max_id: int) -> dict[int, list[dict[str, int | str]]]:
+def _read_credit_history(path: str, max_id: int, *, chunksize: int | None = None) -> tuple[np.ndarray, ...]:
+    """
+    Reads (ID, months_ago, STATUS) columns of credit_history.csv for IDs in [1, max_id].
+    With chunksize the file is streamed, so only the kept rows are ever held in memory.
+    """
+    reader = pd.read_csv(
+        path,
+        usecols=["ID", "MONTHS_BALANCE", "STATUS"],
+        dtype={"ID": "int64", "MONTHS_BALANCE": "int64", "STATUS": str},
+        chunksize=chunksize,
+    )
+    ids, months, statuses = [], [], []
+    for df in [reader] if chunksize is None else reader:
+        df = df[df["ID"].between(1, max_id)]
+        ids.append(df["ID"].to_numpy())
+        # months_ago: convert negative months_balance to positive "months ago"
+        months.append(-df["MONTHS_BALANCE"].to_numpy())
+        statuses.append(df["STATUS"].to_numpy(dtype=object))
+    if not ids:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, object)
+    return np.concatenate(ids), np.concatenate(months), np.concatenate(statuses)
+
+
+def _credit_history_map(
+    path: str, max_id: int, *, chunksize: int | None = None
+) -> dict[int, list[dict[str, int | str]]]:
     """
     Build mapping: client_id -> list of history items sorted by months_ago ASC.
     CSV has columns: ID, MONTHS_BALANCE (0, -1, -2...), STATUS (C/0/1/.../X).
     We store months_ago as non-negative int where 0 is current month.
+
+    One global (ID, months_ago) sort, then the arrays are split at ID boundaries.
     """
-    df = pd.read_csv(path)
-    df = df[df["ID"].between(1, max_id)]
-    # months_ago: convert negative months_balance to positive "months ago"
-    df["months_ago"] = (-df["MONTHS_BALANCE"]).astype(int)
-    df["status"] = df["STATUS"].astype(str)
+    ids, months, statuses = _read_credit_history(path, max_id, chunksize=chunksize)
+    order = np.lexsort((months, ids))
+    ids = ids[order]
+    starts = np.flatnonzero(np.r_[True, ids[1:] != ids[:-1]]) if len(ids) else np.empty(0, np.int64)
+    bounds = np.r_[starts, len(ids)].tolist()
+    months_list = months[order].tolist()
+    statuses_list = statuses[order].tolist()
 
     out: dict[int, list[dict[str, int | str]]] = {}
-    for client_id, g in df.groupby("ID", sort=False):
-        g = g.sort_values("months_ago", ascending=True)
-        out[int(client_id)] = [
-            {"months_ago": int(m), "status": str(s)}
-            for m, s in zip(g["months_ago"].tolist(), g["status"].tolist())
+    for client_id, a, b in zip(ids[starts].tolist(), bounds[:-1], bounds[1:]):
+        out[client_id] = [
+            {"months_ago": m, "status": s} for m, s in zip(months_list[a:b], statuses_list[a:b])
         ]
     return out
 
 
-def _client_kwargs(row: pd.Series) -> dict:
-    return dict(
-        code_gender=row.get("CODE_GENDER"),
-        flag_own_car=row.get("FLAG_OWN_CAR"),
-        flag_own_realty=row.get("FLAG_OWN_REALTY"),
-        cnt_children=int(row["CNT_CHILDREN"]),
-        amt_income_total=float(row["AMT_INCOME_TOTAL"]),
-        name_income_type=row.get("NAME_INCOME_TYPE"),
-        name_education_type=row.get("NAME_EDUCATION_TYPE"),
-        name_family_status=row.get("NAME_FAMILY_STATUS"),
-        name_housing_type=row.get("NAME_HOUSING_TYPE"),
-        days_birth=int(row["DAYS_BIRTH"]),
-        days_employed=int(row["DAYS_EMPLOYED"]),
-        flag_work_phone=int(row["FLAG_WORK_PHONE"]),
-        flag_phone=int(row["FLAG_PHONE"]),
-        flag_email=int(row["FLAG_EMAIL"]),
-        occupation_type=row.get("OCCUPATION_TYPE"),
-        cnt_fam_members=int(row["CNT_FAM_MEMBERS"]),
-        age_group=row.get("AGE_GROUP"),
-        days_employed_bin=row.get("DAYS_EMPLOYED_BIN"),
-    )
+def _hash_password(password: str, rounds: int = 12) -> str:
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
 
 
-def _hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+def _hash_passwords(passwords: list[str], *, rounds: int = 12, processes: int | None = None) -> list[str]:
+    """
+    bcrypt is CPU-bound: hash in a process pool (processes=None -> one per CPU, 1 -> inline).
+    """
+    if processes == 1 or len(passwords) < 64:
+        return [_hash_password(p, rounds) for p in passwords]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(partial(_hash_password, rounds=rounds), passwords, chunksize=256))
 
 
 def _pick(seq: Iterable[str]) -> str:
     return random.choice(list(seq))
 
 
-def seed() -> None:
+def _users_frame(n_clients: int, n_managers: int, n_admins: int) -> pd.DataFrame:
+    """
+    Clients first, then managers, then admins: login/password are derived from a
+    transliterated (name, surname), passwords are still plain text here.
+    """
+    total = n_clients + n_managers + n_admins
+    rn = RussianNames(
+        count=total,
+        patronymic=False,
+        name_max_len=255,
+        surname_max_len=255,
+        seed=42,
+        output_type="dict",
+    )
+    used_logins: set[str] = set()
+    first_names: list[str] = []
+    last_names: list[str] = []
+    logins: list[str] = []
+    for person in rn:
+        name = person["name"]
+        surname = person["surname"]
+        raw_login = f"{_ru_to_lat(name).lower()}_{_ru_to_lat(surname).lower()}"
+        login = _clean_login(raw_login) or "user"
+        logins.append(_unique_login(login, used_logins))
+        first_names.append(name)
+        last_names.append(surname)
+
+    role = np.array(
+        [UserRole.CLIENT.value] * n_clients + [UserRole.MANAGER.value] * n_managers + [UserRole.ADMIN.value] * n_admins
+    )
+    return pd.DataFrame(
+        {
+            "login": logins,
+            "password": [_make_password(login) for login in logins],
+            "first_name": first_names,
+            "last_name": last_names,
+            "role": role,
+            "is_admin": role == UserRole.ADMIN.value,
+            "is_test": True,
+        }
+    )
+
+
+def _clients_frame(df_clients: pd.DataFrame, user_ids: np.ndarray, manager_ids: np.ndarray) -> pd.DataFrame:
+    """
+    Client rows for user_ids: feature rows of df_to_keep.csv are reused cyclically,
+    managers are assigned round-robin.
+    """
+    n = len(user_ids)
+    src = df_clients.rename(columns=str.lower)
+    src = src.iloc[np.arange(n) % len(src)].reset_index(drop=True)
+    out = pd.DataFrame({"user_id": user_ids})
+    out["manager_id"] = manager_ids[np.arange(n) % len(manager_ids)] if len(manager_ids) else None
+    for col in CLIENT_FEATURES:
+        out[col] = src[col].to_numpy() if col in src else None
+    for col in INT_FEATURES:
+        out[col] = out[col].astype("int64")
+    out["amt_income_total"] = out["amt_income_total"].astype(float)
+    return out
+
+
+def _credits_frame(
+    client_ids: np.ndarray, history_by_client_id: dict[int, list[dict[str, int | str]]], rng: np.random.Generator
+) -> pd.DataFrame:
+    """One credit per client + payment history from credit_history.csv (compact encoding + aggregates)."""
+    statuses = [encode_payment_history(history_by_client_id.get(int(cid), [])) for cid in client_ids]
+    aggregates = pd.DataFrame(
+        [payment_status_aggregates(blob) for blob in statuses],
+        columns=["worst_delinquency", "worst_delinquency_12m", "overdue_months", "months_since_last_late"],
+    )
+    credits = pd.DataFrame(
+        {
+            "client_id": client_ids,
+            "amount_total": rng.integers(1, 3_000_001, size=len(client_ids)).astype(float),
+            "annual_rate": 0.16,
+            "payment_status": statuses,
+        }
+    )
+    # Nullable integer: NULL for "never late" instead of a float NaN.
+    aggregates["months_since_last_late"] = aggregates["months_since_last_late"].astype("Int64")
+    return pd.concat([credits, aggregates], axis=1)
+
+
+def _copy_frame(conn: Connection, table: Table, df: pd.DataFrame) -> None:
+    """PostgreSQL: stream the frame with COPY ... FROM STDIN (CSV), chunk by chunk."""
+    binary_cols = [c for c in df.columns if isinstance(table.c[c].type, LargeBinary)]
+    columns = ", ".join(f'"{c}"' for c in df.columns)
+    sql = f'COPY "{table.name}" ({columns}) FROM STDIN WITH (FORMAT csv)'
+    cursor = conn.connection.cursor()
+    try:
+        for start in range(0, len(df), BULK_CHUNK_ROWS):
+            chunk = df.iloc[start:start + BULK_CHUNK_ROWS]
+            if binary_cols:
+                # bytea in hex input format: \x43302d...
+                chunk = chunk.assign(**{c: chunk[c].map(lambda b: "\\x" + b.hex()) for c in binary_cols})
+            buf = io.StringIO()
+            # NaN/None -> empty unquoted field -> NULL.
+            chunk.to_csv(buf, index=False, header=False)
+            buf.seek(0)
+            cursor.copy_expert(sql, buf)
+    finally:
+        cursor.close()
+
+
+def _bulk_insert(conn: Connection, table: Table, df: pd.DataFrame) -> None:
+    if df.empty:
+        return
+    if conn.dialect.name == "postgresql":
+        _copy_frame(conn, table, df)
+        return
+    # Fallback (SQLite in tests): executemany in chunks.
+    for start in range(0, len(df), BULK_CHUNK_ROWS):
+        chunk = df.iloc[start:start + BULK_CHUNK_ROWS].astype(object)
+        conn.execute(table.insert(), chunk.where(chunk.notna(), None).to_dict("records"))
+
+
+def bulk_seed(
+    engine: Engine,
+    *,
+    n_clients: int,
+    n_managers: int,
+    n_admins: int,
+    clients_csv: Path = TEST_DATA_DIR / "df_to_keep.csv",
+    history_csv: Path = TEST_DATA_DIR / "credit_history.csv",
+    bcrypt_rounds: int = 12,
+    processes: int | None = None,
+) -> dict[str, int]:
+    """
+    Заполняет пустую БД тестовыми пользователями: клиенты, менеджеры, администраторы,
+    по одному кредиту на клиента. Все строки готовятся DataFrame'ами и вставляются
+    одной транзакцией (COPY на PostgreSQL, executemany на остальных СУБД).
+    """
+    started = time.perf_counter()
+    users = _users_frame(n_clients, n_managers, n_admins)
+    users["password_hash"] = _hash_passwords(users.pop("password").tolist(), rounds=bcrypt_rounds, processes=processes)
+    logger.info(f"Seed: {len(users)} users prepared in {time.perf_counter() - started:.1f}s")
+
+    df_clients = _df_clients(str(clients_csv))
+    history_by_client_id = _credit_history_map(str(history_csv), max_id=n_clients, chunksize=HISTORY_CHUNK_ROWS)
+    rng = np.random.default_rng(42)
+
+    with engine.begin() as conn:
+        # Ids are assigned here so the client/manager rows can reference them without a round trip.
+        first_id = conn.execute(select(func.coalesce(func.max(User.id), 0))).scalar_one() + 1
+        ids = np.arange(first_id, first_id + len(users), dtype=np.int64)
+        users.insert(0, "id", ids)
+        users.insert(1, "timestamp", datetime.utcnow())
+        client_ids = ids[:n_clients]
+        manager_ids = ids[n_clients:n_clients + n_managers]
+
+        _bulk_insert(conn, User.__table__, users)
+        _bulk_insert(conn, Manager.__table__, pd.DataFrame({"user_id": manager_ids}))
+        _bulk_insert(conn, Client.__table__, _clients_frame(df_clients, client_ids, manager_ids))
+        credits = _credits_frame(client_ids, history_by_client_id, rng)
+        credits.insert(0, "timestamp", datetime.utcnow())
+        _bulk_insert(conn, Credit.__table__, credits)
+
+        if conn.dialect.name == "postgresql":
+            # Explicit ids bypass the sequence; move it past them.
+            conn.execute(text("SELECT setval(pg_get_serial_sequence('\"user\"', 'id'), (SELECT max(id) FROM \"user\"))"))
+
+    logger.info(f"Seed: inserted {len(users)} users in {time.perf_counter() - started:.1f}s")
+    return {"clients": n_clients, "managers": n_managers, "admins": n_admins}
+
+
+def seed(n_clients: int = 1510, n_managers: int = 30, n_admins: int = 2, *, bcrypt_rounds: int = 12,
+         processes: int | None = None) -> None:
     random.seed(42)
     _wait_for_db(60)
 
     engine = get_database_engine()
     SQLModel.metadata.create_all(engine)
 
-    n_clients = 1510
-    n_managers = 30
-    n_admins = 2
-
     with Session(engine) as session:
         already_seeded = session.exec(select(User).where(User.is_test == True)).first()
         if already_seeded is not None:
@@ -156,8 +374,9 @@ def seed() -> None:
                 print("Seed: already exists, but no managers found. Skipping.")
                 return
 
-            credit_history_path = Path(__file__).resolve().parent / "test_data" / "credit_history.csv"
-            history_by_client_id = _credit_history_map(str(credit_history_path), max_id=n_clients)
+            credit_history_path = TEST_DATA_DIR / "credit_history.csv"
+            history_by_client_id = _credit_history_map(str(credit_history_path), max_id=n_clients,
+                                                        chunksize=HISTORY_CHUNK_ROWS)
 
             clients_without_manager = session.exec(
                 select(Client).where(Client.manager_id == None).order_by(Client.user_id)  # noqa: E711
@@ -197,103 +416,32 @@ def seed() -> None:
             )
             return
 
-        used_logins: set[str] = set()
-        df_clients_path = Path(__file__).resolve().parent / "test_data" / "df_to_keep.csv"
-        df_clients = _df_clients(str(df_clients_path))
-        credit_history_path = Path(__file__).resolve().parent / "test_data" / "credit_history.csv"
-        history_by_client_id = _credit_history_map(str(credit_history_path), max_id=n_clients)
-
-        total = n_clients + n_managers + n_admins
-        rn = RussianNames(
-            count=total,
-            patronymic=False,
-            name_max_len=255,
-            surname_max_len=255,
-            seed=42,
-            output_type="dict",
-        )
-
-        mgr_created = 0
-        cli_created = 0
-        adm_created = 0
-
-        created_client_ids: list[int] = []
-        created_manager_ids: list[int] = []
-
-        for i, person in enumerate(rn):
-            name = person["name"]
-            surname = person["surname"]
-
-            raw_login = f"{_ru_to_lat(name).lower()}_{_ru_to_lat(surname).lower()}"
-            login = _clean_login(raw_login) or "user"
-            login = _unique_login(login, used_logins)
-            password = _make_password(login)
-
-            if i < n_clients:
-                role = UserRole.CLIENT
-                is_admin = False
-            elif i < n_clients + n_managers:
-                role = UserRole.MANAGER
-                is_admin = False
-            else:
-                role = UserRole.ADMIN
-                is_admin = True
-            
-            # Создание пользователя через CRUD
-            user = create_user(
-                login=login,
-                password=password,
-                first_name=name,
-                last_name=surname,
-                role=role,
-                session=session,
-                is_admin=is_admin,
-                is_test=True,
-            )
-
-            # Создание клиента или менеджера из пользователя
-            if role == UserRole.CLIENT:
-                row = df_clients.iloc[cli_created % len(df_clients)]
-                client = create_client(
-                    user=user,
-                    session=session,
-                    **_client_kwargs(row),
-                )
-                created_client_ids.append(client.user_id)
-                cli_created += 1
-            elif role == UserRole.MANAGER:
-                manager = create_manager(user=user, session=session)
-                created_manager_ids.append(manager.user_id)
-                mgr_created += 1
-            else:
-                adm_created += 1
-
-        # Аллоцирование клиентов к менеджерам.
-        if created_manager_ids:
-            for idx, client_user_id in enumerate(created_client_ids):
-                client = session.get(Client, client_user_id)
-                if client is not None:
-                    client.manager_id = created_manager_ids[idx % len(created_manager_ids)]
-            session.commit()
+    counts = bulk_seed(
+        engine,
+        n_clients=n_clients,
+        n_managers=n_managers,
+        n_admins=n_admins,
+        bcrypt_rounds=bcrypt_rounds,
+        processes=processes,
+    )
+    print(
+        f"Seed: created clients={counts['clients']}, managers={counts['managers']}, admins={counts['admins']}."
+    )
 
-        # Создание 1 кредита на каждого клиента + история выплат из credit_history.csv
-        for client_user_id in created_client_ids:
-            client = session.get(Client, client_user_id)
-            if client is None:
-                continue
-            assign_credit(
-                client=client,
-                amount_total=float(random.randint(1, 3_000_000)),
-                annual_rate=0.16,
-                payment_history=history_by_client_id.get(int(client_user_id), []),
-                session=session,
-            )
 
-        print(
-            f"Seed: created clients={cli_created}, managers={mgr_created}, admins={adm_created}."
-        )
-    
-if __name__ == "__main__":
-    seed()
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Seed the database with test users, clients and credits.")
+    parser.add_argument("--clients", type=int, default=1510)
+    parser.add_argument("--managers", type=int, default=30)
+    parser.add_argument("--admins", type=int, default=2)
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, default=12,
+        help="bcrypt cost; use 4 for large synthetic load seeds (1M clients)",
+    )
+    parser.add_argument("--processes", type=int, default=None, help="bcrypt worker processes (default: CPU count)")
+    args = parser.parse_args()
+    seed(args.clients, args.managers, args.admins, bcrypt_rounds=args.bcrypt_rounds, processes=args.processes)
 
 
+if __name__ == "__main__":
+    main()
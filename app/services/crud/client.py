@@ -1,10 +1,21 @@
+import base64
+import json
+import os
+
 from models.user import User
 from models.client import Client
 from models.manager import Manager
+from models.credit import Credit
+from models.scoring import LatestScore
 from sqlmodel import Session
-from typing import Optional
+from sqlmodel.ext.asyncio.session import AsyncSession
+from typing import Iterator, Optional
 from loguru import logger
-from sqlmodel import select
+from sqlalchemy import and_, case, or_, text
+from sqlalchemy.exc import DBAPIError
+from sqlmodel import func, select
+from services.name_search import get_name_search_index
+from services.prediction_cache import get_prediction_cache
 
 
 def create_client(
@@ -61,6 +72,7 @@ def create_client(
         session.add(client)
         session.commit()
         session.refresh(client)
+        get_name_search_index().invalidate()
         logger.info(f"Клиент {client.user_id} создан")
         return client
     except Exception as e:
@@ -80,6 +92,7 @@ async def assign_manager(
         client.manager = manager
         session.commit()
         session.refresh(client)
+        get_name_search_index().invalidate()
     except Exception as e:
         session.rollback()
         logger.error(f"Ошибка при назначении менеджера {manager.user.login} id: {manager.user.id} клиенту {client.user.login} id: {client.user.id}: {e}")
@@ -90,11 +103,59 @@ def get_client_by_user_id(user_id: int, session: Session) -> Client | None:
     return session.get(Client, user_id)
 
 
+async def get_client_by_user_id_async(user_id: int, session: AsyncSession) -> Client | None:
+    return await session.get(Client, user_id)
+
+
+def _stale_filter(q, stale_for: str | None):
+    """Only clients whose current score was produced by a model other than stale_for (or an unknown one)."""
+    if stale_for is None:
+        return q
+    return q.join(LatestScore, LatestScore.client_id == Client.user_id).where(
+        or_(LatestScore.model_version == None, LatestScore.model_version != stale_for)  # noqa: E711
+    )
+
+
+def _clients_query(manager_id: int | None, stale_for: str | None = None):
+    q = _stale_filter(select(Client), stale_for)
+    if manager_id is not None:
+        q = q.where(Client.manager_id == manager_id)
+    return q
+
+
 def list_clients(session: Session, *, manager_id: int | None = None) -> list[Client]:
-    q = select(Client)
+    return list(session.exec(_clients_query(manager_id)).all())
+
+
+def iter_client_chunks(
+    session: Session, *, manager_id: int | None = None, chunk_size: int = 500, stale_for: str | None = None
+) -> Iterator[list[Client]]:
+    """
+    Streams clients in user_id order, chunk_size rows per query (keyset pagination),
+    so the whole book is never loaded into memory at once.
+    With stale_for, only clients whose current score came from another model version are streamed.
+    """
+    last_id: int | None = None
+    while True:
+        q = _clients_query(manager_id, stale_for).order_by(Client.user_id).limit(chunk_size)
+        if last_id is not None:
+            q = q.where(Client.user_id > last_id)
+        chunk = list(session.exec(q).all())
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].user_id
+
+
+def count_clients(session: Session, *, manager_id: int | None = None, stale_for: str | None = None) -> int:
+    q = _stale_filter(select(func.count()).select_from(Client), stale_for)
     if manager_id is not None:
         q = q.where(Client.manager_id == manager_id)
-    return list(session.exec(q).all())
+    return int(session.exec(q).one())
+
+
+async def list_clients_async(session: AsyncSession, *, manager_id: int | None = None) -> list[Client]:
+    return list((await session.exec(_clients_query(manager_id))).all())
 
 
 def update_client(client: Client, session: Session, **updates) -> Client:
@@ -123,29 +184,307 @@ def update_client(client: Client, session: Session, **updates) -> Client:
         "age_group",
         "days_employed_bin",
     }
+    changed = False
+    manager_before = client.manager_id
     for k, v in updates.items():
         if k in allowed and v is not None:
+            changed = changed or getattr(client, k) != v
             setattr(client, k, v)
     session.add(client)
     session.commit()
     session.refresh(client)
+    if changed:
+        # Cached predictions for the old feature vector are no longer this client's.
+        get_prediction_cache().invalidate_client(client.user_id)
+    if client.manager_id != manager_before:
+        get_name_search_index().invalidate()
     return client
 
 
+def _client_summaries_query(manager_id: int | None):
+    q = select(Client.user_id, User.first_name, User.last_name).join(User, User.id == Client.user_id)
+    if manager_id is not None:
+        q = q.where(Client.manager_id == manager_id)
+    return q
+
+
 def list_client_summaries(session: Session, *, manager_id: int | None = None) -> list[dict]:
     """
     Returns list of {user_id, first_name, last_name} joined from Client->User.
     """
-    q = select(Client.user_id, User.first_name, User.last_name).join(User, User.id == Client.user_id)
-    if manager_id is not None:
-        q = q.where(Client.manager_id == manager_id)
-    rows = session.exec(q).all()
+    rows = session.exec(_client_summaries_query(manager_id)).all()
+    return [{"user_id": int(uid), "first_name": fn, "last_name": ln} for uid, fn, ln in rows]
+
+
+async def list_client_summaries_async(session: AsyncSession, *, manager_id: int | None = None) -> list[dict]:
+    rows = (await session.exec(_client_summaries_query(manager_id))).all()
     return [{"user_id": int(uid), "first_name": fn, "last_name": ln} for uid, fn, ln in rows]
 
 
+def _client_with_user_query(client_id: int):
+    return select(Client, User).join(User, User.id == Client.user_id).where(Client.user_id == client_id)
+
+
 def get_client_with_user(session: Session, client_id: int) -> tuple[Client, User] | None:
-    q = select(Client, User).join(User, User.id == Client.user_id).where(Client.user_id == client_id)
-    row = session.exec(q).first()
+    row = session.exec(_client_with_user_query(client_id)).first()
+    if row is None:
+        return None
+    return row
+
+
+async def get_client_with_user_async(session: AsyncSession, client_id: int) -> tuple[Client, User] | None:
+    row = (await session.exec(_client_with_user_query(client_id))).first()
     if row is None:
         return None
-    return row
\ No newline at end of file
+    return row
+
+
+CLIENT_PAGE_SORTS = ("user_id", "score", "-score")
+
+
+def _encode_cursor(values: dict) -> str:
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort: str) -> dict:
+    """Курсор действителен только для той сортировки, с которой выдан (в нём ключ сортировки)."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        int(values["id"])
+        if sort != "user_id":
+            float(values["score"])
+    except Exception as e:
+        raise ValueError("Invalid cursor") from e
+    if values.get("sort", "user_id") != sort:
+        raise ValueError(f"Cursor was issued for sort={values.get('sort', 'user_id')}, not sort={sort}")
+    return values
+
+
+def _client_page_query(
+    *,
+    manager_id: int | None,
+    limit: int,
+    cursor: str | None,
+    name: str | None,
+    age_group: str | None,
+    has_score: bool | None,
+    score_min: float | None,
+    score_max: float | None,
+    sort: str,
+    delinquency_min: int | None = None,
+    overdue_months_min: int | None = None,
+    late_within_months: int | None = None,
+):
+    if sort not in CLIENT_PAGE_SORTS:
+        raise ValueError(f"sort must be one of {CLIENT_PAGE_SORTS}")
+    # Sorting by score only makes sense for scored clients.
+    if has_score is False and sort != "user_id":
+        raise ValueError("has_score=false cannot be combined with sort by score")
+
+    q = (
+        select(Client.user_id, User.first_name, User.last_name, Client.age_group, LatestScore.score)
+        .join(User, User.id == Client.user_id)
+        .outerjoin(LatestScore, LatestScore.client_id == Client.user_id)
+    )
+    if manager_id is not None:
+        q = q.where(Client.manager_id == manager_id)
+    if name:
+        prefix = name.strip().lower()
+        q = q.where(
+            or_(
+                func.lower(User.last_name).startswith(prefix, autoescape=True),
+                func.lower(User.first_name).startswith(prefix, autoescape=True),
+            )
+        )
+    if age_group:
+        q = q.where(Client.age_group == age_group)
+    if has_score or sort != "user_id":
+        q = q.where(LatestScore.client_id != None)  # noqa: E711
+    elif has_score is False:
+        q = q.where(LatestScore.client_id == None)  # noqa: E711
+    if score_min is not None:
+        q = q.where(LatestScore.score >= score_min)
+    if score_max is not None:
+        q = q.where(LatestScore.score <= score_max)
+    # Risk filters use the precomputed (indexed) Credit aggregates.
+    if delinquency_min is not None or overdue_months_min is not None or late_within_months is not None:
+        q = q.join(Credit, Credit.client_id == Client.user_id)
+        if delinquency_min is not None:
+            q = q.where(Credit.worst_delinquency_12m >= delinquency_min)
+        if overdue_months_min is not None:
+            q = q.where(Credit.overdue_months >= overdue_months_min)
+        if late_within_months is not None:
+            q = q.where(Credit.months_since_last_late <= late_within_months)
+
+    after = _decode_cursor(cursor, sort) if cursor else None
+    if sort == "user_id":
+        if after:
+            q = q.where(Client.user_id > int(after["id"]))
+        q = q.order_by(Client.user_id)
+    elif sort == "score":
+        if after:
+            s, i = float(after["score"]), int(after["id"])
+            q = q.where(or_(LatestScore.score > s, and_(LatestScore.score == s, Client.user_id > i)))
+        q = q.order_by(LatestScore.score, Client.user_id)
+    else:
+        if after:
+            s, i = float(after["score"]), int(after["id"])
+            q = q.where(or_(LatestScore.score < s, and_(LatestScore.score == s, Client.user_id < i)))
+        q = q.order_by(LatestScore.score.desc(), Client.user_id.desc())
+    # One extra row tells whether there is a next page.
+    return q.limit(limit + 1)
+
+
+def _client_page_from_rows(rows, limit: int, sort: str) -> tuple[list[dict], str | None]:
+    items = [
+        {"user_id": int(uid), "first_name": fn, "last_name": ln, "age_group": ag, "score": score}
+        for uid, fn, ln, ag, score in rows[:limit]
+    ]
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = _encode_cursor({"sort": sort, "id": last["user_id"], "score": last["score"]})
+    return items, next_cursor
+
+
+def list_client_page(
+    session: Session,
+    *,
+    manager_id: int | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    name: str | None = None,
+    age_group: str | None = None,
+    has_score: bool | None = None,
+    score_min: float | None = None,
+    score_max: float | None = None,
+    sort: str = "user_id",
+    delinquency_min: int | None = None,
+    overdue_months_min: int | None = None,
+    late_within_months: int | None = None,
+) -> tuple[list[dict], str | None]:
+    """
+    Keyset-paginated, filterable client list for the manager UI.
+    Risk filters: delinquency_min (worst delinquency level over the last 12 months),
+    overdue_months_min, late_within_months (last late payment at most that many months ago).
+    Returns ({user_id, first_name, last_name, age_group, score} rows, next_cursor).
+    Raises ValueError on a malformed cursor, a cursor issued for another sort, or unknown sort.
+    """
+    q = _client_page_query(
+        manager_id=manager_id, limit=limit, cursor=cursor, name=name, age_group=age_group,
+        has_score=has_score, score_min=score_min, score_max=score_max, sort=sort,
+        delinquency_min=delinquency_min, overdue_months_min=overdue_months_min,
+        late_within_months=late_within_months,
+    )
+    return _client_page_from_rows(session.exec(q).all(), limit, sort)
+
+
+async def list_client_page_async(
+    session: AsyncSession,
+    *,
+    manager_id: int | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    name: str | None = None,
+    age_group: str | None = None,
+    has_score: bool | None = None,
+    score_min: float | None = None,
+    score_max: float | None = None,
+    sort: str = "user_id",
+    delinquency_min: int | None = None,
+    overdue_months_min: int | None = None,
+    late_within_months: int | None = None,
+) -> tuple[list[dict], str | None]:
+    q = _client_page_query(
+        manager_id=manager_id, limit=limit, cursor=cursor, name=name, age_group=age_group,
+        has_score=has_score, score_min=score_min, score_max=score_max, sort=sort,
+        delinquency_min=delinquency_min, overdue_months_min=overdue_months_min,
+        late_within_months=late_within_months,
+    )
+    return _client_page_from_rows((await session.exec(q)).all(), limit, sort)
+
+
+NAME_SEARCH_TIMEOUT_MS = int(os.environ.get("NAME_SEARCH_TIMEOUT_MS", "200"))
+
+
+def _search_clients_query(query: str, manager_id: int | None, limit: int):
+    """
+    Postgres (pg_trgm): substring and trigram-similarity matches on last/first name and login,
+    served by the ix_user_*_trgm GIN indexes. Prefix matches rank first, then similarity.
+    """
+    q = query.strip().lower()
+    cols = [func.lower(User.last_name), func.lower(User.first_name), func.lower(User.login)]
+    rank = func.greatest(*(func.similarity(c, q) for c in cols)) + case(
+        (or_(*(c.startswith(q, autoescape=True) for c in cols)), 1.0), else_=0.0
+    )
+    stmt = (
+        select(Client.user_id, User.first_name, User.last_name, User.login)
+        .join(User, User.id == Client.user_id)
+        .where(or_(*(c.contains(q, autoescape=True) for c in cols), *(c.op("%")(q) for c in cols)))
+    )
+    if manager_id is not None:
+        stmt = stmt.where(Client.manager_id == manager_id)
+    return stmt.order_by(rank.desc(), Client.user_id).limit(limit)
+
+
+def _name_index_rows_query():
+    return select(Client.user_id, User.first_name, User.last_name, User.login, Client.manager_id).join(
+        User, User.id == Client.user_id
+    )
+
+
+def _search_hits(rows) -> list[dict]:
+    return [{"user_id": int(uid), "first_name": fn, "last_name": ln, "login": login} for uid, fn, ln, login in rows]
+
+
+def _is_statement_timeout(e: DBAPIError) -> bool:
+    return "statement timeout" in str(e.orig)
+
+
+def search_clients(session: Session, query: str, *, manager_id: int | None = None, limit: int = 10) -> list[dict]:
+    """
+    Поиск клиентов по фамилии/имени/логину (search-as-you-type), не более limit совпадений.
+    На Postgres - trigram-индексы pg_trgm с ограничением NAME_SEARCH_TIMEOUT_MS
+    (по таймауту возвращается пустой список), на остальных СУБД - in-memory индекс.
+    """
+    if not query.strip():
+        return []
+    if session.get_bind().dialect.name != "postgresql":
+        index = get_name_search_index()
+        if index.stale:
+            index.rebuild(session.exec(_name_index_rows_query()).all())
+        return index.search(query, manager_id=manager_id, limit=limit)
+
+    try:
+        session.execute(text(f"SET LOCAL statement_timeout = {NAME_SEARCH_TIMEOUT_MS}"))
+        rows = session.exec(_search_clients_query(query, manager_id, limit)).all()
+    except DBAPIError as e:
+        session.rollback()
+        if not _is_statement_timeout(e):
+            raise
+        logger.warning(f"Поиск клиентов {query!r} не уложился в {NAME_SEARCH_TIMEOUT_MS} мс")
+        return []
+    return _search_hits(rows)
+
+
+async def search_clients_async(
+    session: AsyncSession, query: str, *, manager_id: int | None = None, limit: int = 10
+) -> list[dict]:
+    if not query.strip():
+        return []
+    if session.bind.dialect.name != "postgresql":
+        index = get_name_search_index()
+        if index.stale:
+            index.rebuild((await session.exec(_name_index_rows_query())).all())
+        return index.search(query, manager_id=manager_id, limit=limit)
+
+    try:
+        await session.execute(text(f"SET LOCAL statement_timeout = {NAME_SEARCH_TIMEOUT_MS}"))
+        rows = (await session.exec(_search_clients_query(query, manager_id, limit))).all()
+    except DBAPIError as e:
+        await session.rollback()
+        if not _is_statement_timeout(e):
+            raise
+        logger.warning(f"Поиск клиентов {query!r} не уложился в {NAME_SEARCH_TIMEOUT_MS} мс")
+        return []
+    return _search_hits(rows)
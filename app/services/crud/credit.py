@@ -1,6 +1,7 @@
 from models.client import Client
 from models.credit import Credit
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 from loguru import logger
 from typing import Any
 from sqlmodel import select
@@ -21,9 +22,9 @@ def assign_credit(
             client_id=client.user_id,
             amount_total=amount_total,
             annual_rate=annual_rate,
-            payment_history=payment_history,
             client=client,
         )
+        credit.set_payment_history(payment_history)
         session.add(credit)
         session.commit()
         session.refresh(credit)
@@ -42,4 +43,14 @@ def get_credit_by_client_id(
     """
     Получить кредит по client_id (user_id клиента).
     """
-    return session.exec(select(Credit).where(Credit.client_id == client_id)).first()
\ No newline at end of file
+    return session.exec(select(Credit).where(Credit.client_id == client_id)).first()
+
+
+async def get_credit_by_client_id_async(
+    client_id: int,
+    session: AsyncSession,
+) -> Credit | None:
+    """
+    Асинхронный вариант get_credit_by_client_id.
+    """
+    return (await session.exec(select(Credit).where(Credit.client_id == client_id))).first()
@@ -0,0 +1,71 @@
+from sqlalchemy.orm import aliased
+from sqlmodel import Session, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from models.client import Client
+from models.credit import Credit
+from models.scoring import LatestScore, Score
+from models.user import User
+
+
+def _client_dashboard_query(user_id: int):
+    """
+    Everything the client dashboard needs in one statement:
+    Client + manager name + credit (without payment_history) + latest Score.
+    """
+    manager_user = aliased(User)
+    return (
+        select(
+            Client,
+            manager_user.first_name,
+            manager_user.last_name,
+            Credit.id,
+            Credit.timestamp,
+            Credit.amount_total,
+            Credit.annual_rate,
+            Score,
+        )
+        # Manager shares its primary key with User, so the name is one join away.
+        .outerjoin(manager_user, manager_user.id == Client.manager_id)
+        .outerjoin(Credit, Credit.client_id == Client.user_id)
+        .outerjoin(LatestScore, LatestScore.client_id == Client.user_id)
+        .outerjoin(Score, Score.id == LatestScore.score_id)
+        .where(Client.user_id == user_id)
+    )
+
+
+def _dashboard_from_row(row) -> dict | None:
+    if row is None:
+        return None
+    client, m_first, m_last, credit_id, credit_ts, amount_total, annual_rate, score = row
+    return {
+        "client": client,
+        "manager": (
+            {"user_id": int(client.manager_id), "first_name": m_first, "last_name": m_last}
+            if client.manager_id is not None and m_first is not None
+            else None
+        ),
+        "credit": (
+            {
+                "id": credit_id,
+                "timestamp": credit_ts,
+                "client_id": client.user_id,
+                "amount_total": amount_total,
+                "annual_rate": annual_rate,
+            }
+            if credit_id is not None
+            else None
+        ),
+        "score": score,
+    }
+
+
+def get_client_dashboard(user_id: int, session: Session) -> dict | None:
+    """
+    Returns {client, manager, credit, score} for the client dashboard, or None if no such client.
+    """
+    return _dashboard_from_row(session.exec(_client_dashboard_query(user_id)).first())
+
+
+async def get_client_dashboard_async(user_id: int, session: AsyncSession) -> dict | None:
+    return _dashboard_from_row((await session.exec(_client_dashboard_query(user_id))).first())
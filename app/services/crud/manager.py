@@ -1,10 +1,13 @@
 from loguru import logger
 from sqlmodel import Session
 from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
 from models.manager import Manager
 from models.client import Client
 from models.user import User
 from models.enum import UserRole
+from services.name_search import get_name_search_index
+from services.principal import get_principal_cache
 
 
 def create_manager(
@@ -45,6 +48,8 @@ def dismiss_manager(
         manager.user.role = UserRole.DISMISSED
         session.commit()
         session.refresh(manager)
+        get_name_search_index().invalidate()
+        get_principal_cache().invalidate(manager.user_id)
         logger.info(f"Менеджер {manager.user.login} id: {manager.user.id} уволен")
         return manager
     except Exception as e:
@@ -57,17 +62,40 @@ def get_manager_by_user_id(user_id: int, session: Session) -> Manager | None:
     return session.get(Manager, user_id)
 
 
-def get_manager_summary(manager_id: int, session: Session) -> dict | None:
+async def get_manager_by_user_id_async(user_id: int, session: AsyncSession) -> Manager | None:
+    return await session.get(Manager, user_id)
+
+
+async def get_manager_role_async(user_id: int, session: AsyncSession) -> UserRole | None:
     """
-    Returns {user_id, first_name, last_name} for manager.
+    Текущая роль пользователя-менеджера (None, если записи Manager нет) - одним запросом.
     """
-    q = (
+    q = select(User.role).join(Manager, Manager.user_id == User.id).where(Manager.user_id == user_id)
+    return (await session.exec(q)).first()
+
+
+def _manager_summary_query(manager_id: int):
+    return (
         select(Manager.user_id, User.first_name, User.last_name)
         .join(User, User.id == Manager.user_id)
         .where(Manager.user_id == manager_id)
     )
-    row = session.exec(q).first()
+
+
+def get_manager_summary(manager_id: int, session: Session) -> dict | None:
+    """
+    Returns {user_id, first_name, last_name} for manager.
+    """
+    row = session.exec(_manager_summary_query(manager_id)).first()
+    if row is None:
+        return None
+    uid, fn, ln = row
+    return {"user_id": int(uid), "first_name": fn, "last_name": ln}
+
+
+async def get_manager_summary_async(manager_id: int, session: AsyncSession) -> dict | None:
+    row = (await session.exec(_manager_summary_query(manager_id))).first()
     if row is None:
         return None
     uid, fn, ln = row
-    return {"user_id": int(uid), "first_name": fn, "last_name": ln}
\ No newline at end of file
+    return {"user_id": int(uid), "first_name": fn, "last_name": ln}
@@ -1,19 +1,29 @@
-import json
-import os
-import time
+import asyncio
 import uuid
+from datetime import datetime
 from typing import Any
 
-import pika
 from loguru import logger
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from models.client import Client
-from models.scoring import Score
-from sqlmodel import select
+from models.enum import ScoringJobStatus
+from models.scoring import LatestScore, ScoringJob, Score
+from services.crud.client import count_clients, iter_client_chunks
+from services.prediction_cache import get_prediction_cache, model_version
+from services.rpc_client import LANE_BULK, LANE_INTERACTIVE, ScoringError
+from services.scoring_backend import get_scoring_backend
+from services.single_flight import AdvisoryLock, advisory_locks_enabled, get_single_flight
+from sqlmodel import func, select
 
 
-QUEUE_NAME = "ml_scoring_queue"
+SCORING_JOB_CHUNK_SIZE = 200
+SCORING_JOB_RPC_TIMEOUT_S = 60.0
 
 
 def _client_features(client: Client) -> dict[str, Any]:
@@ -45,85 +55,420 @@ def _client_features(client: Client) -> dict[str, Any]:
     }
 
 
-def _rpc_call(payload: dict[str, Any], *, timeout_s: float = 15.0) -> dict[str, Any]:
-    host = os.environ.get("RABBITMQ_HOST", "rabbitmq")
-    port = int(os.environ.get("RABBITMQ_PORT", "5672"))
-    user = os.environ.get("RABBITMQ_USER", "guest")
-    password = os.environ.get("RABBITMQ_PASSWORD", "guest")
+def _rpc_call(payload: dict[str, Any], *, timeout_s: float = 15.0, lane: str = LANE_INTERACTIVE) -> dict[str, Any]:
+    """
+    Sends payload to the configured scoring backend (ml-worker over RabbitMQ, or the in-process
+    fallback, see services.scoring_backend) and waits for the reply.
+    Batch jobs use the bulk lane so they never queue in front of interactive requests.
+    """
+    return get_scoring_backend().call(payload, timeout_s=timeout_s, lane=lane)
+
+
+async def _rpc_call_async(payload: dict[str, Any], *, timeout_s: float = 15.0) -> dict[str, Any]:
+    """
+    asyncio-native variant of _rpc_call: awaits the reply without blocking the event loop.
+    """
+    return await get_scoring_backend().call_async(payload, timeout_s=timeout_s)
 
-    params = pika.ConnectionParameters(
-        host=host,
-        port=port,
-        virtual_host="/",
-        credentials=pika.PlainCredentials(username=user, password=password),
-        heartbeat=30,
-        blocked_connection_timeout=2,
+
+def _upsert_latest_scores(scores: list[Score], session: Session) -> None:
+    """
+    Points each client's LatestScore row at its score from `scores` (caller commits, same
+    transaction as the Score insert). A single INSERT ... ON CONFLICT (client_id) DO UPDATE:
+    the first two scores of a client saved concurrently must not both try to insert the row,
+    and a score older than the stored one must not replace it.
+    """
+    if not scores:
+        return
+    dialect = session.get_bind().dialect.name
+    insert = pg_insert if dialect == "postgresql" else sqlite_insert
+    stmt = insert(LatestScore).values(
+        [
+            {"client_id": s.client_id, "score_id": s.id, "score": s.score, "timestamp": s.timestamp,
+             "model_version": s.model_version}
+            for s in scores
+        ]
     )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[LatestScore.client_id],
+        set_={
+            "score_id": stmt.excluded.score_id,
+            "score": stmt.excluded.score,
+            "timestamp": stmt.excluded.timestamp,
+            "model_version": stmt.excluded.model_version,
+        },
+        where=LatestScore.timestamp <= stmt.excluded.timestamp,
+    )
+    session.execute(stmt)
+    # Rows already loaded in this session would otherwise keep their pre-upsert values.
+    for score_obj in scores:
+        latest = session.identity_map.get(session.identity_key(LatestScore, score_obj.client_id))
+        if latest is not None:
+            session.expire(latest)
 
-    conn = pika.BlockingConnection(params)
-    ch = conn.channel()
 
-    result = ch.queue_declare(queue="", exclusive=True)
-    callback_queue = result.method.queue
+def add_score(
+    client_id: int,
+    proba: float,
+    session: Session,
+    model_version: str | None = None,
+    request_id: str | None = None,
+) -> Score:
+    """
+    Adds a Score row and moves the client's LatestScore to it. Does not commit.
+    """
+    score_obj = Score(
+        client_id=client_id,
+        score=proba,
+        model_version=model_version,
+        request_id=request_id,
+    )
+    session.add(score_obj)
+    session.flush()
+    _upsert_latest_scores([score_obj], session)
+    return score_obj
 
-    corr_id = str(uuid.uuid4())
-    response: dict[str, Any] | None = None
 
-    def on_resp(_ch, _m, props, body) -> None:
-        nonlocal response
-        if props.correlation_id != corr_id:
-            return
-        try:
-            response = json.loads(body)
-        except Exception:
-            response = {"status": "error", "error": "Invalid JSON response from ml-worker"}
-
-    ch.basic_consume(queue=callback_queue, on_message_callback=on_resp, auto_ack=True)
-    ch.basic_publish(
-        exchange="",
-        routing_key=QUEUE_NAME,
-        properties=pika.BasicProperties(reply_to=callback_queue, correlation_id=corr_id),
-        body=json.dumps(payload),
+def add_scores(
+    probas: dict[int, float],
+    session: Session,
+    *,
+    versions: dict[int, str] | None = None,
+    request_ids: dict[int, str] | None = None,
+) -> list[Score]:
+    """
+    Bulk variant of add_score for {client_id: proba} (and {client_id: model version}): one flush
+    for the Score rows and one upsert for the affected LatestScore rows. Does not commit.
+    Clients whose request id already has a Score row are skipped (the request was saved before).
+    """
+    versions = versions or {}
+    request_ids = request_ids or {}
+    if request_ids:
+        done = set(session.exec(select(Score.request_id).where(Score.request_id.in_(list(request_ids.values())))))
+        probas = {cid: p for cid, p in probas.items() if request_ids.get(cid) not in done}
+    if not probas:
+        return []
+    scores = [
+        Score(client_id=client_id, score=proba, model_version=versions.get(client_id),
+              request_id=request_ids.get(client_id))
+        for client_id, proba in probas.items()
+    ]
+    session.add_all(scores)
+    session.flush()
+
+    _upsert_latest_scores(scores, session)
+    return scores
+
+
+def _proba_from_response(resp: dict[str, Any]) -> float:
+    if resp.get("status") != "success":
+        raise ScoringError(f"ml-worker error: {resp.get('error', resp)}", code=resp.get("code") or "worker_error")
+    return float(resp["proba"])
+
+
+def _request_id(client: Client, idempotency_key: str | None) -> str:
+    # Scoped by client: the same key sent for two clients names two requests.
+    return f"{client.user_id}:{idempotency_key}" if idempotency_key else uuid.uuid4().hex
+
+
+def _get_score_by_request_id(request_id: str, session: Session) -> Score | None:
+    return session.exec(select(Score).where(Score.request_id == request_id)).first()
+
+
+def _save_score(
+    client: Client,
+    proba: float,
+    version: str,
+    request_id: str,
+    input_key: str,
+    session: Session,
+    *,
+    cached: bool = False,
+) -> Score:
+    score_obj = add_score(client.user_id, proba, session, model_version=version, request_id=request_id)
+    score_obj.input_hash = input_key[:16]
+    try:
+        session.commit()
+    except IntegrityError:
+        # A concurrent duplicate of the same request saved its Score first.
+        session.rollback()
+        existing = _get_score_by_request_id(request_id, session)
+        if existing is None:
+            raise
+        return existing
+    session.refresh(score_obj)
+    logger.info(f"Scored client={client.user_id}: proba={proba} model={version}{' (cached)' if cached else ''}")
+    return score_obj
+
+
+def _shared_score(client: Client, input_key: str, since: datetime, session: Session) -> Score | None:
+    """Score for the same input saved by another process while we waited for its advisory lock."""
+    q = (
+        select(Score)
+        .where(Score.client_id == client.user_id, Score.input_hash == input_key[:16], Score.timestamp >= since)
+        .order_by(Score.timestamp.desc())
     )
+    return session.exec(q).first()
+
+
+def _advisory_lock(client: Client, input_key: str, session: Session) -> AdvisoryLock | None:
+    engine = session.get_bind()
+    return AdvisoryLock(engine, f"score:{client.user_id}:{input_key}") if advisory_locks_enabled(engine) else None
+
+
+def _score_once(
+    client: Client, features: dict[str, Any], version: str, input_key: str, request_id: str, session: Session
+) -> Score:
+    since = datetime.utcnow()
+    lock = _advisory_lock(client, input_key, session)
+    try:
+        if lock is not None and lock.acquire() and (shared := _shared_score(client, input_key, since, session)):
+            return shared
+        proba = get_prediction_cache().get(input_key)
+        if proba is not None:
+            return _save_score(client, proba, version, request_id, input_key, session, cached=True)
+
+        resp = _rpc_call({"client_id": client.user_id, "features": features, "request_id": request_id})
+        proba = _proba_from_response(resp)
+        # The worker may already run a newer model than the file this process has hashed.
+        scored_by = resp.get("model_version") or version
+        get_prediction_cache().put(get_prediction_cache().make_key(features, scored_by), proba, client.user_id)
+        return _save_score(client, proba, scored_by, request_id, input_key, session)
+    finally:
+        if lock is not None:
+            lock.release()
 
-    started = time.time()
-    while response is None and (time.time() - started) < timeout_s:
-        conn.process_data_events(time_limit=1)
 
+async def _score_once_async(
+    client: Client, features: dict[str, Any], version: str, input_key: str, request_id: str, session: Session
+) -> Score:
+    since = datetime.utcnow()
+    lock = _advisory_lock(client, input_key, session)
     try:
-        conn.close()
-    except Exception:
-        pass
+        # The Session is synchronous: its queries and the commit run in a worker thread, so the
+        # event loop (and the advisory lock held around the RPC) only ever waits on awaitables.
+        if (
+            lock is not None
+            and await lock.acquire_async()
+            and (shared := await asyncio.to_thread(_shared_score, client, input_key, since, session))
+        ):
+            return shared
+        proba = get_prediction_cache().get(input_key)
+        if proba is not None:
+            return await asyncio.to_thread(
+                _save_score, client, proba, version, request_id, input_key, session, cached=True
+            )
 
-    if response is None:
-        return {"status": "error", "error": f"ml-worker timeout after {timeout_s}s"}
-    return response
+        resp = await _rpc_call_async({"client_id": client.user_id, "features": features, "request_id": request_id})
+        proba = _proba_from_response(resp)
+        scored_by = resp.get("model_version") or version
+        get_prediction_cache().put(get_prediction_cache().make_key(features, scored_by), proba, client.user_id)
+        return await asyncio.to_thread(_save_score, client, proba, scored_by, request_id, input_key, session)
+    finally:
+        if lock is not None:
+            await lock.release_async()
 
 
-def score_client(client: Client, session: Session) -> Score:
+def score_client(client: Client, session: Session, *, idempotency_key: str | None = None) -> Score:
     """
-    Calls ml-worker and stores resulting score (proba) into Score table.
+    Calls ml-worker and stores resulting score (proba) into Score table, together with the
+    version of the model that produced it (as reported by ml-worker).
+    Unchanged features under the same model version are answered from the prediction cache.
+    Concurrent calls for the same client and input (features + model version) are coalesced:
+    one RPC, one Score row, shared by all callers - within the process via single-flight and,
+    with SCORE_ADVISORY_LOCK=1 on Postgres, across processes via an advisory lock.
+    A repeated call with the same idempotency_key returns the Score saved the first time.
+    Raises ScoringError (with a code) if ml-worker cannot score the client.
     """
-    payload = {"client_id": client.user_id, "features": _client_features(client)}
-    resp = _rpc_call(payload)
-    if resp.get("status") != "success":
-        raise RuntimeError(f"ml-worker error: {resp}")
+    request_id = _request_id(client, idempotency_key)
+    if idempotency_key and (existing := _get_score_by_request_id(request_id, session)) is not None:
+        return existing
+    features = _client_features(client)
+    version = model_version()
+    input_key = get_prediction_cache().make_key(features, version)
+    score_id = get_single_flight().run(
+        f"{client.user_id}:{input_key}",
+        lambda: _score_once(client, features, version, input_key, request_id, session).id,
+    )
+    # Followers read the leader's committed row through their own session.
+    return session.get(Score, score_id)
 
-    proba = float(resp["proba"])
-    score_obj = Score(
-        client_id=client.user_id,
-        score=proba,
+
+async def score_client_async(
+    client: Client, session: Session, *, idempotency_key: str | None = None
+) -> Score:
+    """
+    Same as score_client, but awaits the ml-worker reply (for use from async handlers).
+    Database work on the (synchronous) session runs in a worker thread, off the event loop.
+    """
+    request_id = _request_id(client, idempotency_key)
+    if idempotency_key:
+        existing = await asyncio.to_thread(_get_score_by_request_id, request_id, session)
+        if existing is not None:
+            return existing
+    features = _client_features(client)
+    version = model_version()
+    input_key = get_prediction_cache().make_key(features, version)
+
+    async def _leader() -> int:
+        return (await _score_once_async(client, features, version, input_key, request_id, session)).id
+
+    score_id = await get_single_flight().run_async(f"{client.user_id}:{input_key}", _leader)
+    return await asyncio.to_thread(session.get, Score, score_id)
+
+
+def _latest_score_query(client_id: int):
+    return (
+        select(Score)
+        .join(LatestScore, LatestScore.score_id == Score.id)
+        .where(LatestScore.client_id == client_id)
     )
-    session.add(score_obj)
-    session.commit()
-    session.refresh(score_obj)
-    logger.info(f"Scored client={client.user_id}: proba={proba}")
-    return score_obj
 
 
 def get_latest_score(client_id: int, session: Session) -> Score | None:
-    return session.exec(
-        select(Score).where(Score.client_id == client_id).order_by(Score.timestamp.desc())
-    ).first()
+    return session.exec(_latest_score_query(client_id)).first()
+
+
+async def get_latest_score_async(client_id: int, session: AsyncSession) -> Score | None:
+    return (await session.exec(_latest_score_query(client_id))).first()
+
+
+def backfill_latest_scores(session: Session) -> int:
+    """
+    Creates LatestScore rows for clients that have Score history but no LatestScore yet
+    (e.g. scores written before the table existed). Returns number of rows created.
+    """
+    ranked = select(
+        Score.id,
+        Score.client_id,
+        Score.score,
+        Score.timestamp,
+        Score.model_version,
+        func.row_number()
+        .over(partition_by=Score.client_id, order_by=(Score.timestamp.desc(), Score.id.desc()))
+        .label("rn"),
+    ).subquery()
+    q = (
+        select(ranked.c.id, ranked.c.client_id, ranked.c.score, ranked.c.timestamp, ranked.c.model_version)
+        .outerjoin(LatestScore, LatestScore.client_id == ranked.c.client_id)
+        .where(ranked.c.rn == 1, LatestScore.client_id == None)  # noqa: E711
+    )
+    rows = session.exec(q).all()
+    session.add_all(
+        LatestScore(client_id=client_id, score_id=score_id, score=score, timestamp=ts, model_version=version)
+        for score_id, client_id, score, ts, version in rows
+    )
+    session.commit()
+    return len(rows)
+
+
+def create_scoring_job(
+    manager_id: int, session: Session, *, all_clients: bool = False, stale_only: bool = False
+) -> ScoringJob:
+    """
+    Регистрирует пакетный пересчёт скоров (сам расчёт - run_scoring_job).
+    stale_only=True - только клиенты, чей текущий скор посчитан не текущей версией модели.
+    """
+    version = model_version()
+    job = ScoringJob(
+        manager_id=manager_id,
+        all_clients=all_clients,
+        stale_only=stale_only,
+        model_version=version,
+        total=count_clients(
+            session,
+            manager_id=None if all_clients else manager_id,
+            stale_for=version if stale_only else None,
+        ),
+    )
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    logger.info(
+        f"Scoring job {job.id} created: manager={manager_id} all={all_clients} stale_only={stale_only} "
+        f"model={version} total={job.total}"
+    )
+    return job
+
+
+def get_scoring_job(job_id: int, session: Session) -> ScoringJob | None:
+    return session.get(ScoringJob, job_id)
+
+
+def run_scoring_job(job_id: int, engine: Engine, *, chunk_size: int | None = None) -> None:
+    """
+    Scores every client of the job's scope: clients are streamed in chunks, each chunk goes to
+    ml-worker as a single multi-item RPC message and its Score rows are inserted in one transaction.
+    Progress is committed after every chunk, so get_scoring_job can be polled meanwhile.
+    A stale_only job skips clients whose current score already comes from job.model_version,
+    so a model deploy only rescores what the new model has not seen.
+    Runs in its own session (intended for a background thread).
+    """
+    chunk_size = chunk_size or SCORING_JOB_CHUNK_SIZE
+    with Session(engine) as session:
+        job = session.get(ScoringJob, job_id)
+        if job is None:
+            return
+        job.status = ScoringJobStatus.RUNNING
+        session.add(job)
+        session.commit()
+
+        try:
+            manager_id = None if job.all_clients else job.manager_id
+            cache = get_prediction_cache()
+            version = model_version()
+            stale_for = job.model_version if job.stale_only else None
+            chunks = iter_client_chunks(session, manager_id=manager_id, chunk_size=chunk_size, stale_for=stale_for)
+            for chunk in chunks:
+                probas: dict[int, float] = {}
+                versions: dict[int, str] = {}
+                misses: dict[int, dict[str, Any]] = {}
+                for c in chunk:
+                    features = _client_features(c)
+                    proba = cache.get(cache.make_key(features, version))
+                    if proba is None:
+                        misses[c.user_id] = features
+                    else:
+                        probas[c.user_id] = proba
+                        versions[c.user_id] = version
+
+                if misses:
+                    payload = {
+                        "request_id": f"job-{job_id}:{chunk[0].user_id}-{chunk[-1].user_id}",
+                        "items": [{"client_id": cid, "features": f} for cid, f in misses.items()],
+                    }
+                    resp = _rpc_call(payload, timeout_s=SCORING_JOB_RPC_TIMEOUT_S, lane=LANE_BULK)
+                    items = resp.get("items") if resp.get("status") == "success" else None
+                    if items is None:
+                        logger.warning(f"Scoring job {job_id}: chunk of {len(misses)} failed: {resp}")
+                        items = []
+                    for item in items:
+                        if item.get("status") != "success":
+                            continue
+                        client_id = int(item["client_id"])
+                        probas[client_id] = float(item["proba"])
+                        versions[client_id] = item.get("model_version") or resp.get("model_version") or version
+                        if client_id in misses:
+                            key = cache.make_key(misses[client_id], versions[client_id])
+                            cache.put(key, probas[client_id], client_id)
 
+                # One Score per client per job, even if the job runs a chunk again.
+                request_ids = {cid: f"job-{job_id}:{cid}" for cid in probas}
+                add_scores(probas, session, versions=versions, request_ids=request_ids)
+                job.processed += len(chunk)
+                job.failed += len(chunk) - len(probas)
+                session.add(job)
+                session.commit()
 
+            job.status = ScoringJobStatus.DONE
+        except Exception as e:
+            session.rollback()
+            logger.exception(f"Scoring job {job_id} failed: {e}")
+            job.status = ScoringJobStatus.FAILED
+            job.error = str(e)[:1000]
+        job.finished_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+        logger.info(
+            f"Scoring job {job_id} {job.status.value}: processed={job.processed} failed={job.failed} of {job.total}"
+        )
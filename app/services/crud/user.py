@@ -4,6 +4,8 @@ from sqlmodel import Session
 import bcrypt
 from loguru import logger
 from sqlmodel import select
+from services.name_search import get_name_search_index
+from services.principal import get_principal_cache
 
 
 def create_user(
@@ -70,6 +72,8 @@ def delete_user(id: int, session: Session) -> bool:
         if user:
             session.delete(user)
             session.commit()
+            get_name_search_index().invalidate()
+            get_principal_cache().invalidate(id)
             logger.info(f"Пользователь {user.login} id: {user.id} удален")
             return True
         logger.warning(f"Пользователь с ID {id} не найден")
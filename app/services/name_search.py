@@ -0,0 +1,123 @@
+import heapq
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable
+
+
+# pg_trgm's default similarity threshold for the % operator.
+SIMILARITY_THRESHOLD = 0.3
+
+
+def _trigrams(text: str) -> set[str]:
+    # Same padding as pg_trgm: two spaces in front, one behind.
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameSearchIndex:
+    """
+    In-memory trigram + prefix index over client names/logins.
+
+    Fallback for databases without pg_trgm (SQLite in tests and local runs): the rows are
+    loaded once, and queries never touch the database. Ranking mirrors the Postgres path:
+    prefix matches of a name/login first, then trigram similarity.
+    The index is rebuilt after invalidate() (called by the CRUD functions that add clients or
+    move them between managers) or once it is older than max_age_s.
+    """
+
+    def __init__(self, max_age_s: float = 60.0) -> None:
+        self.max_age_s = max_age_s
+        self._lock = threading.Lock()
+        self._loaded_at: float | None = None
+        self._rows: dict[int, tuple[str, str, str, int | None]] = {}
+        # Sorted (token, user_id) pairs for prefix lookups.
+        self._tokens: list[tuple[str, int]] = []
+        self._by_trigram: dict[str, set[int]] = {}
+        self._trigram_sets: dict[int, list[set[str]]] = {}
+
+    @property
+    def stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age_s
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+    def rebuild(self, rows: Iterable[tuple[int, str, str, str, int | None]]) -> None:
+        """rows: (user_id, first_name, last_name, login, manager_id)."""
+        data: dict[int, tuple[str, str, str, int | None]] = {}
+        tokens: list[tuple[str, int]] = []
+        by_trigram: dict[str, set[int]] = {}
+        trigram_sets: dict[int, list[set[str]]] = {}
+        for user_id, first_name, last_name, login, manager_id in rows:
+            data[user_id] = (first_name, last_name, login, manager_id)
+            sets = []
+            for value in (last_name, first_name, login):
+                token = (value or "").lower()
+                tokens.append((token, user_id))
+                grams = _trigrams(token)
+                sets.append(grams)
+                for gram in grams:
+                    by_trigram.setdefault(gram, set()).add(user_id)
+            trigram_sets[user_id] = sets
+        tokens.sort()
+        with self._lock:
+            self._rows, self._tokens = data, tokens
+            self._by_trigram, self._trigram_sets = by_trigram, trigram_sets
+            self._loaded_at = time.monotonic()
+
+    def search(self, query: str, *, manager_id: int | None = None, limit: int = 10) -> list[dict]:
+        q = query.strip().lower()
+        if not q:
+            return []
+        with self._lock:
+            rows, tokens = self._rows, self._tokens
+            by_trigram, trigram_sets = self._by_trigram, self._trigram_sets
+
+        ranked: dict[int, float] = {}
+        i = bisect_left(tokens, (q, -1))
+        while i < len(tokens) and tokens[i][0].startswith(q):
+            ranked[tokens[i][1]] = 2.0
+            i += 1
+
+        # Prefix matches rank above every similarity-only match, so a full page of them is final.
+        enough = len(ranked) >= limit if manager_id is None else (
+            sum(1 for uid in ranked if rows[uid][3] == manager_id) >= limit
+        )
+        if len(q) >= 3 and not enough:
+            q_grams = _trigrams(q)
+            inner = {q[i:i + 3] for i in range(len(q) - 2)}
+            # A candidate needs similarity >= SIMILARITY_THRESHOLD (so at least that share of the
+            # query trigrams) or to contain q as a substring (so every inner trigram of q).
+            need = min(math.ceil(SIMILARITY_THRESHOLD * len(q_grams)), len(inner))
+            counts: Counter[int] = Counter()
+            for gram in q_grams:
+                counts.update(by_trigram.get(gram, ()))
+            for user_id, shared in counts.items():
+                if shared < need or user_id in ranked:
+                    continue
+                if manager_id is not None and rows[user_id][3] != manager_id:
+                    continue
+                similarity = max(
+                    len(q_grams & grams) / len(q_grams | grams) for grams in trigram_sets[user_id]
+                )
+                if similarity >= SIMILARITY_THRESHOLD or any(q in (v or "").lower() for v in rows[user_id][:3]):
+                    ranked[user_id] = 1.0 + similarity
+
+        if manager_id is not None:
+            ranked = {uid: r for uid, r in ranked.items() if rows[uid][3] == manager_id}
+        top = heapq.nsmallest(limit, ranked.items(), key=lambda item: (-item[1], item[0]))
+        return [
+            {"user_id": uid, "first_name": rows[uid][0], "last_name": rows[uid][1], "login": rows[uid][2]}
+            for uid, _ in top
+        ]
+
+
+@lru_cache(maxsize=1)
+def get_name_search_index() -> NameSearchIndex:
+    """Process-wide fallback name index (see services.crud.client.search_clients)."""
+    return NameSearchIndex(max_age_s=float(os.environ.get("NAME_SEARCH_INDEX_MAX_AGE_S", "60")))
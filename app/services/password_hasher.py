@@ -0,0 +1,87 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Callable
+
+from services.crud.user import hash_password, verify_password
+
+
+class HasherBusyError(RuntimeError):
+    """All hasher threads are busy and the wait queue is full."""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt off the event loop on a dedicated, size-limited thread pool.
+
+    bcrypt releases the GIL, so `workers` logins are verified in parallel while the event loop
+    keeps serving other requests. At most `max_queue` further calls may wait for a free thread;
+    beyond that the call is rejected right away with HasherBusyError (the API answers 429)
+    instead of piling up latency for everyone.
+    """
+
+    def __init__(self, workers: int = 4, max_queue: int = 32, *, window: int = 1000) -> None:
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies: deque[float] = deque(maxlen=window)
+        self.completed = 0
+        self.rejected = 0
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise HasherBusyError("Password hasher is saturated")
+            self._in_flight += 1
+        started = time.perf_counter()
+        try:
+            return await asyncio.wrap_future(self._executor.submit(fn, *args))
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self._in_flight -= 1
+                self.completed += 1
+                self._latencies.append(elapsed)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self.run(verify_password, password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        return await self.run(hash_password, password)
+
+    def stats(self) -> dict[str, Any]:
+        """Queue depth and latency (queue wait + bcrypt) over the last `window` calls, in ms."""
+        with self._lock:
+            latencies = sorted(self._latencies)
+            in_flight, completed, rejected = self._in_flight, self.completed, self.rejected
+
+        def pct(p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": in_flight,
+            "queued": max(0, in_flight - self.workers),
+            "completed": completed,
+            "rejected": rejected,
+            "latency_ms_p50": pct(0.50),
+            "latency_ms_p95": pct(0.95),
+            "latency_ms_max": latencies[-1] * 1000 if latencies else 0.0,
+        }
+
+
+@lru_cache(maxsize=1)
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hasher (PASSWORD_HASH_WORKERS threads, PASSWORD_HASH_MAX_QUEUE waiting calls)."""
+    return PasswordHasher(
+        workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "4")),
+        max_queue=int(os.environ.get("PASSWORD_HASH_MAX_QUEUE", "32")),
+    )
@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+
+# The API image ships the same app/ tree as ml-worker, so the model file is visible here too.
+MODEL_PATH = Path(__file__).resolve().parents[1] / "ml_worker" / "model.cbm"
+
+
+class PredictionCache:
+    """
+    In-process LRU + TTL cache of ml-worker predictions.
+
+    Keys are a stable hash of (model version, feature vector), so a client whose features
+    did not change gets the cached proba without an RPC round trip, and a new model version
+    never serves old predictions. Entries also remember which clients they were stored for,
+    so update_client can drop them eagerly.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl_s: float = 3600.0) -> None:
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: OrderedDict[str, tuple[float, float, set[int]]] = OrderedDict()
+        self._keys_by_client: dict[int, set[str]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_s > 0
+
+    @staticmethod
+    def make_key(features: dict[str, Any], model_version: str) -> str:
+        blob = json.dumps(features, sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(f"{model_version}|{blob}".encode()).hexdigest()
+
+    def get(self, key: str) -> float | None:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[1] < time.monotonic():
+                if entry is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, proba: float, client_id: int | None = None) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            clients = self._data[key][2] if key in self._data else set()
+            if client_id is not None:
+                clients.add(client_id)
+                self._keys_by_client.setdefault(client_id, set()).add(key)
+            self._data[key] = (proba, time.monotonic() + self.ttl_s, clients)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._drop(next(iter(self._data)))
+                self.evictions += 1
+
+    def invalidate_client(self, client_id: int) -> None:
+        with self._lock:
+            for key in self._keys_by_client.pop(client_id, set()):
+                self._drop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._keys_by_client.clear()
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl_s,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _drop(self, key: str) -> None:
+        # Caller holds the lock.
+        entry = self._data.pop(key, None)
+        if entry is None:
+            return
+        for client_id in entry[2]:
+            keys = self._keys_by_client.get(client_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_client[client_id]
+
+
+@lru_cache(maxsize=1)
+def get_prediction_cache() -> PredictionCache:
+    """Process-wide prediction cache (PREDICTION_CACHE_SIZE=0 disables it)."""
+    return PredictionCache(
+        maxsize=int(os.environ.get("PREDICTION_CACHE_SIZE", "10000")),
+        ttl_s=float(os.environ.get("PREDICTION_CACHE_TTL_S", "3600")),
+    )
+
+
+_model_stat: tuple[int, int] | None = None
+_model_version = "unknown"
+_model_lock = threading.Lock()
+
+
+def model_version(path: Path = MODEL_PATH) -> str:
+    """
+    Short content hash of the model file. The file is only re-hashed when its mtime/size
+    change; a change also clears the prediction cache.
+    """
+    global _model_stat, _model_version
+    try:
+        st = path.stat()
+    except OSError:
+        return _model_version
+    stat_key = (st.st_mtime_ns, st.st_size)
+    if stat_key == _model_stat:
+        return _model_version
+
+    with _model_lock:
+        if stat_key != _model_stat:
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()[:12]
+            if _model_stat is not None and digest != _model_version:
+                logger.info(f"Model file changed ({_model_version} -> {digest}), clearing prediction cache")
+                get_prediction_cache().clear()
+            _model_stat, _model_version = stat_key, digest
+    return _model_version
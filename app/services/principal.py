@@ -0,0 +1,58 @@
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Authenticated caller of the UI API, resolved once per request."""
+
+    user_id: int
+    role: str
+
+
+class PrincipalCache:
+    """
+    Short-TTL in-process cache of verified principals keyed by user_id.
+
+    Only successful lookups are cached, so a user who just became a manager is never locked
+    out. dismiss_manager/delete_user invalidate the entry in this process; other processes
+    pick the change up once the TTL expires.
+    """
+
+    def __init__(self, ttl_s: float = 30.0) -> None:
+        self.ttl_s = ttl_s
+        self._data: dict[int, tuple[Principal, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int) -> Principal | None:
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry is None:
+                return None
+            if entry[1] < time.monotonic():
+                del self._data[user_id]
+                return None
+            return entry[0]
+
+    def put(self, principal: Principal) -> None:
+        if self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._data[principal.user_id] = (principal, time.monotonic() + self.ttl_s)
+
+    def invalidate(self, user_id: int) -> None:
+        with self._lock:
+            self._data.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+@lru_cache(maxsize=1)
+def get_principal_cache() -> PrincipalCache:
+    """Process-wide principal cache (PRINCIPAL_CACHE_TTL_S=0 disables it)."""
+    return PrincipalCache(ttl_s=float(os.environ.get("PRINCIPAL_CACHE_TTL_S", "30")))
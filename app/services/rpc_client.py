@@ -0,0 +1,326 @@
+import asyncio
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Any
+
+import pika
+from loguru import logger
+
+
+QUEUE_NAME = "ml_scoring_queue"
+BULK_QUEUE_NAME = "ml_scoring_bulk_queue"
+# Priority lanes: ml-worker drains the interactive queue first and gives bulk a fair share.
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+LANE_QUEUES = {LANE_INTERACTIVE: QUEUE_NAME, LANE_BULK: BULK_QUEUE_NAME}
+# RabbitMQ direct reply-to pseudo-queue: no per-call queue declare, replies go straight to our consumer.
+REPLY_TO = "amq.rabbitmq.reply-to"
+
+# Error codes of failed calls ("code" in the error reply). The worker adds invalid_request,
+# model_error and retries_exhausted; the client itself reports timeout and unavailable.
+RETRYABLE_CODES = frozenset({"timeout", "unavailable", "model_error", "retries_exhausted"})
+
+
+class ScoringError(RuntimeError):
+    """A scoring call failed; `code` says why, `retryable` whether trying again later may help."""
+
+    def __init__(self, message: str, *, code: str = "worker_error") -> None:
+        super().__init__(message)
+        self.code = code
+        self.retryable = code in RETRYABLE_CODES
+
+
+def error_reply(code: str, message: str) -> dict[str, Any]:
+    return {"status": "error", "code": code, "error": message, "retryable": code in RETRYABLE_CODES}
+
+
+def _connection_params() -> pika.ConnectionParameters:
+    host = os.environ.get("RABBITMQ_HOST", "rabbitmq")
+    port = int(os.environ.get("RABBITMQ_PORT", "5672"))
+    user = os.environ.get("RABBITMQ_USER", "guest")
+    password = os.environ.get("RABBITMQ_PASSWORD", "guest")
+    return pika.ConnectionParameters(
+        host=host,
+        port=port,
+        virtual_host="/",
+        credentials=pika.PlainCredentials(username=user, password=password),
+        heartbeat=30,
+        blocked_connection_timeout=2,
+    )
+
+
+class ScoringRpcClient:
+    """
+    Long-lived, thread-safe RPC client for ml-worker.
+
+    pika connections are not thread-safe, so a single background IO thread owns the
+    connection and channel. Callers hand their request over with add_callback_threadsafe
+    and wait on a Future registered under the message correlation_id; replies arrive on
+    the direct reply-to consumer and resolve the matching Future. Many concurrent
+    score_client calls therefore share one TCP/AMQP connection.
+    If the connection drops, pending calls fail and the next call reconnects.
+    Calls never hang past their timeout: requests carry it as a per-message TTL and a deadline
+    header (the worker skips requests nobody waits for any more), a request no queue accepts
+    is returned by the broker and fails right away, and every failure comes back as a
+    structured error reply (see error_reply) instead of an exception.
+    Every call names its lane (interactive or bulk), which picks the queue it is published to;
+    per-lane in-flight counts and round-trip latencies are kept for stats().
+    """
+
+    def __init__(
+        self,
+        params: pika.ConnectionParameters | None = None,
+        *,
+        queues: dict[str, str] | None = None,
+        connect_timeout_s: float = 10.0,
+        window: int = 1000,
+    ) -> None:
+        self._params = params
+        self._queues = queues or LANE_QUEUES
+        self._connect_timeout_s = connect_timeout_s
+        self._lane_in_flight = {lane: 0 for lane in self._queues}
+        self._lane_completed = {lane: 0 for lane in self._queues}
+        self._lane_timeouts = {lane: 0 for lane in self._queues}
+        self._lane_latencies: dict[str, deque[float]] = {lane: deque(maxlen=window) for lane in self._queues}
+        self._lock = threading.Lock()
+        self._pending: dict[str, Future] = {}
+        self._connection: pika.BlockingConnection | None = None
+        self._channel = None
+        self._thread: threading.Thread | None = None
+        self._closing = False
+
+    def _ensure_started(self) -> pika.BlockingConnection:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._connection is not None:
+                return self._connection
+
+            ready: Future = Future()
+            abandoned = threading.Event()
+            self._closing = False
+            thread = threading.Thread(target=self._run, args=(ready, abandoned), name="ml-rpc-io", daemon=True)
+            thread.start()
+            try:
+                # Re-raises the connection error (if any) in the calling thread.
+                connection, channel = ready.result(timeout=self._connect_timeout_s)
+            except FutureTimeoutError:
+                # The IO thread may still connect later: it must close that connection and exit
+                # instead of living on next to the one the next call opens.
+                abandoned.set()
+                raise
+            # Only the attempt we waited for becomes the client's connection and channel.
+            self._thread, self._connection, self._channel = thread, connection, channel
+            return connection
+
+    def _run(self, ready: Future, abandoned: threading.Event) -> None:
+        try:
+            connection = pika.BlockingConnection(self._params or _connection_params())
+            channel = connection.channel()
+            channel.basic_consume(queue=REPLY_TO, on_message_callback=self._on_reply, auto_ack=True)
+            channel.add_on_return_callback(self._on_return)
+        except Exception as e:
+            ready.set_exception(e)
+            return
+
+        ready.set_result((connection, channel))
+        logger.info("ml-worker RPC client connected")
+        try:
+            while not self._closing and not abandoned.is_set():
+                connection.process_data_events(time_limit=1)
+        except Exception as e:
+            logger.error(f"ml-worker RPC connection lost: {e}")
+        finally:
+            pending: dict[str, Future] = {}
+            with self._lock:
+                # An abandoned attempt never became the client's connection: leave the current one alone.
+                if self._connection is connection:
+                    self._connection = None
+                    self._channel = None
+                    pending, self._pending = self._pending, {}
+            for fut in pending.values():
+                if not fut.done():
+                    fut.set_result(error_reply("unavailable", "ml-worker RPC connection closed"))
+            try:
+                connection.close()
+            except Exception:
+                pass
+
+    def _on_reply(self, _ch, _method, props, body) -> None:
+        with self._lock:
+            fut = self._pending.pop(props.correlation_id, None)
+        if fut is None or fut.done():
+            # Late reply for a call that already timed out.
+            return
+        try:
+            fut.set_result(json.loads(body))
+        except Exception:
+            fut.set_result({"status": "error", "error": "Invalid JSON response from ml-worker"})
+
+    def _on_return(self, _ch, _method, props, _body) -> None:
+        # mandatory=True: the broker hands back a request no queue accepted (no worker ever declared it).
+        self._resolve(props.correlation_id, error_reply("unavailable", "No ml-worker queue accepted the request"))
+
+    def _resolve(self, corr_id: str, reply: dict[str, Any]) -> None:
+        with self._lock:
+            fut = self._pending.pop(corr_id, None)
+        if fut is not None and not fut.done():
+            fut.set_result(reply)
+
+    def _publish(self, corr_id: str, body: str, queue_name: str, request_id: str, timeout_s: float | None) -> None:
+        # Runs on the IO thread.
+        sent_at = time.time()
+        # sent_at_ms lets the worker measure how long the request waited in its lane. AMQP header
+        # tables cannot carry floats (pika raises UnsupportedAMQPFieldException): integer epoch ms.
+        headers: dict[str, Any] = {"sent_at_ms": int(sent_at * 1000)}
+        expiration = None
+        if timeout_s is not None:
+            headers["deadline_ms"] = int((sent_at + timeout_s) * 1000)
+            expiration = str(max(1, int(timeout_s * 1000)))
+        try:
+            self._channel.basic_publish(
+                exchange="",
+                routing_key=queue_name,
+                properties=pika.BasicProperties(
+                    reply_to=REPLY_TO,
+                    correlation_id=corr_id,
+                    message_id=request_id,
+                    expiration=expiration,
+                    headers=headers,
+                ),
+                body=body,
+                mandatory=True,
+            )
+        except Exception as e:
+            self._resolve(corr_id, error_reply("unavailable", f"ml-worker publish failed: {e}"))
+
+    def submit(
+        self, payload: dict[str, Any], *, lane: str = LANE_INTERACTIVE, timeout_s: float | None = None
+    ) -> tuple[str, Future]:
+        """
+        Publish a request to the lane's queue and return (correlation_id, Future with the decoded reply).
+        payload["request_id"] (if any) becomes the message id the worker deduplicates on.
+        """
+        queue_name = self._queues[lane]
+        connection = self._ensure_started()
+        corr_id = str(uuid.uuid4())
+        request_id = str(payload.get("request_id") or corr_id)
+        fut: Future = Future()
+        with self._lock:
+            self._pending[corr_id] = fut
+        body = json.dumps(payload)
+        connection.add_callback_threadsafe(
+            lambda: self._publish(corr_id, body, queue_name, request_id, timeout_s)
+        )
+        return corr_id, fut
+
+    def forget(self, corr_id: str) -> None:
+        """Drop a pending call (e.g. after the caller gave up waiting)."""
+        with self._lock:
+            self._pending.pop(corr_id, None)
+
+    def _track(self, lane: str) -> float:
+        with self._lock:
+            self._lane_in_flight[lane] += 1
+        return time.perf_counter()
+
+    def _done(self, lane: str, started: float, *, timed_out: bool = False) -> None:
+        with self._lock:
+            self._lane_in_flight[lane] -= 1
+            if timed_out:
+                self._lane_timeouts[lane] += 1
+            else:
+                self._lane_completed[lane] += 1
+                self._lane_latencies[lane].append(time.perf_counter() - started)
+
+    def call(
+        self, payload: dict[str, Any], *, timeout_s: float = 15.0, lane: str = LANE_INTERACTIVE
+    ) -> dict[str, Any]:
+        try:
+            corr_id, fut = self.submit(payload, lane=lane, timeout_s=timeout_s)
+        except Exception as e:
+            return error_reply("unavailable", f"ml-worker unavailable: {e}")
+        started = self._track(lane)
+        try:
+            resp = fut.result(timeout=timeout_s)
+        except FutureTimeoutError:
+            self.forget(corr_id)
+            self._done(lane, started, timed_out=True)
+            return error_reply("timeout", f"ml-worker timeout after {timeout_s}s")
+        except Exception:
+            self._done(lane, started)
+            raise
+        self._done(lane, started)
+        return resp
+
+    async def call_async(
+        self, payload: dict[str, Any], *, timeout_s: float = 15.0, lane: str = LANE_INTERACTIVE
+    ) -> dict[str, Any]:
+        """
+        asyncio variant of call(): awaits the reply Future without blocking the event loop,
+        so one event loop can keep many scoring requests in flight over the same connection.
+        """
+        try:
+            if self._connection is None or self._thread is None or not self._thread.is_alive():
+                # (Re)connecting is blocking, keep it off the event loop.
+                await asyncio.to_thread(self._ensure_started)
+            corr_id, fut = self.submit(payload, lane=lane, timeout_s=timeout_s)
+        except Exception as e:
+            return error_reply("unavailable", f"ml-worker unavailable: {e}")
+        started = self._track(lane)
+        try:
+            resp = await asyncio.wait_for(asyncio.wrap_future(fut), timeout=timeout_s)
+        except asyncio.TimeoutError:
+            self.forget(corr_id)
+            self._done(lane, started, timed_out=True)
+            return error_reply("timeout", f"ml-worker timeout after {timeout_s}s")
+        except Exception:
+            self._done(lane, started)
+            raise
+        self._done(lane, started)
+        return resp
+
+    def stats(self) -> dict[str, Any]:
+        """Per-lane calls in flight, timeouts and round-trip latency over the last `window` replies, in ms."""
+        with self._lock:
+            snapshot = {
+                lane: (
+                    self._lane_in_flight[lane],
+                    self._lane_completed[lane],
+                    self._lane_timeouts[lane],
+                    sorted(self._lane_latencies[lane]),
+                )
+                for lane in self._queues
+            }
+
+        def pct(latencies: list[float], p: float) -> float:
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+
+        return {
+            lane: {
+                "queue": self._queues[lane],
+                "in_flight": in_flight,
+                "completed": completed,
+                "timeouts": timeouts,
+                "latency_ms_p50": pct(latencies, 0.50),
+                "latency_ms_p95": pct(latencies, 0.95),
+                "latency_ms_p99": pct(latencies, 0.99),
+            }
+            for lane, (in_flight, completed, timeouts, latencies) in snapshot.items()
+        }
+
+    def close(self) -> None:
+        self._closing = True
+        thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout=5)
+
+
+@lru_cache(maxsize=1)
+def get_rpc_client() -> ScoringRpcClient:
+    """Process-wide RPC client (connects lazily on first call)."""
+    return ScoringRpcClient()
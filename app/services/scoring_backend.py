@@ -0,0 +1,238 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from dataclasses import replace
+from functools import lru_cache
+from pathlib import Path
+from typing import Any
+
+from loguru import logger
+
+from services.prediction_cache import MODEL_PATH
+from services.rpc_client import LANE_INTERACTIVE, error_reply, get_rpc_client
+
+
+# Replies meaning the scoring service could not be reached (not that the model failed):
+# these count against the circuit breaker. A timeout is not one of them: a worker that is only
+# slow must not trip the breaker, and re-scoring in-process after the full RPC wait would
+# double the latency. It is returned to the caller (retryable) like any other reply.
+TRANSPORT_ERROR_CODES = frozenset({"unavailable"})
+
+
+class RabbitMQBackend:
+    """Scores through ml-worker over RabbitMQ RPC (see services.rpc_client)."""
+
+    name = "rabbitmq"
+
+    def call(self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE) -> dict[str, Any]:
+        return get_rpc_client().call(payload, timeout_s=timeout_s, lane=lane)
+
+    async def call_async(
+        self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE
+    ) -> dict[str, Any]:
+        return await get_rpc_client().call_async(payload, timeout_s=timeout_s, lane=lane)
+
+    def stats(self) -> dict[str, Any]:
+        return {"backend": self.name}
+
+
+class InProcessBackend:
+    """
+    Scores inside the API process with ml-worker's own scoring code and model file.
+
+    model.cbm is loaded on first use (processes that never fall back pay nothing) and
+    reloaded when the file changes. Predictions run on a small thread pool, so the event
+    loop is never blocked; every pool thread gets its own FeatureEncoder (encoders are not
+    thread-safe). Replies have the same format as ml-worker's, lanes are ignored.
+    """
+
+    name = "inprocess"
+
+    def __init__(self, model_path: Path = MODEL_PATH, *, workers: int = 2) -> None:
+        self.model_path = model_path
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inprocess-scoring")
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._registry = None
+
+    def _current(self):
+        # Imported lazily: catboost is only needed once this backend is actually used.
+        from ml_worker.encoding import FeatureEncoder
+        from ml_worker.registry import ModelRegistry
+        from ml_worker.scoring import EXPECTED_FEATURES
+
+        with self._lock:
+            if self._registry is None:
+                self._registry = ModelRegistry(self.model_path, EXPECTED_FEATURES)
+                logger.info(f"In-process scoring loaded model {self._registry.current.version}")
+        self._registry.reload()
+        loaded = self._registry.current
+        local = getattr(self._local, "loaded", None)
+        if local is None or local.version != loaded.version:
+            local = replace(loaded, encoder=FeatureEncoder.from_model(loaded.model, EXPECTED_FEATURES))
+            self._local.loaded = local
+        return local
+
+    def _score(self, payload: dict[str, Any]) -> dict[str, Any]:
+        from ml_worker.scoring import score_request
+
+        return score_request(payload, self._current())
+
+    def call(self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE) -> dict[str, Any]:
+        try:
+            return self._pool.submit(self._score, payload).result(timeout=timeout_s)
+        except FutureTimeoutError:
+            return error_reply("timeout", f"in-process scoring timeout after {timeout_s}s")
+        except Exception as e:
+            logger.exception(f"In-process scoring failed: {e}")
+            return error_reply("unavailable", f"in-process scoring failed: {e}")
+
+    async def call_async(
+        self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE
+    ) -> dict[str, Any]:
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(self._pool.submit(self._score, payload)), timeout_s)
+        except asyncio.TimeoutError:
+            return error_reply("timeout", f"in-process scoring timeout after {timeout_s}s")
+        except Exception as e:
+            logger.exception(f"In-process scoring failed: {e}")
+            return error_reply("unavailable", f"in-process scoring failed: {e}")
+
+    def stats(self) -> dict[str, Any]:
+        registry = self._registry
+        return {"backend": self.name, "model_version": registry.current.version if registry else None}
+
+
+class CircuitBreaker:
+    """
+    Closed: calls go through. After `failure_threshold` consecutive failures the breaker opens
+    and calls are refused for `reset_timeout_s`; then a single probe call is let through
+    (half-open). A successful probe closes the breaker, a failed one opens it again.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout_s: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout_s = reset_timeout_s
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: float | None = None
+        self._probing = False
+        self.opened = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probing or time.monotonic() - self._opened_at >= self.reset_timeout_s:
+                return "half_open"
+            return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._opened_at is None:
+                return True
+            if self._probing or time.monotonic() - self._opened_at < self.reset_timeout_s:
+                return False
+            self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+
+class FailoverBackend:
+    """
+    Primary backend guarded by a circuit breaker, with a fallback.
+
+    While the primary answers, it is used. A transport failure (TRANSPORT_ERROR_CODES) of the
+    primary is retried on the fallback right away; once the breaker is open the primary is
+    skipped altogether, so a broker outage costs one probe per reset_timeout_s instead of a
+    failed call each time. Timeouts and model errors are returned as they are.
+    """
+
+    def __init__(self, primary, fallback, breaker: CircuitBreaker) -> None:
+        self.primary = primary
+        self.fallback = fallback
+        self.breaker = breaker
+        self.name = f"{primary.name}+{fallback.name}"
+        self._lock = threading.Lock()
+        self.fallback_calls = 0
+
+    def _primary_result(self, resp: dict[str, Any]) -> bool:
+        if resp.get("code") in TRANSPORT_ERROR_CODES:
+            self.breaker.record_failure()
+            logger.warning(f"Scoring backend {self.primary.name} failed ({resp.get('error')}), "
+                           f"using {self.fallback.name}")
+            return False
+        self.breaker.record_success()
+        return True
+
+    def _count_fallback(self) -> None:
+        with self._lock:
+            self.fallback_calls += 1
+
+    def call(self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE) -> dict[str, Any]:
+        if self.breaker.allow():
+            resp = self.primary.call(payload, timeout_s=timeout_s, lane=lane)
+            if self._primary_result(resp):
+                return resp
+        self._count_fallback()
+        return self.fallback.call(payload, timeout_s=timeout_s, lane=lane)
+
+    async def call_async(
+        self, payload: dict[str, Any], *, timeout_s: float, lane: str = LANE_INTERACTIVE
+    ) -> dict[str, Any]:
+        if self.breaker.allow():
+            resp = await self.primary.call_async(payload, timeout_s=timeout_s, lane=lane)
+            if self._primary_result(resp):
+                return resp
+        self._count_fallback()
+        return await self.fallback.call_async(payload, timeout_s=timeout_s, lane=lane)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "backend": self.name,
+            "breaker": self.breaker.state,
+            "breaker_opened": self.breaker.opened,
+            "fallback_calls": self.fallback_calls,
+            "fallback": self.fallback.stats(),
+        }
+
+
+@lru_cache(maxsize=1)
+def get_scoring_backend():
+    """
+    Process-wide scoring backend, chosen by SCORING_BACKEND:
+      rabbitmq  - ml-worker over RabbitMQ only;
+      inprocess - the model in this process (single-node setups, no broker needed);
+      auto      - RabbitMQ, failing over to in-process scoring while the broker is unreachable
+                  (default; SCORING_BREAKER_FAILURES / SCORING_BREAKER_RESET_S tune the breaker).
+    """
+    kind = os.environ.get("SCORING_BACKEND", "auto")
+    if kind == "rabbitmq":
+        return RabbitMQBackend()
+    inprocess = InProcessBackend(workers=int(os.environ.get("SCORING_INPROCESS_WORKERS", "2")))
+    if kind == "inprocess":
+        return inprocess
+    if kind != "auto":
+        raise ValueError(f"Unknown SCORING_BACKEND: {kind!r}")
+    breaker = CircuitBreaker(
+        failure_threshold=int(os.environ.get("SCORING_BREAKER_FAILURES", "3")),
+        reset_timeout_s=float(os.environ.get("SCORING_BREAKER_RESET_S", "30")),
+    )
+    return FailoverBackend(RabbitMQBackend(), inprocess, breaker)
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+from functools import lru_cache
+from typing import Any, Awaitable, Callable
+
+from loguru import logger
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (leader) runs the call,
+    callers arriving while it is in flight wait for and share its result (or exception).
+    The slot is freed as soon as the call finishes, so nothing is cached afterwards.
+
+    Thread-safe and usable from sync and async code alike: the shared result lives in a
+    concurrent.futures.Future, which threads wait on directly and coroutines through
+    asyncio.wrap_future.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._calls: dict[str, Future] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: str) -> tuple[Future, bool]:
+        with self._lock:
+            fut = self._calls.get(key)
+            if fut is not None:
+                self.followers += 1
+                return fut, False
+            fut = Future()
+            self._calls[key] = fut
+            self.leaders += 1
+            return fut, True
+
+    def _finish(self, key: str, fut: Future, result: Any = None, error: BaseException | None = None) -> None:
+        with self._lock:
+            self._calls.pop(key, None)
+        if error is not None:
+            fut.set_exception(error)
+        else:
+            fut.set_result(result)
+
+    def run(self, key: str, fn: Callable[[], Any]) -> Any:
+        fut, leader = self._join(key)
+        if not leader:
+            return fut.result()
+        try:
+            result = fn()
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    async def run_async(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut, leader = self._join(key)
+        if not leader:
+            # shield: a follower that gets cancelled must not cancel the call for everyone else.
+            return await asyncio.shield(asyncio.wrap_future(fut))
+        try:
+            result = await fn()
+        except BaseException as e:
+            self._finish(key, fut, error=e)
+            raise
+        self._finish(key, fut, result)
+        return result
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {"in_flight": len(self._calls), "leaders": self.leaders, "coalesced": self.followers}
+
+
+@lru_cache(maxsize=1)
+def get_single_flight() -> SingleFlight:
+    """Process-wide single-flight group for scoring calls (see services.crud.scoring)."""
+    return SingleFlight()
+
+
+def advisory_locks_enabled(engine: Engine) -> bool:
+    """Cross-process coalescing via Postgres advisory locks (SCORE_ADVISORY_LOCK=1, Postgres only)."""
+    return os.environ.get("SCORE_ADVISORY_LOCK", "0") == "1" and engine.dialect.name == "postgresql"
+
+
+# How long a scoring call waits for another process's lock before scoring on its own.
+ADVISORY_LOCK_TIMEOUT_S = float(os.environ.get("SCORE_ADVISORY_LOCK_TIMEOUT_S", "20"))
+ADVISORY_LOCK_POLL_S = 0.02
+
+
+class AdvisoryLock:
+    """
+    Postgres session-level advisory lock on a dedicated pooled connection, named by a string key.
+
+    Used around a scoring call so that uvicorn workers in other processes wait for the
+    one already scoring the same client instead of repeating the RPC. The wait is bounded
+    (pg_try_advisory_lock polled for up to `timeout_s`): coalescing is an optimization, so a
+    stuck holder only costs its waiters a duplicate RPC instead of blocking them for good.
+    """
+
+    def __init__(self, engine: Engine, key: str, *, timeout_s: float = ADVISORY_LOCK_TIMEOUT_S) -> None:
+        self.engine = engine
+        # pg advisory locks take a signed 64-bit key.
+        self.lock_id = int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big", signed=True)
+        self.timeout_s = timeout_s
+        self.held = False
+        self._conn = None
+
+    def _try(self) -> bool:
+        if self._conn is None:
+            self._conn = self.engine.connect()
+        self.held = bool(self._conn.execute(text("SELECT pg_try_advisory_lock(:k)"), {"k": self.lock_id}).scalar())
+        return self.held
+
+    def _gave_up(self) -> None:
+        logger.warning(f"Advisory lock {self.lock_id} still held after {self.timeout_s}s, proceeding without it")
+
+    def acquire(self) -> bool:
+        """
+        Waits until the lock is held or timeout_s passes (then proceeds without it, held=False).
+        Returns True if another holder made us wait.
+        """
+        if self._try():
+            return False
+        deadline = time.monotonic() + self.timeout_s
+        while not self._try():
+            if time.monotonic() >= deadline:
+                self._gave_up()
+                break
+            time.sleep(ADVISORY_LOCK_POLL_S)
+        return True
+
+    async def acquire_async(self) -> bool:
+        """Same as acquire(); the blocking DB calls run in a worker thread, not on the event loop."""
+        if await asyncio.to_thread(self._try):
+            return False
+        deadline = time.monotonic() + self.timeout_s
+        while not await asyncio.to_thread(self._try):
+            if time.monotonic() >= deadline:
+                self._gave_up()
+                break
+            await asyncio.sleep(ADVISORY_LOCK_POLL_S)
+        return True
+
+    def release(self) -> None:
+        if self._conn is None:
+            return
+        try:
+            if self.held:
+                self._conn.execute(text("SELECT pg_advisory_unlock(:k)"), {"k": self.lock_id})
+        finally:
+            self.held = False
+            self._conn.close()
+            self._conn = None
+
+    async def release_async(self) -> None:
+        await asyncio.to_thread(self.release)
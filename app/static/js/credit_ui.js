@@ -48,7 +48,12 @@ async function main() {
       setHTML('history', '<div class="muted">—</div>');
       return;
     }
-    setHTML('credit', kv({amount_total: credit.amount_total, annual_rate: credit.annual_rate}));
+    setHTML('credit', kv({
+      amount_total: credit.amount_total,
+      annual_rate: credit.annual_rate,
+      overdue_months: credit.overdue_months,
+      months_since_last_late: credit.months_since_last_late,
+    }));
     setHTML('history', renderHistory(credit.payment_history));
   } catch (e) {
     setText('msg', e.message);
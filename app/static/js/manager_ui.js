@@ -37,6 +37,7 @@ let allClients = [];
 let currentDetail = null;
 let currentScore = null;
 let editMode = false;
+let searchSeq = 0;
 
 function renderList(list) {
   return list
@@ -129,13 +130,41 @@ function collectForm() {
   return out;
 }
 
-async function load() {
+const PAGE_SIZE = 50;
+let nextCursor = null;
+let searchTimer = null;
+
+function pageUrl(cursor) {
+  const all = document.getElementById('all_toggle').checked;
+  const params = new URLSearchParams({all: all ? 'true' : 'false', limit: String(PAGE_SIZE)});
+  if (cursor) params.set('cursor', cursor);
+  return `/api/manager/clients/page?${params}`;
+}
+
+function setMoreButton() {
+  const btn = document.getElementById('btn_more');
+  if (btn) btn.style.display = nextCursor ? '' : 'none';
+}
+
+async function load(seq) {
   const me = await getJson('/auth/me');
   setText('who', `user_id=${me.user_id} role=${me.role}`);
-  const all = document.getElementById('all_toggle').checked;
-  const clients = await getJson(`/api/manager/clients/summary?all=${all ? 'true' : 'false'}`);
-  allClients = clients;
-  setHTML('clients_list', renderList(clients));
+  const page = await getJson(pageUrl(null));
+  if (seq !== undefined && seq !== searchSeq) return;
+  allClients = page.items;
+  nextCursor = page.next_cursor;
+  setHTML('clients_list', renderList(allClients));
+  setMoreButton();
+  bindList();
+}
+
+async function loadMore() {
+  if (!nextCursor) return;
+  const page = await getJson(pageUrl(nextCursor));
+  allClients = allClients.concat(page.items);
+  nextCursor = page.next_cursor;
+  setHTML('clients_list', renderList(allClients));
+  setMoreButton();
   bindList();
 }
 
@@ -163,17 +192,44 @@ function bindList() {
   });
 }
 
-function applySearch() {
-  const q = document.getElementById('q').value.trim().toLowerCase();
-  const filtered = allClients.filter((c) => {
-    if (!q) return true;
-    const fio = `${c.last_name ?? ''} ${c.first_name ?? ''}`.toLowerCase();
-    return String(c.user_id).includes(q) || fio.includes(q);
-  });
-  setHTML('clients_list', renderList(filtered));
+async function findClients(q, all) {
+  // Digits only: look the client up by ID.
+  if (/^\d+$/.test(q)) {
+    try {
+      const d = await getJson(`/api/manager/clients/${q}`);
+      return [{user_id: d.client.user_id, first_name: d.user.first_name, last_name: d.user.last_name}];
+    } catch (_) {
+      return [];
+    }
+  }
+  const params = new URLSearchParams({q, limit: '20', all: all ? 'true' : 'false'});
+  return getJson(`/api/manager/clients/search?${params}`);
+}
+
+async function runSearch() {
+  // Responses may arrive out of order: only the latest query may render its results.
+  const seq = ++searchSeq;
+  const q = document.getElementById('q').value.trim();
+  if (!q) {
+    await load(seq);
+    return;
+  }
+  const all = document.getElementById('all_toggle').checked;
+  const hits = await findClients(q, all);
+  if (seq !== searchSeq) return;
+  allClients = hits;
+  nextCursor = null;
+  setHTML('clients_list', renderList(allClients));
+  setMoreButton();
   bindList();
 }
 
+function applySearch() {
+  // Search runs on the server (indexed), debounced while typing.
+  clearTimeout(searchTimer);
+  searchTimer = setTimeout(runSearch, 150);
+}
+
 function scoreColor(v) {
   const clamped = Math.max(0, Math.min(1, v));
   const hue = clamped * 120; // 0 red -> 120 green
@@ -228,9 +284,10 @@ async function main() {
   }
 
   document.getElementById('btn_logout').onclick = logout;
-  document.getElementById('btn_reload').onclick = load;
-  document.getElementById('all_toggle').onchange = load;
+  document.getElementById('btn_reload').onclick = runSearch;
+  document.getElementById('all_toggle').onchange = runSearch;
   document.getElementById('q').oninput = applySearch;
+  document.getElementById('btn_more').onclick = loadMore;
 
   document.getElementById('btn_edit').onclick = async () => {
     if (!currentDetail) return;
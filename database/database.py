@@ -1,6 +1,12 @@
 from functools import lru_cache
 
+from loguru import logger
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.schema import CreateIndex
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlmodel import SQLModel, Session, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from .config import get_settings
 
@@ -24,14 +30,104 @@ def get_database_engine():
     )
     return engine
 
+@lru_cache(maxsize=1)
+def get_async_database_engine() -> AsyncEngine:
+    """
+    Создает асинхронный SQLAlchemy engine (asyncpg) рядом с синхронным.
+
+    Returns:
+        AsyncEngine: Настроенный асинхронный engine
+    """
+    settings = get_settings()
+
+    engine = create_async_engine(
+        url=settings.DATABASE_URL_asyncpg,
+        echo=settings.DEBUG,
+        pool_size=5,
+        max_overflow=10,
+        pool_pre_ping=True,
+        pool_recycle=3600
+    )
+    return engine
+
 async def get_session():
     """Получает сессию базы данных (FastAPI dependency)."""
     with Session(get_database_engine()) as session:
         yield session
+
+async def get_async_session():
+    """Получает асинхронную сессию базы данных (FastAPI dependency)."""
+    async with AsyncSession(get_async_database_engine(), expire_on_commit=False) as session:
+        yield session
         
+def _column_default_sql(column, dialect) -> str | None:
+    """Скалярное значение по умолчанию колонки в виде SQL-литерала (None - нет или не выражается)."""
+    default = column.default
+    if default is None or not default.is_scalar or default.arg is None:
+        return None
+    try:
+        return str(literal(default.arg, column.type).compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    except Exception:
+        return None
+
+
+def _add_missing_columns(conn: Connection) -> None:
+    """
+    ALTER TABLE ... ADD COLUMN для колонок моделей, которых нет в уже существующих таблицах
+    (create_all существующие таблицы не меняет). NOT NULL ставится только при наличии значения
+    по умолчанию; уникальность - отдельным уникальным индексом.
+    """
+    inspector = inspect(conn)
+    preparer = conn.dialect.identifier_preparer
+    for table in SQLModel.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c["name"] for c in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = (
+                f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                f"{column.type.compile(dialect=conn.dialect)}"
+            )
+            default = _column_default_sql(column, conn.dialect)
+            if default is not None:
+                ddl += f" DEFAULT {default}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+            elif not column.nullable:
+                logger.warning(f"{table.name}.{column.name}: добавлена как NULL-допустимая (нет значения по умолчанию)")
+            conn.execute(text(ddl))
+            if column.unique:
+                conn.execute(text(
+                    f"CREATE UNIQUE INDEX IF NOT EXISTS {preparer.quote(f'uq_{table.name}_{column.name}')} "
+                    f"ON {preparer.format_table(table)} ({preparer.format_column(column)})"
+                ))
+            logger.info(f"Схема: добавлена колонка {table.name}.{column.name}")
+
+
+def upgrade_schema(engine: Engine) -> None:
+    """
+    Доводит существующую схему до моделей: create_all создаёт только недостающие таблицы, а
+    колонки и индексы, появившиеся в моделях позже, добавляются здесь. Идемпотентна.
+    Смена типа колонки (например, старая JSON-история платежей Credit) так не переносится -
+    для неё нужна пересборка БД (init_db(drop_all=True) + seed).
+    """
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            # Нужно trigram-индексам на user, если таблица была создана до их появления.
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        _add_missing_columns(conn)
+        for table in SQLModel.metadata.sorted_tables:
+            for index in table.indexes:
+                # IF NOT EXISTS rather than checkfirst: reflection does not see expression indexes.
+                conn.execute(CreateIndex(index, if_not_exists=True))
+
+
 def init_db(drop_all: bool = False) -> None:
     """
-    Инициализирует схему базы данных.
+    Инициализирует схему базы данных: создаёт недостающие таблицы и добавляет в существующие
+    новые колонки и индексы (upgrade_schema).
     
     Args:
         drop_all: Если True, удаляет все таблицы перед созданием
@@ -39,12 +135,9 @@ def init_db(drop_all: bool = False) -> None:
     Raises:
         Exception: Любое исключение, связанное с базой данных
     """
-    try:
-        engine = get_database_engine()
-        if drop_all:
-            SQLModel.metadata.drop_all(engine)
-        
-        SQLModel.metadata.create_all(engine)
-    except Exception as e:
-        raise
+    engine = get_database_engine()
+    if drop_all:
+        SQLModel.metadata.drop_all(engine)
 
+    SQLModel.metadata.create_all(engine)
+    upgrade_schema(engine)
@@ -1,20 +1,54 @@
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool, StaticPool
 from sqlmodel import Session, SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
 
 from api import app
-from database.database import get_session
+from database.database import get_async_session, get_session
 from models.enum import UserRole
 from services.crud.user import create_user
 from services.crud.client import create_client
 from services.crud.manager import create_manager
 
 
+@pytest.fixture(autouse=True)
+def _reset_prediction_cache():
+    from services.prediction_cache import get_prediction_cache
+
+    cache = get_prediction_cache()
+    cache.clear()
+    cache.reset_stats()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def _reset_name_search_index():
+    from services.name_search import get_name_search_index
+
+    # Every test gets its own database, the fallback index must not outlive it.
+    get_name_search_index().invalidate()
+
+
+@pytest.fixture(autouse=True)
+def _reset_principal_cache():
+    from services.principal import get_principal_cache
+
+    get_principal_cache().clear()
+
+
 @pytest.fixture()
-def engine():
+def db_path(tmp_path):
+    # File-backed SQLite so the sync and the async (aiosqlite) engines see the same data.
+    return tmp_path / "test.db"
+
+
+@pytest.fixture()
+def engine(db_path):
     engine = create_engine(
-        "sqlite+pysqlite://",
+        f"sqlite+pysqlite:///{db_path}",
         connect_args={"check_same_thread": False},
         poolclass=StaticPool,
     )
@@ -22,6 +56,12 @@ def engine():
     return engine
 
 
+@pytest.fixture()
+def async_engine(engine, db_path):
+    # NullPool: TestClient runs the app on its own event loop, don't keep connections across loops.
+    return create_async_engine(f"sqlite+aiosqlite:///{db_path}", poolclass=NullPool)
+
+
 @pytest.fixture()
 def session(engine):
     with Session(engine) as session:
@@ -29,18 +69,23 @@ def session(engine):
 
 
 @pytest.fixture()
-def client(session):
+def client(session, async_engine):
     async def _override_get_session():
         yield session
 
+    async def _override_get_async_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = _override_get_session
+    app.dependency_overrides[get_async_session] = _override_get_async_session
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()
 
 
 @pytest.fixture()
-def client_no_raise(session):
+def client_no_raise(session, async_engine):
     """
     Same as client(), but returns HTTP 500 responses instead of raising server exceptions.
     Useful for testing error-handling paths.
@@ -48,7 +93,12 @@ def client_no_raise(session):
     async def _override_get_session():
         yield session
 
+    async def _override_get_async_session():
+        async with AsyncSession(async_engine, expire_on_commit=False) as async_session:
+            yield async_session
+
     app.dependency_overrides[get_session] = _override_get_session
+    app.dependency_overrides[get_async_session] = _override_get_async_session
     with TestClient(app, raise_server_exceptions=False) as c:
         yield c
     app.dependency_overrides.clear()
@@ -58,3 +58,53 @@ def test_auth_login_invalid_credentials(client, session):
     assert r.status_code == 401
 
 
+
+
+@pytest.mark.unit
+def test_password_hasher_rejects_when_saturated():
+    import asyncio
+    import threading
+
+    from services.password_hasher import HasherBusyError, PasswordHasher
+
+    hasher = PasswordHasher(workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.ensure_future(hasher.run(release.wait))
+        queued = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(HasherBusyError):
+            await hasher.run(release.wait)
+        assert hasher.stats()["queued"] == 1
+        release.set()
+        await asyncio.gather(running, queued)
+
+    asyncio.run(scenario())
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["in_flight"]) == (2, 1, 0)
+    assert stats["latency_ms_max"] > 0
+
+
+@pytest.mark.api
+def test_auth_login_busy_returns_429(client, session, monkeypatch):
+    from services.password_hasher import HasherBusyError, PasswordHasher
+
+    u = create_user(
+        login="auth_user_busy",
+        password="Pass12345",
+        first_name="A",
+        last_name="B",
+        role=UserRole.CLIENT,
+        session=session,
+        is_test=True,
+    )
+
+    async def _busy(self, password, hashed_password):
+        raise HasherBusyError("Password hasher is saturated")
+
+    monkeypatch.setattr(PasswordHasher, "verify", _busy)
+    r = client.post("/auth/login", json={"login": u.login, "password": "Pass12345"})
+    assert r.status_code == 429
+    assert r.headers["retry-after"] == "1"
+    assert client.get("/auth/me").status_code == 401
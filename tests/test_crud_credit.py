@@ -41,3 +41,36 @@ def test_credit_unique_constraint(session, client_entity):
         )
 
 
+
+
+@pytest.mark.unit
+def test_payment_history_compact_roundtrip(session, client_entity):
+    from models.credit import decode_payment_history, encode_payment_history
+    from schemas.credit import CreditRead
+    from services.crud.credit import assign_credit
+
+    history = [
+        {"months_ago": 3, "status": "2"},
+        {"months_ago": 0, "status": "C"},
+        {"months_ago": 1, "status": "0"},
+    ]
+    # One byte per month, a gap (months_ago=2) is kept as "no record".
+    assert encode_payment_history(history) == b"C0-2"
+    assert decode_payment_history(b"C0-2") == sorted(history, key=lambda x: x["months_ago"])
+    with pytest.raises(ValueError):
+        encode_payment_history([{"months_ago": 0, "status": "10"}])
+    with pytest.raises(ValueError, match="months_ago"):
+        encode_payment_history([{"months_ago": -1, "status": "C"}, {"months_ago": 2, "status": "1"}])
+    with pytest.raises(ValueError, match="ASCII"):
+        encode_payment_history([{"months_ago": 0, "status": "Ж"}])
+
+    credit = assign_credit(
+        client=client_entity,
+        amount_total=1000.0,
+        annual_rate=0.16,
+        payment_history=history,
+        session=session,
+    )
+    assert (credit.worst_delinquency, credit.overdue_months) == (3, 2)
+    body = CreditRead.model_validate(credit).model_dump()
+    assert body["payment_history"] == sorted(history, key=lambda x: x["months_ago"])
@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import event
+
+
+@pytest.mark.unit
+def test_client_dashboard_is_one_statement(engine, session, client_entity, manager_entity):
+    from services.crud.credit import assign_credit
+    from services.crud.dashboard import get_client_dashboard
+    from services.crud.scoring import add_score
+
+    client_entity.manager_id = manager_entity.user_id
+    session.add(client_entity)
+    assign_credit(
+        client=client_entity,
+        amount_total=1000.0,
+        annual_rate=0.16,
+        payment_history=[{"months_ago": 0, "status": "C"}],
+        session=session,
+    )
+    add_score(client_entity.user_id, 0.9, session)
+    session.commit()
+    latest = add_score(client_entity.user_id, 0.1, session)
+    session.commit()
+    client_id, manager_id, latest_id = client_entity.user_id, manager_entity.user_id, latest.id
+    session.expire_all()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    dash = get_client_dashboard(client_id, session=session)
+
+    assert len(statements) == 1
+    assert "payment_status" not in statements[0]
+    assert dash["client"].user_id == client_id
+    assert dash["manager"]["user_id"] == manager_id
+    assert dash["credit"]["amount_total"] == 1000.0
+    assert dash["score"].id == latest_id
+
+
+@pytest.mark.unit
+def test_client_dashboard_without_relations(session, client_entity):
+    from services.crud.dashboard import get_client_dashboard
+
+    dash = get_client_dashboard(client_entity.user_id, session=session)
+    assert dash["client"].user_id == client_entity.user_id
+    assert dash["manager"] is None
+    assert dash["credit"] is None
+    assert dash["score"] is None
+    assert get_client_dashboard(999999, session=session) is None
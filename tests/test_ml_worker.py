@@ -0,0 +1,321 @@
+import json
+
+import pytest
+
+
+FEATURES = {
+    "code_gender": "F",
+    "flag_own_car": "N",
+    "flag_own_realty": "N",
+    "cnt_children": 0,
+    "amt_income_total": 100000.0,
+    "name_income_type": "Working",
+    "name_education_type": "Higher education",
+    "name_family_status": "Married",
+    "name_housing_type": "House / apartment",
+    "days_birth": 10000,
+    "days_employed": 1000,
+    "flag_work_phone": 0,
+    "flag_phone": 0,
+    "flag_email": 0,
+    "occupation_type": "Unknown",
+    "cnt_fam_members": 2,
+    "age_group": "25-35",
+    "days_employed_bin": "1-3 year",
+}
+
+
+@pytest.mark.unit
+def test_predict_batch_matches_single_predictions():
+    from ml_worker.main import _predict, _predict_batch
+
+    other = dict(FEATURES, amt_income_total=350000.0, cnt_children=2, code_gender="M")
+    payloads = [
+        {"client_id": 1, "features": FEATURES},
+        {"client_id": 2, "features": other},
+    ]
+    batch = _predict_batch(payloads)
+    assert [r["client_id"] for r in batch] == [1, 2]
+    for payload, result in zip(payloads, batch):
+        single = _predict(payload)
+        assert result["status"] == "success"
+        assert result["proba"] == pytest.approx(single["proba"])
+        assert result["pred"] == int(result["proba"] >= 0.5)
+
+
+@pytest.mark.unit
+def test_score_messages_isolates_bad_messages():
+    from ml_worker.main import _score_messages
+
+    bodies = [
+        json.dumps({"client_id": 1, "features": FEATURES}).encode(),
+        b"not json",
+        json.dumps({"client_id": 3, "features": "oops"}).encode(),
+        json.dumps({"client_id": 4, "features": FEATURES}).encode(),
+    ]
+    results = _score_messages(bodies)
+    assert [r["status"] for r in results] == ["success", "error", "error", "success"]
+    assert results[0]["client_id"] == 1
+    assert results[3]["client_id"] == 4
+
+
+@pytest.mark.unit
+def test_encoder_matches_pandas_frame():
+    import pandas as pd
+    from ml_worker.main import EXPECTED_FEATURES, models
+
+    model, encoder = models.current.model, models.current.encoder
+    rows = [FEATURES, dict(FEATURES, cnt_children=None, days_employed_bin="<1 year")]
+    df = pd.DataFrame(rows, columns=EXPECTED_FEATURES)
+    expected = model.predict_proba(df)[:, 1]
+    got = model.predict_proba(encoder.encode(rows))[:, 1]
+    assert got.tolist() == pytest.approx(expected.tolist())
+
+
+@pytest.mark.unit
+def test_encoder_rejects_missing_categorical():
+    from ml_worker.main import models
+
+    with pytest.raises(ValueError, match="code_gender"):
+        models.current.encoder.encode([dict(FEATURES, code_gender=None)])
+
+
+@pytest.mark.unit
+def test_score_messages_chunk_payload():
+    from ml_worker.main import _score_messages
+
+    body = json.dumps(
+        {"items": [{"client_id": 1, "features": FEATURES}, {"client_id": 2, "features": "oops"}, 5]}
+    ).encode()
+    (result,) = _score_messages([body])
+    assert result["status"] == "success"
+    assert [r["status"] for r in result["items"]] == ["success", "error", "error"]
+    assert result["items"][0]["client_id"] == 1
+
+
+def _train_model(path, columns, seed=0):
+    import numpy as np
+    import pandas as pd
+    from catboost import CatBoostClassifier
+
+    rows = [dict(FEATURES, amt_income_total=float(50_000 * i), **{c: 0 for c in columns if c not in FEATURES})
+            for i in range(20)]
+    df = pd.DataFrame(rows, columns=columns)
+    cat = [c for c in columns if isinstance(FEATURES.get(c), str)]
+    model = CatBoostClassifier(iterations=5, depth=2, random_seed=seed, verbose=False, allow_writing_files=False)
+    model.fit(df, np.arange(20) % 2, cat_features=cat)
+    model.save_model(str(path))
+
+
+@pytest.mark.unit
+def test_replies_carry_model_version():
+    from ml_worker.main import _score_messages, models
+
+    version = models.current.version
+    single, chunk = _score_messages(
+        [json.dumps({"client_id": 1, "features": FEATURES}).encode(), json.dumps({"items": [5]}).encode()]
+    )
+    assert single["model_version"] == version
+    assert chunk["model_version"] == version
+    assert chunk["items"][0]["model_version"] == version
+
+
+@pytest.mark.unit
+def test_registry_hot_swaps_model_and_keeps_old_on_bad_file(tmp_path):
+    import os
+    import shutil
+    from ml_worker.main import EXPECTED_FEATURES, MODEL_PATH
+    from ml_worker.registry import ModelRegistry
+
+    path = tmp_path / "model.cbm"
+    shutil.copy(MODEL_PATH, path)
+    registry = ModelRegistry(path, EXPECTED_FEATURES)
+    old = registry.current
+    assert registry.reload() is False  # unchanged file
+
+    # Atomic replace, as a deploy would do it.
+    _train_model(tmp_path / "next.cbm", EXPECTED_FEATURES, seed=1)
+    os.replace(tmp_path / "next.cbm", path)
+    assert registry.reload() is True
+    new = registry.current
+    assert new.version != old.version
+    assert 0.0 <= new.model.predict_proba(new.encoder.encode([FEATURES]))[0, 1] <= 1.0
+
+    # Half-written file and a model needing an unknown feature: the live model stays.
+    path.write_bytes(b"garbage")
+    assert registry.reload() is False
+    _train_model(path, EXPECTED_FEATURES + ["credit_limit"], seed=2)
+    assert registry.reload() is False
+    assert registry.current is new
+
+
+@pytest.mark.unit
+def test_shadow_scorer_logs_challenger_predictions(tmp_path):
+    import sqlite3
+    from ml_worker.main import EXPECTED_FEATURES, _score_messages
+    from ml_worker.registry import ModelRegistry
+    from ml_worker.shadow import ShadowScorer, ShadowStore
+
+    _train_model(tmp_path / "challenger.cbm", EXPECTED_FEATURES, seed=3)
+    challenger = ModelRegistry(tmp_path / "challenger.cbm", EXPECTED_FEATURES)
+    shadow = ShadowScorer(challenger, ShadowStore(tmp_path / "shadow.sqlite"))
+
+    bodies = [
+        json.dumps({"client_id": 1, "features": FEATURES}).encode(),
+        b"not json",
+        json.dumps({"items": [{"client_id": 2, "features": FEATURES}, {"client_id": 3, "features": "oops"}]}).encode(),
+    ]
+    results = _score_messages(bodies)
+    assert shadow.submit(bodies, results)
+    shadow.close()
+    assert shadow.stats()["scored"] == 2
+
+    rows = sqlite3.connect(tmp_path / "shadow.sqlite").execute(
+        "SELECT client_id, champion_version, champion_proba, challenger_version, challenger_proba "
+        "FROM shadow_score ORDER BY client_id"
+    ).fetchall()
+    assert [r[0] for r in rows] == [1, 2]
+    assert rows[0][1:3] == (results[0]["model_version"], results[0]["proba"])
+    assert rows[0][3] == challenger.current.version != rows[0][1]
+    assert 0.0 <= rows[0][4] <= 1.0
+
+
+@pytest.mark.unit
+def test_shadow_scorer_drops_batches_when_behind(tmp_path):
+    import threading
+    from ml_worker.main import models
+    from ml_worker.shadow import ShadowScorer, ShadowStore
+
+    started, release = threading.Event(), threading.Event()
+
+    class _SlowScorer(ShadowScorer):
+        def _score(self, *_args):
+            started.set()
+            release.wait(5)
+
+    shadow = _SlowScorer(models, ShadowStore(tmp_path / "shadow.sqlite"), max_queue=1)
+    assert shadow.submit([], [])
+    assert started.wait(5)
+    assert shadow.submit([], [])  # waits in the queue
+    assert not shadow.submit([], [])  # queue full: dropped, not blocked
+    release.set()
+    shadow.close()
+    assert (shadow.stats()["submitted"], shadow.stats()["dropped"]) == (2, 1)
+
+
+@pytest.mark.unit
+def test_lane_scheduler_prefers_interactive_but_serves_bulk():
+    from ml_worker.lanes import LaneScheduler
+
+    lanes = LaneScheduler({"interactive": 3, "bulk": 1})
+    assert lanes.next_batch(2) is None
+    for i in range(20):
+        lanes.push("bulk", f"b{i}")
+    # Bulk alone gets every batch.
+    assert lanes.next_batch(2) == ("bulk", ["b0", "b1"])
+
+    for i in range(20):
+        lanes.push("interactive", f"i{i}")
+    picked = [lanes.next_batch(1)[0] for _ in range(8)]
+    assert picked[0] == "interactive"
+    assert picked.count("interactive") == 6 and picked.count("bulk") == 2
+    assert len(lanes) == 40 - 2 - 8
+
+
+@pytest.mark.unit
+def test_error_replies_are_structured():
+    from types import SimpleNamespace
+
+    from ml_worker.main import _score_messages, models
+    from ml_worker.scoring import score_payloads
+
+    replies = _score_messages(
+        # Valid JSON that is not an object must not be mistaken for a model failure and retried.
+        [b"not json", json.dumps({"client_id": 3, "features": "oops"}).encode(), b"5", b'"x"', b"[1]"]
+    )
+    for result in replies:
+        assert (result["status"], result["code"], result["retryable"]) == ("error", "invalid_request", False)
+
+    def _broken(_frame):
+        raise RuntimeError("model crashed")
+
+    broken = SimpleNamespace(
+        model=SimpleNamespace(predict_proba=_broken), encoder=models.current.encoder, version="broken"
+    )
+    (result,) = score_payloads([{"client_id": 1, "features": FEATURES}], broken)
+    assert (result["code"], result["retryable"], result["client_id"]) == ("model_error", True, 1)
+
+
+@pytest.mark.unit
+def test_reply_cache_remembers_final_replies():
+    from ml_worker.delivery import ReplyCache, retry_backoff_ms, retry_queue_name
+
+    cache = ReplyCache(maxsize=2)
+    cache.put("a", {"proba": 0.1})
+    cache.put("b", {"proba": 0.2})
+    assert cache.get("a") == {"proba": 0.1}
+    cache.put("c", {"proba": 0.3})  # evicts least recently used "b"
+    assert cache.get("b") is None
+    assert cache.get(None) is None
+    assert cache.hits == 1
+
+    assert [retry_backoff_ms(500, n) for n in (1, 2, 3)] == [500, 1000, 2000]
+    assert retry_queue_name("ml_scoring_queue", 2) == "ml_scoring_queue.retry.2"
+
+
+@pytest.mark.unit
+def test_pool_restarts_crashed_worker_and_stops_on_sigterm(tmp_path, monkeypatch):
+    import os
+    import signal
+    import time
+
+    from ml_worker import pool
+
+    monkeypatch.setattr(pool, "RESTART_DELAY_S", 0.05)
+    monkeypatch.setattr(pool, "POLL_INTERVAL_S", 0.02)
+    pids_file = tmp_path / "pids"
+    crashed = tmp_path / "crashed"
+
+    def _target():
+        with open(pids_file, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        try:
+            # Exactly one worker crashes, once.
+            os.close(os.open(crashed, os.O_CREAT | os.O_EXCL))
+        except FileExistsError:
+            while True:
+                time.sleep(0.1)
+        raise RuntimeError("boom")
+
+    supervisor = os.fork()
+    if supervisor == 0:
+        code = 0
+        try:
+            pool.supervise(2, _target, shutdown_timeout_s=5)
+        except BaseException:
+            code = 1
+        os._exit(code)
+
+    def _pids():
+        return [int(line) for line in pids_file.read_text().split()] if pids_file.exists() else []
+
+    deadline = time.monotonic() + 10
+    while len(_pids()) < 3 and time.monotonic() < deadline:
+        time.sleep(0.02)
+    # Two workers started, and the crashed one was replaced.
+    assert len(_pids()) == 3
+
+    os.kill(supervisor, signal.SIGTERM)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        pid, status = os.waitpid(supervisor, os.WNOHANG)
+        if pid:
+            break
+        time.sleep(0.02)
+    else:
+        os.kill(supervisor, signal.SIGKILL)
+        pytest.fail("supervisor did not stop on SIGTERM")
+    assert os.waitstatus_to_exitcode(status) == 0
+    for pid in _pids():
+        with pytest.raises(ProcessLookupError):
+            os.kill(pid, 0)
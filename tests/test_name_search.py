@@ -0,0 +1,48 @@
+import pytest
+
+
+@pytest.mark.unit
+def test_name_index_prefix_then_similarity():
+    from services.name_search import NameSearchIndex
+
+    index = NameSearchIndex()
+    index.rebuild(
+        [
+            (1, "Иван", "Петров", "petrov_i", 10),
+            (2, "Пётр", "Иванов", "ivanov_p", 10),
+            (3, "Анна", "Иваненко", "anna_i", 20),
+            (4, "Олег", "Сидоров", "sidorov", 10),
+        ]
+    )
+
+    assert [h["user_id"] for h in index.search("иван")] == [1, 2, 3]
+    assert [h["user_id"] for h in index.search("ИВАН", manager_id=10)] == [1, 2]
+    assert [h["user_id"] for h in index.search("иван", limit=1)] == [1]
+    # Login prefix, then a typo that only trigram similarity can find.
+    assert [h["user_id"] for h in index.search("sido")] == [4]
+    assert [h["user_id"] for h in index.search("сидиров")] == [4]
+    assert index.search("   ") == []
+
+
+@pytest.mark.unit
+def test_name_index_rebuilds_after_invalidate(session):
+    from services.crud.client import search_clients
+    from services.crud.user import create_user
+    from services.crud.client import create_client
+    from models.enum import UserRole
+
+    assert search_clients(session, "Смирн") == []
+    u = create_user(
+        login="smirnov_a",
+        password="Pass12345",
+        first_name="Алексей",
+        last_name="Смирнов",
+        role=UserRole.CLIENT,
+        session=session,
+        is_test=True,
+    )
+    create_client(user=u, session=session)
+
+    hits = search_clients(session, "Смирн")
+    assert [h["user_id"] for h in hits] == [u.id]
+    assert hits[0]["login"] == "smirnov_a"
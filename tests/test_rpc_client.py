@@ -0,0 +1,222 @@
+import json
+import queue
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+
+class _FakeChannel:
+    def __init__(self, conn):
+        self._conn = conn
+        self._on_reply = None
+
+    def basic_consume(self, queue, on_message_callback, auto_ack):
+        assert queue == "amq.rabbitmq.reply-to"
+        self._on_reply = on_message_callback
+
+    def add_on_return_callback(self, callback):
+        self._on_return = callback
+
+    def basic_publish(self, exchange, routing_key, properties, body, mandatory=False):
+        # Echo worker: reply with client_id doubled.
+        assert mandatory
+        # Encode like pika does on the wire: unsupported header values (floats) raise here.
+        properties.encode()
+        self._conn.published.append(routing_key)
+        self._conn.properties.append(properties)
+        if routing_key == "missing_queue":
+            self._conn.events.put(lambda: self._on_return(self, None, properties, body))
+            return
+        payload = json.loads(body)
+        reply = json.dumps({"status": "success", "proba": payload["client_id"] * 2})
+        self._conn.events.put(
+            lambda: self._on_reply(self, None, SimpleNamespace(correlation_id=properties.correlation_id), reply)
+        )
+
+
+class _FakeConnection:
+    instances = 0
+
+    def __init__(self, _params):
+        type(self).instances += 1
+        self.events = queue.Queue()
+        self.published = []
+        self.properties = []
+        self._channel = _FakeChannel(self)
+
+    def channel(self):
+        return self._channel
+
+    def add_callback_threadsafe(self, cb):
+        self.events.put(cb)
+
+    def process_data_events(self, time_limit):
+        try:
+            self.events.get(timeout=time_limit)()
+        except queue.Empty:
+            pass
+
+    def close(self):
+        pass
+
+
+@pytest.mark.unit
+def test_rpc_client_shares_one_connection_across_threads(monkeypatch):
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    _FakeConnection.instances = 0
+    client = rpc.ScoringRpcClient(params=object())
+
+    results = {}
+
+    def _worker(i):
+        results[i] = client.call({"client_id": i, "features": {}}, timeout_s=5)
+
+    threads = [threading.Thread(target=_worker, args=(i,)) for i in range(20)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    client.close()
+
+    assert _FakeConnection.instances == 1
+    assert {i: r["proba"] for i, r in results.items()} == {i: i * 2 for i in range(20)}
+
+
+@pytest.mark.unit
+def test_rpc_client_timeout_returns_error(monkeypatch):
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    monkeypatch.setattr(_FakeChannel, "basic_publish", lambda *a, **kw: None)
+    client = rpc.ScoringRpcClient(params=object())
+
+    resp = client.call({"client_id": 1, "features": {}}, timeout_s=0.1)
+    client.close()
+
+    assert resp["status"] == "error"
+    assert "timeout" in resp["error"]
+    assert (resp["code"], resp["retryable"]) == ("timeout", True)
+    assert client._pending == {}
+
+
+@pytest.mark.unit
+def test_rpc_client_call_async_keeps_many_calls_in_flight(monkeypatch):
+    import asyncio
+
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    client = rpc.ScoringRpcClient(params=object())
+
+    async def _run():
+        return await asyncio.gather(
+            *(client.call_async({"client_id": i, "features": {}}, timeout_s=5) for i in range(50))
+        )
+
+    results = asyncio.run(_run())
+    client.close()
+
+    assert [r["proba"] for r in results] == [i * 2 for i in range(50)]
+
+
+@pytest.mark.unit
+def test_rpc_client_routes_lanes_and_tracks_stats(monkeypatch):
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    client = rpc.ScoringRpcClient(params=object())
+
+    client.call({"client_id": 1, "features": {}}, timeout_s=5)
+    client.call({"client_id": 2, "features": {}}, timeout_s=5, lane=rpc.LANE_BULK)
+    client.call({"client_id": 3, "features": {}}, timeout_s=5, lane=rpc.LANE_BULK)
+    published = client._connection.published
+    client.close()
+
+    assert published == [rpc.QUEUE_NAME, rpc.BULK_QUEUE_NAME, rpc.BULK_QUEUE_NAME]
+    stats = client.stats()
+    assert (stats["interactive"]["completed"], stats["bulk"]["completed"]) == (1, 2)
+    assert stats["bulk"]["in_flight"] == 0
+    assert stats["bulk"]["latency_ms_p99"] > 0
+
+
+@pytest.mark.unit
+def test_rpc_client_fails_fast_when_no_queue_accepts_request(monkeypatch):
+    import time
+
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    client = rpc.ScoringRpcClient(params=object(), queues={rpc.LANE_INTERACTIVE: "missing_queue"})
+
+    started = time.monotonic()
+    resp = client.call({"client_id": 1, "features": {}}, timeout_s=10)
+    client.close()
+
+    assert time.monotonic() - started < 5
+    assert (resp["status"], resp["code"]) == ("error", "unavailable")
+    assert client._pending == {}
+
+
+@pytest.mark.unit
+def test_rpc_client_abandons_connect_attempt_that_timed_out(monkeypatch):
+    import time
+
+    import services.rpc_client as rpc
+
+    delays = [0.5, 0.0]
+
+    class _SlowConnection(_FakeConnection):
+        closed = []
+
+        def __init__(self, params):
+            time.sleep(delays.pop(0))
+            super().__init__(params)
+
+        def close(self):
+            type(self).closed.append(self)
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _SlowConnection)
+    client = rpc.ScoringRpcClient(params=object(), connect_timeout_s=0.1)
+
+    first = client.call({"client_id": 1, "features": {}}, timeout_s=5)
+    assert first["code"] == "unavailable"
+    second = client.call({"client_id": 2, "features": {}}, timeout_s=5)
+    assert second["proba"] == 4
+
+    # The late first connection is closed by its own IO thread and never serves a call.
+    time.sleep(1.5)
+    assert len(_SlowConnection.closed) == 1
+    late = _SlowConnection.closed[0]
+    assert late is not client._connection and late.published == []
+    assert client.call({"client_id": 3, "features": {}}, timeout_s=5)["proba"] == 6
+    client.close()
+
+
+@pytest.mark.unit
+def test_rpc_client_headers_are_amqp_encodable(monkeypatch):
+    import time
+
+    from pika.data import encode_table
+
+    import services.rpc_client as rpc
+
+    monkeypatch.setattr(rpc.pika, "BlockingConnection", _FakeConnection)
+    client = rpc.ScoringRpcClient(params=object())
+    before_ms = int(time.time() * 1000)
+    _corr_id, fut = client.submit({"client_id": 1, "features": {}})
+    assert fut.result(timeout=5)["proba"] == 2
+    assert client.call({"client_id": 2, "features": {}}, timeout_s=5)["proba"] == 4
+    plain, timed = client._connection.properties[-2:]
+    client.close()
+
+    # The real pika encoder: floats in a header table raise UnsupportedAMQPFieldException.
+    for props in (plain, timed):
+        encode_table([], props.headers)
+        props.encode()
+    assert isinstance(plain.headers["sent_at_ms"], int) and plain.headers["sent_at_ms"] >= before_ms
+    # The deadline travels as integer epoch ms too (and only when the call has a timeout).
+    assert "deadline_ms" not in plain.headers
+    assert timed.headers["deadline_ms"] - timed.headers["sent_at_ms"] == pytest.approx(5000, abs=1)
@@ -29,23 +29,25 @@ def test_score_client_endpoint_persists_score(client, session, client_entity, mo
     session.commit()
     session.refresh(client_entity)
 
-    def _fake_rpc_call(payload, *, timeout_s=15.0):
+    async def _fake_rpc_call(payload, *, timeout_s=15.0):
         assert payload["client_id"] == client_entity.user_id
         assert "features" in payload
-        return {"status": "success", "proba": 0.42}
+        return {"status": "success", "proba": 0.42, "model_version": "abc123"}
 
-    monkeypatch.setattr(scoring_crud, "_rpc_call", _fake_rpc_call)
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
 
     r = client.post(f"/clients/{client_entity.user_id}/score")
     assert r.status_code == 200
     body = r.json()
     assert body["client_id"] == client_entity.user_id
     assert body["score"] == 0.42
+    assert body["model_version"] == "abc123"
 
     saved = session.get(Score, body["id"])
     assert saved is not None
     assert saved.client_id == client_entity.user_id
     assert saved.score == 0.42
+    assert saved.model_version == "abc123"
 
 
 @pytest.mark.api
@@ -54,15 +56,419 @@ def test_score_client_404(client):
     assert r.status_code == 404
 
 
+@pytest.mark.api
+def test_score_client_idempotency_key(client, session, client_entity, monkeypatch):
+    from models.scoring import Score
+    import services.crud.scoring as scoring_crud
+
+    calls = []
+
+    async def _fake_rpc_call(payload, *, timeout_s=15.0):
+        calls.append(payload["request_id"])
+        return {"status": "success", "proba": 0.3, "model_version": "abc123"}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
+    headers = {"Idempotency-Key": "click-1"}
+    first = client.post(f"/clients/{client_entity.user_id}/score", headers=headers).json()
+    again = client.post(f"/clients/{client_entity.user_id}/score", headers=headers).json()
+    assert again["id"] == first["id"]
+    assert calls == [f"{client_entity.user_id}:click-1"]
+    assert session.query(Score).filter(Score.client_id == client_entity.user_id).count() == 1
+
+    # Without a key every call is a new request.
+    client.post(f"/clients/{client_entity.user_id}/score")
+    assert session.query(Score).filter(Score.client_id == client_entity.user_id).count() == 2
+
+
+@pytest.mark.api
+def test_score_client_worker_unavailable_returns_structured_503(client, client_entity, monkeypatch):
+    import services.crud.scoring as scoring_crud
+    from services.rpc_client import error_reply
+
+    async def _fake_rpc_call(_payload, *, timeout_s=15.0):
+        return error_reply("timeout", "ml-worker timeout after 15.0s")
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
+    r = client.post(f"/clients/{client_entity.user_id}/score")
+    assert r.status_code == 503
+    assert r.headers["Retry-After"] == "1"
+    assert (r.json()["code"], r.json()["retryable"]) == ("timeout", True)
+
+
 @pytest.mark.api
 def test_score_client_rpc_error_returns_500(client_no_raise, session, client_entity, monkeypatch):
     import services.crud.scoring as scoring_crud
 
-    def _fake_rpc_call(_payload, *, timeout_s=15.0):
+    async def _fake_rpc_call(_payload, *, timeout_s=15.0):
         return {"status": "error", "error": "boom"}
 
-    monkeypatch.setattr(scoring_crud, "_rpc_call", _fake_rpc_call)
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
     r = client_no_raise.post(f"/clients/{client_entity.user_id}/score")
     assert r.status_code == 500
 
 
+
+
+@pytest.mark.unit
+def test_latest_score_tracks_newest_score(session, client_entity, monkeypatch):
+    import services.crud.scoring as scoring_crud
+    from models.scoring import LatestScore
+    from services.crud.client import update_client
+
+    probas = iter([0.7, 0.2])
+    monkeypatch.setattr(scoring_crud, "_rpc_call", lambda _p, *, timeout_s=15.0: {"status": "success", "proba": next(probas)})
+
+    first = scoring_crud.score_client(client_entity, session)
+    assert scoring_crud.get_latest_score(client_entity.user_id, session).id == first.id
+    update_client(client_entity, session, cnt_children=3)
+    second = scoring_crud.score_client(client_entity, session)
+
+    latest = session.get(LatestScore, client_entity.user_id)
+    assert latest.score_id == second.id
+    assert latest.score == 0.2
+    assert scoring_crud.get_latest_score(client_entity.user_id, session).id == second.id
+
+
+@pytest.mark.unit
+def test_latest_score_upsert_keeps_newest_and_tolerates_existing_row(session, client_entity):
+    from datetime import datetime, timedelta
+
+    from models.scoring import LatestScore, Score
+    from services.crud.scoring import _upsert_latest_scores
+
+    now = datetime.utcnow()
+    newer = Score(client_id=client_entity.user_id, score=0.9, timestamp=now)
+    older = Score(client_id=client_entity.user_id, score=0.4, timestamp=now - timedelta(seconds=5))
+    session.add_all([newer, older])
+    session.flush()
+
+    # Both calls insert "the first" LatestScore row, as two concurrent first scores would:
+    # the second one goes through ON CONFLICT instead of failing on the primary key.
+    _upsert_latest_scores([newer], session)
+    _upsert_latest_scores([older], session)
+    session.commit()
+
+    latest = session.get(LatestScore, client_entity.user_id)
+    assert latest.score_id == newer.id
+    assert latest.score == 0.9
+
+
+@pytest.mark.unit
+def test_backfill_latest_scores(session, client_entity):
+    from datetime import datetime, timedelta
+
+    from models.scoring import LatestScore, Score
+    from services.crud.scoring import backfill_latest_scores, get_latest_score
+
+    now = datetime.utcnow()
+    newest = Score(client_id=client_entity.user_id, score=0.1, timestamp=now)
+    session.add_all([Score(client_id=client_entity.user_id, score=0.9, timestamp=now - timedelta(days=1)), newest])
+    session.commit()
+    assert get_latest_score(client_entity.user_id, session) is None
+
+    assert backfill_latest_scores(session) == 1
+    assert session.get(LatestScore, client_entity.user_id).score_id == newest.id
+    assert get_latest_score(client_entity.user_id, session).id == newest.id
+    assert backfill_latest_scores(session) == 0
+
+
+@pytest.mark.unit
+def test_score_client_uses_prediction_cache(session, client_entity, monkeypatch):
+    import services.crud.scoring as scoring_crud
+    from services.crud.client import update_client
+    from services.prediction_cache import get_prediction_cache
+
+    calls = []
+
+    def _fake_rpc_call(payload, *, timeout_s=15.0):
+        calls.append(payload)
+        return {"status": "success", "proba": 0.1 * len(calls)}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call", _fake_rpc_call)
+
+    assert scoring_crud.score_client(client_entity, session).score == pytest.approx(0.1)
+    assert scoring_crud.score_client(client_entity, session).score == pytest.approx(0.1)
+    assert len(calls) == 1
+
+    # Changing a feature invalidates the client's entry and changes the key.
+    update_client(client_entity, session, amt_income_total=123.0)
+    assert scoring_crud.score_client(client_entity, session).score == pytest.approx(0.2)
+    assert len(calls) == 2
+
+    # Same feature vector under another model version is a miss.
+    monkeypatch.setattr(scoring_crud, "model_version", lambda: "other-model")
+    assert scoring_crud.score_client(client_entity, session).score == pytest.approx(0.3)
+    assert len(calls) == 3
+
+    stats = get_prediction_cache().stats()
+    assert (stats["hits"], stats["misses"]) == (1, 3)
+
+
+@pytest.mark.unit
+def test_prediction_cache_lru_and_ttl(monkeypatch):
+    import services.prediction_cache as pc
+
+    cache = pc.PredictionCache(maxsize=2, ttl_s=10)
+    cache.put("a", 0.1, client_id=1)
+    cache.put("b", 0.2, client_id=2)
+    assert cache.get("a") == 0.1
+    cache.put("c", 0.3)  # evicts least recently used "b"
+    assert cache.get("b") is None
+    assert cache.stats()["evictions"] == 1
+
+    cache.invalidate_client(1)
+    assert cache.get("a") is None
+
+    now = pc.time.monotonic()
+    monkeypatch.setattr(pc.time, "monotonic", lambda: now + 11)
+    assert cache.get("c") is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.unit
+def test_single_flight_runs_concurrent_calls_once():
+    import threading
+    import time
+
+    from services.single_flight import SingleFlight
+
+    flight = SingleFlight()
+    calls, results = [], []
+    barrier = threading.Barrier(5)
+
+    def _slow():
+        calls.append(1)
+        time.sleep(0.2)
+        return 42
+
+    def _caller():
+        barrier.wait()
+        results.append(flight.run("client-1", _slow))
+
+    threads = [threading.Thread(target=_caller) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == [42] * 5
+    assert len(calls) == 1
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "coalesced": 4}
+    # Nothing is remembered once the call is over.
+    assert flight.run("client-1", lambda: 7) == 7
+
+
+@pytest.mark.unit
+def test_concurrent_scores_of_same_client_share_one_rpc_and_row(engine, session, client_entity, monkeypatch):
+    import asyncio
+
+    from sqlmodel import Session
+
+    import services.crud.scoring as scoring_crud
+    from models.scoring import Score
+
+    calls = []
+
+    async def _fake_rpc_call(payload, *, timeout_s=15.0):
+        calls.append(payload["client_id"])
+        await asyncio.sleep(0.05)
+        return {"status": "success", "proba": 0.6, "model_version": "abc123"}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
+
+    async def _run():
+        sessions = [Session(engine) for _ in range(3)]
+        try:
+            scores = await asyncio.gather(
+                *(scoring_crud.score_client_async(s.get(type(client_entity), client_entity.user_id), s)
+                  for s in sessions)
+            )
+            return [sc.id for sc in scores]
+        finally:
+            for s in sessions:
+                s.close()
+
+    ids = asyncio.run(_run())
+    assert len(set(ids)) == 1
+    assert calls == [client_entity.user_id]
+    assert session.query(Score).filter(Score.client_id == client_entity.user_id).count() == 1
+
+
+@pytest.mark.unit
+def test_failover_backend_opens_breaker_and_probes_primary(monkeypatch):
+    import services.scoring_backend as backend_mod
+    from services.rpc_client import error_reply
+    from services.scoring_backend import CircuitBreaker, FailoverBackend
+
+    class _Backend:
+        def __init__(self, name, reply):
+            self.name, self.reply, self.calls = name, reply, 0
+
+        def call(self, payload, *, timeout_s, lane):
+            self.calls += 1
+            return self.reply
+
+        def stats(self):
+            return {"backend": self.name}
+
+    now = [1000.0]
+    monkeypatch.setattr(backend_mod.time, "monotonic", lambda: now[0])
+    primary = _Backend("rabbitmq", error_reply("unavailable", "broker down"))
+    fallback = _Backend("inprocess", {"status": "success", "proba": 0.3, "model_version": "abc123"})
+    backend = FailoverBackend(primary, fallback, CircuitBreaker(failure_threshold=2, reset_timeout_s=30))
+
+    for _ in range(4):
+        assert backend.call({}, timeout_s=1, lane="interactive")["proba"] == 0.3
+    # Two failures open the breaker, after which the broker is not tried any more.
+    assert primary.calls == 2
+    assert backend.stats()["breaker"] == "open"
+
+    # After the reset timeout one probe goes to the primary; its success closes the breaker.
+    now[0] += 31
+    primary.reply = {"status": "success", "proba": 0.9, "model_version": "abc123"}
+    assert backend.call({}, timeout_s=1, lane="interactive")["proba"] == 0.9
+    assert backend.stats()["breaker"] == "closed"
+    assert backend.stats()["fallback_calls"] == 4
+
+    # Model errors and timeouts (a slow, not a missing, worker) are returned as they are:
+    # no in-process re-scoring and the breaker stays closed.
+    for code in ("invalid_request", "timeout"):
+        primary.reply = error_reply(code, code)
+        for _ in range(3):
+            assert backend.call({}, timeout_s=1, lane="interactive")["code"] == code
+    assert backend.stats()["breaker"] == "closed"
+    assert backend.stats()["fallback_calls"] == 4
+
+
+@pytest.mark.unit
+def test_inprocess_backend_scores_like_ml_worker():
+    import asyncio
+
+    from services.prediction_cache import model_version
+    from services.scoring_backend import InProcessBackend
+
+    backend = InProcessBackend(workers=2)
+    features = {
+        "code_gender": "F", "flag_own_car": "N", "flag_own_realty": "Y", "cnt_children": 0,
+        "amt_income_total": 120000.0, "name_income_type": "Working",
+        "name_education_type": "Higher education", "name_family_status": "Married",
+        "name_housing_type": "House / apartment", "days_birth": 12000, "days_employed": 1500,
+        "flag_work_phone": 0, "flag_phone": 1, "flag_email": 0, "occupation_type": "Managers",
+        "cnt_fam_members": 2, "age_group": "25-35", "days_employed_bin": "3-5 year",
+    }
+
+    single = backend.call({"client_id": 7, "features": features}, timeout_s=30)
+    assert single["status"] == "success"
+    assert single["client_id"] == 7
+    assert 0.0 <= single["proba"] <= 1.0
+    assert single["model_version"] == model_version()
+
+    chunk = asyncio.run(backend.call_async(
+        {"items": [{"client_id": 1, "features": features}, {"client_id": 2, "features": "oops"}]},
+        timeout_s=30,
+    ))
+    assert [r["status"] for r in chunk["items"]] == ["success", "error"]
+    assert chunk["items"][0]["proba"] == pytest.approx(single["proba"])
+    assert chunk["items"][1]["code"] == "invalid_request"
+    assert backend.stats()["model_version"] == model_version()
+
+
+@pytest.mark.unit
+def test_advisory_lock_wait_is_bounded():
+    import asyncio
+
+    from services.single_flight import AdvisoryLock
+
+    class _Conn:
+        def __init__(self, free_after):
+            self.free_after, self.statements, self.closed = free_after, [], False
+
+        def execute(self, stmt, _params):
+            self.statements.append(str(stmt))
+            tries = sum("pg_try_advisory_lock" in s for s in self.statements)
+            return type("R", (), {"scalar": lambda _self: tries > self.free_after})()
+
+        def close(self):
+            self.closed = True
+
+    class _Engine:
+        def __init__(self, free_after):
+            self.conn = _Conn(free_after)
+
+        def connect(self):
+            return self.conn
+
+    # The holder lets go after a few polls: we waited, then hold the lock and unlock it.
+    engine = _Engine(free_after=3)
+    lock = AdvisoryLock(engine, "score:1:abc", timeout_s=5)
+    assert lock.acquire() is True and lock.held
+    lock.release()
+    assert "pg_advisory_unlock" in engine.conn.statements[-1] and engine.conn.closed
+
+    # A stuck holder: give up after timeout_s and proceed without the lock (nothing to unlock).
+    engine = _Engine(free_after=10**9)
+    lock = AdvisoryLock(engine, "score:1:abc", timeout_s=0.1)
+    assert asyncio.run(lock.acquire_async()) is True and not lock.held
+    asyncio.run(lock.release_async())
+    assert not any("pg_advisory_unlock" in s for s in engine.conn.statements) and engine.conn.closed
+
+
+@pytest.mark.unit
+def test_upgrade_schema_adds_new_score_columns_and_indexes(tmp_path):
+    from sqlalchemy import inspect, text
+    from sqlmodel import Session, SQLModel, create_engine
+
+    from database.database import upgrade_schema
+    from models.scoring import Score
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    with engine.begin() as conn:
+        # Score as first released: no model_version, request_id or input_hash, no indexes.
+        conn.execute(text(
+            "CREATE TABLE score (id INTEGER PRIMARY KEY, timestamp DATETIME NOT NULL, "
+            "client_id INTEGER NOT NULL, score FLOAT NOT NULL)"
+        ))
+        conn.execute(text("INSERT INTO score (timestamp, client_id, score) VALUES ('2024-01-01', 1, 0.5)"))
+
+    SQLModel.metadata.create_all(engine)
+    upgrade_schema(engine)
+    upgrade_schema(engine)  # idempotent
+
+    inspector = inspect(engine)
+    assert {"model_version", "request_id", "input_hash"} <= {c["name"] for c in inspector.get_columns("score")}
+    indexes = {i["name"] for i in inspector.get_indexes("score")}
+    assert {"ix_score_client_id_timestamp", "ix_score_model_version", "uq_score_request_id"} <= indexes
+    with Session(engine) as session:
+        session.add(Score(client_id=1, score=0.7, model_version="abc", request_id="r1"))
+        session.commit()
+        assert session.query(Score).count() == 2
+
+
+@pytest.mark.unit
+def test_score_client_async_keeps_db_work_off_the_event_loop(session, client_entity, monkeypatch):
+    import asyncio
+    import threading
+
+    import services.crud.scoring as scoring_crud
+
+    async def _fake_rpc_call(payload, *, timeout_s=15.0):
+        return {"status": "success", "proba": 0.3, "model_version": "abc123"}
+
+    save_threads = []
+    real_save = scoring_crud._save_score
+
+    def _save(*args, **kwargs):
+        save_threads.append(threading.get_ident())
+        return real_save(*args, **kwargs)
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
+    monkeypatch.setattr(scoring_crud, "_save_score", _save)
+
+    async def _run():
+        score = await scoring_crud.score_client_async(client_entity, session, idempotency_key="k1")
+        again = await scoring_crud.score_client_async(client_entity, session, idempotency_key="k1")
+        return threading.get_ident(), score, again
+
+    loop_thread, score, again = asyncio.run(_run())
+    assert score.score == 0.3 and again.id == score.id
+    assert save_threads and loop_thread not in save_threads
@@ -0,0 +1,104 @@
+import pytest
+
+
+def _write_test_data(tmp_path, n_rows: int = 4):
+    import pandas as pd
+
+    clients = pd.DataFrame(
+        {
+            "CODE_GENDER": ["M", "F"] * (n_rows // 2),
+            "FLAG_OWN_CAR": "Y",
+            "FLAG_OWN_REALTY": "N",
+            "CNT_CHILDREN": range(n_rows),
+            "AMT_INCOME_TOTAL": 100000.0,
+            "NAME_INCOME_TYPE": "Working",
+            "NAME_EDUCATION_TYPE": "Higher education",
+            "NAME_FAMILY_STATUS": "Married",
+            "NAME_HOUSING_TYPE": "House / apartment",
+            "DAYS_BIRTH": -12000,
+            "DAYS_EMPLOYED": -1000,
+            "FLAG_WORK_PHONE": 0,
+            "FLAG_PHONE": 1,
+            "FLAG_EMAIL": 0,
+            "OCCUPATION_TYPE": [None, "Laborers"] * (n_rows // 2),
+            "CNT_FAM_MEMBERS": 2,
+            "AGE_GROUP": "25-35",
+            "DAYS_EMPLOYED_BIN": "1-3",
+        }
+    )
+    history = pd.DataFrame(
+        {
+            "ID": [1, 1, 1, 2, 99],
+            "MONTHS_BALANCE": [-2, 0, -1, 0, 0],
+            "STATUS": ["1", "C", "0", "X", "C"],
+        }
+    )
+    clients_csv, history_csv = tmp_path / "df_to_keep.csv", tmp_path / "credit_history.csv"
+    clients.to_csv(clients_csv, index=False)
+    history.to_csv(history_csv, index=False)
+    return clients_csv, history_csv
+
+
+@pytest.mark.unit
+def test_bulk_seed_sqlite(engine, session, tmp_path):
+    from sqlmodel import func, select
+
+    from models.client import Client
+    from models.credit import Credit
+    from models.enum import UserRole
+    from models.user import User
+    from scripts.seed_db import bulk_seed
+    from services.crud.user import verify_password
+
+    clients_csv, history_csv = _write_test_data(tmp_path)
+    counts = bulk_seed(
+        engine,
+        n_clients=10,
+        n_managers=3,
+        n_admins=1,
+        clients_csv=clients_csv,
+        history_csv=history_csv,
+        bcrypt_rounds=4,
+        processes=1,
+    )
+    assert counts == {"clients": 10, "managers": 3, "admins": 1}
+
+    users = session.exec(select(User).order_by(User.id)).all()
+    assert [u.role for u in users] == [UserRole.CLIENT] * 10 + [UserRole.MANAGER] * 3 + [UserRole.ADMIN]
+    assert len({u.login for u in users}) == 14
+    assert users[-1].is_admin and all(u.is_test for u in users)
+    # Seeded passwords follow _make_password: "ivan_petrov" -> "Ipetrov123".
+    first = users[0]
+    name, surname = first.login.split("_", 1)
+    assert verify_password(name[0].upper() + surname + "123", first.password_hash)
+
+    clients = session.exec(select(Client).order_by(Client.user_id)).all()
+    manager_ids = [u.id for u in users[10:13]]
+    assert [c.manager_id for c in clients] == [manager_ids[i % 3] for i in range(10)]
+    assert [c.cnt_children for c in clients[:5]] == [0, 1, 2, 3, 0]
+    assert clients[0].occupation_type is None and clients[1].occupation_type == "Laborers"
+
+    assert session.exec(select(func.count()).select_from(Credit)).one() == 10
+    credit = session.exec(select(Credit).where(Credit.client_id == 1)).one()
+    assert credit.payment_history == [
+        {"months_ago": 0, "status": "C"},
+        {"months_ago": 1, "status": "0"},
+        {"months_ago": 2, "status": "1"},
+    ]
+    assert (credit.worst_delinquency_12m, credit.overdue_months, credit.months_since_last_late) == (2, 2, 1)
+    never_late = session.exec(select(Credit).where(Credit.client_id == 2)).one()
+    assert (never_late.worst_delinquency, never_late.months_since_last_late) == (0, None)
+
+
+@pytest.mark.unit
+def test_credit_history_map_matches_groupby(tmp_path):
+    from scripts.bench_credit_history import _groupby_credit_history_map, _write_synthetic
+    from scripts.seed_db import _credit_history_map
+
+    path = tmp_path / "credit_history.csv"
+    _write_synthetic(path, n_ids=300, max_months=12)
+
+    expected = _groupby_credit_history_map(str(path), max_id=250)
+    assert _credit_history_map(str(path), max_id=250) == expected
+    assert _credit_history_map(str(path), max_id=250, chunksize=97) == expected
+    assert set(expected) == set(range(1, 251))
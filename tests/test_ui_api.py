@@ -121,7 +121,10 @@ def test_manager_score_get_and_rescore(client, session, monkeypatch):
     session.commit()
 
     # mock RPC
-    monkeypatch.setattr(scoring_crud, "_rpc_call", lambda payload, *, timeout_s=15.0: {"status": "success", "proba": 0.25})
+    async def _fake_rpc_call(payload, *, timeout_s=15.0):
+        return {"status": "success", "proba": 0.25}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call_async", _fake_rpc_call)
 
     # login as manager
     r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
@@ -162,3 +165,382 @@ def test_role_forbidden(client, session):
     assert client.get("/api/manager/clients/summary?all=true").status_code == 403
 
 
+
+
+@pytest.mark.api
+def test_client_dashboard(client, session):
+    from services.crud.scoring import add_score
+
+    mu = create_user(
+        login="mgr_dash",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    cu = create_user(
+        login="cli_dash",
+        password="Pass12345",
+        first_name="C",
+        last_name="L",
+        role=UserRole.CLIENT,
+        session=session,
+        is_test=True,
+    )
+    c = create_client(user=cu, session=session, manager=manager)
+    assign_credit(
+        client=c,
+        amount_total=500.0,
+        annual_rate=0.16,
+        payment_history=[{"months_ago": 0, "status": "C"}, {"months_ago": 1, "status": "1"}],
+        session=session,
+    )
+    add_score(c.user_id, 0.3, session)
+    session.commit()
+
+    r = client.post("/auth/login", json={"login": cu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+
+    r = client.get("/api/client/dashboard")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["client"]["user_id"] == c.user_id
+    assert body["manager"] == {"user_id": manager.user_id, "first_name": "M", "last_name": "G"}
+    assert body["credit"]["amount_total"] == 500.0
+    assert "payment_history" not in body["credit"]
+    assert body["score"]["score"] == 0.3
+
+
+@pytest.mark.api
+def test_manager_scoring_job(client, session, monkeypatch):
+    import services.crud.scoring as scoring_crud
+    from services.crud.scoring import get_latest_score
+
+    mu = create_user(
+        login="mgr_job",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    client_ids = []
+    for i in range(5):
+        cu = create_user(
+            login=f"cli_job_{i}",
+            password="Pass12345",
+            first_name="C",
+            last_name="L",
+            role=UserRole.CLIENT,
+            session=session,
+            is_test=True,
+        )
+        client_ids.append(create_client(user=cu, session=session, manager=manager, cnt_children=i).user_id)
+
+    calls = []
+
+    def _fake_rpc_call(payload, *, timeout_s=15.0, lane="interactive"):
+        assert lane == "bulk"
+        calls.append(len(payload["items"]))
+        items = [
+            {"client_id": it["client_id"], "status": "error", "error": "boom"}
+            if it["client_id"] == client_ids[0]
+            else {"client_id": it["client_id"], "status": "success", "proba": 0.5}
+            for it in payload["items"]
+        ]
+        return {"status": "success", "items": items}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call", _fake_rpc_call)
+    monkeypatch.setattr(scoring_crud, "SCORING_JOB_CHUNK_SIZE", 2)
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+
+    r = client.post("/api/manager/score-jobs")
+    assert r.status_code == 202
+    job_id = r.json()["id"]
+    assert r.json()["total"] == 5
+
+    r = client.get(f"/api/manager/score-jobs/{job_id}")
+    assert r.status_code == 200
+    body = r.json()
+    assert body["status"] == "done"
+    assert (body["processed"], body["failed"]) == (5, 1)
+    assert calls == [2, 2, 1]
+
+    assert get_latest_score(client_ids[0], session) is None
+    assert all(get_latest_score(cid, session).score == 0.5 for cid in client_ids[1:])
+
+    assert client.get("/api/manager/score-jobs/999999").status_code == 404
+
+
+@pytest.mark.api
+def test_manager_stale_scoring_job_rescores_only_old_model(client, session, monkeypatch):
+    import services.crud.scoring as scoring_crud
+    from models.scoring import LatestScore, Score
+
+    mu = create_user(
+        login="mgr_stale",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    client_ids = []
+    for i in range(3):
+        cu = create_user(
+            login=f"cli_stale_{i}",
+            password="Pass12345",
+            first_name="C",
+            last_name="L",
+            role=UserRole.CLIENT,
+            session=session,
+            is_test=True,
+        )
+        client_ids.append(create_client(user=cu, session=session, manager=manager, cnt_children=i).user_id)
+    # Scored by the old model, by the current one; the third client was never scored.
+    scoring_crud.add_score(client_ids[0], 0.9, session, model_version="v1")
+    scoring_crud.add_score(client_ids[1], 0.8, session, model_version="v2")
+    session.commit()
+
+    calls = []
+
+    def _fake_rpc_call(payload, *, timeout_s=15.0, lane="interactive"):
+        calls.extend(it["client_id"] for it in payload["items"])
+        items = [{"client_id": it["client_id"], "status": "success", "proba": 0.1} for it in payload["items"]]
+        return {"status": "success", "model_version": "v2", "items": items}
+
+    monkeypatch.setattr(scoring_crud, "_rpc_call", _fake_rpc_call)
+    monkeypatch.setattr(scoring_crud, "model_version", lambda: "v2")
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+    r = client.post("/api/manager/score-jobs?stale_only=true")
+    assert r.status_code == 202
+    assert (r.json()["total"], r.json()["stale_only"], r.json()["model_version"]) == (1, True, "v2")
+
+    body = client.get(f"/api/manager/score-jobs/{r.json()['id']}").json()
+    assert (body["status"], body["processed"], body["failed"]) == ("done", 1, 0)
+    assert calls == [client_ids[0]]
+    session.expire_all()
+    assert session.get(LatestScore, client_ids[0]).model_version == "v2"
+    assert session.query(Score).filter(Score.model_version == "v1").count() == 1
+
+    # Nothing is stale any more.
+    assert client.post("/api/manager/score-jobs?stale_only=true").json()["total"] == 0
+
+
+@pytest.mark.api
+def test_manager_clients_page(client, session):
+    from services.crud.scoring import add_score
+
+    mu = create_user(
+        login="mgr_page",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    names = ["Ivanov", "Petrov", "Ivashin", "Sidorov", "Ivanova"]
+    client_ids = []
+    for i, last_name in enumerate(names):
+        cu = create_user(
+            login=f"cli_page_{i}",
+            password="Pass12345",
+            first_name="C",
+            last_name=last_name,
+            role=UserRole.CLIENT,
+            session=session,
+            is_test=True,
+        )
+        client_ids.append(create_client(user=cu, session=session, manager=manager).user_id)
+    for cid, proba in zip(client_ids[:4], [0.4, 0.1, 0.4, 0.9]):
+        add_score(cid, proba, session)
+    session.commit()
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/manager/clients/page", params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200
+        body = r.json()
+        assert len(body["items"]) <= 2
+        seen += [x["user_id"] for x in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == client_ids
+
+    r = client.get("/api/manager/clients/page", params={"name": "iva"})
+    assert [x["last_name"] for x in r.json()["items"]] == ["Ivanov", "Ivashin", "Ivanova"]
+
+    # Score sort pages through ties on (score, user_id); unscored clients are excluded.
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 1, "sort": "-score", **({"cursor": cursor} if cursor else {})}
+        body = client.get("/api/manager/clients/page", params=params).json()
+        seen += [(x["user_id"], x["score"]) for x in body["items"]]
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == [(client_ids[3], 0.9), (client_ids[2], 0.4), (client_ids[0], 0.4), (client_ids[1], 0.1)]
+
+    r = client.get("/api/manager/clients/page", params={"has_score": "false"})
+    assert [x["user_id"] for x in r.json()["items"]] == [client_ids[4]]
+
+    assert client.get("/api/manager/clients/page", params={"cursor": "garbage"}).status_code == 400
+    # A cursor is bound to its sort: an unscored last row (score=None) cannot seed a score sort.
+    r = client.get("/api/manager/clients/page", params={"limit": 4})
+    user_id_cursor = r.json()["next_cursor"]
+    assert user_id_cursor is not None
+    for sort in ("score", "-score"):
+        r = client.get("/api/manager/clients/page", params={"sort": sort, "cursor": user_id_cursor})
+        assert r.status_code == 400
+    r = client.get("/api/manager/clients/page", params={"has_score": "false", "sort": "-score"})
+    assert r.status_code == 400
+    # LIKE wildcards typed by the user are matched literally.
+    assert client.get("/api/manager/clients/page", params={"name": "%"}).json()["items"] == []
+
+
+@pytest.mark.api
+def test_manager_clients_search(client, session):
+    mu = create_user(
+        login="mgr_search",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    ids = {}
+    for i, (last_name, own) in enumerate([("Kuznetsov", True), ("Kuzmin", True), ("Kuznetsova", False)]):
+        cu = create_user(
+            login=f"cli_search_{i}",
+            password="Pass12345",
+            first_name="C",
+            last_name=last_name,
+            role=UserRole.CLIENT,
+            session=session,
+            is_test=True,
+        )
+        ids[last_name] = create_client(user=cu, session=session, manager=manager if own else None).user_id
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+
+    # Prefix match first, then the trigram-similar name; other managers' clients are excluded.
+    r = client.get("/api/manager/clients/search", params={"q": "kuzn"})
+    assert r.status_code == 200
+    assert [x["user_id"] for x in r.json()] == [ids["Kuznetsov"], ids["Kuzmin"]]
+
+    r = client.get("/api/manager/clients/search", params={"q": "kuz", "all": "true", "limit": 2})
+    assert [x["user_id"] for x in r.json()] == [ids["Kuznetsov"], ids["Kuzmin"]]
+
+    assert client.get("/api/manager/clients/search", params={"q": ""}).status_code == 422
+
+
+@pytest.mark.api
+def test_manager_principal_cached_until_dismissed(client, session, monkeypatch):
+    import routes.ui_api as ui_api
+    from services.crud.manager import dismiss_manager
+
+    mu = create_user(
+        login="mgr_principal",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+
+    lookups = []
+    real_lookup = ui_api.get_manager_role_async
+
+    async def _counting_lookup(user_id, session):
+        lookups.append(user_id)
+        return await real_lookup(user_id, session=session)
+
+    monkeypatch.setattr(ui_api, "get_manager_role_async", _counting_lookup)
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+    for _ in range(3):
+        assert client.get("/api/manager/clients/summary").status_code == 200
+    assert lookups == [mu.id]
+
+    dismiss_manager(manager, session=session)
+    # The session cookie still says "manager", the principal must be re-checked.
+    assert client.get("/api/manager/clients/summary").status_code == 403
+    assert lookups == [mu.id, mu.id]
+
+
+@pytest.mark.api
+def test_manager_clients_page_risk_filters(client, session):
+    from services.crud.credit import assign_credit
+
+    mu = create_user(
+        login="mgr_risk",
+        password="Pass12345",
+        first_name="M",
+        last_name="G",
+        role=UserRole.MANAGER,
+        session=session,
+        is_test=True,
+    )
+    manager = create_manager(user=mu, session=session)
+    histories = {
+        "clean": [{"months_ago": m, "status": "C"} for m in range(24)],
+        "old_late": [{"months_ago": 20, "status": "3"}, {"months_ago": 0, "status": "C"}],
+        "recent_late": [{"months_ago": 2, "status": "1"}, {"months_ago": 3, "status": "0"}],
+    }
+    ids = {}
+    for i, (name, history) in enumerate(histories.items()):
+        cu = create_user(
+            login=f"cli_risk_{i}",
+            password="Pass12345",
+            first_name="C",
+            last_name=name,
+            role=UserRole.CLIENT,
+            session=session,
+            is_test=True,
+        )
+        c = create_client(user=cu, session=session, manager=manager)
+        assign_credit(client=c, amount_total=1000.0, annual_rate=0.16, payment_history=history, session=session)
+        ids[name] = c.user_id
+
+    r = client.post("/auth/login", json={"login": mu.login, "password": "Pass12345"})
+    assert r.status_code == 200
+
+    def _page(**params):
+        r = client.get("/api/manager/clients/page", params=params)
+        assert r.status_code == 200
+        return [x["user_id"] for x in r.json()["items"]]
+
+    assert _page(delinquency_min=1) == [ids["recent_late"]]
+    assert _page(overdue_months_min=1) == [ids["old_late"], ids["recent_late"]]
+    assert _page(late_within_months=12) == [ids["recent_late"]]
+    assert client.get("/api/manager/clients/page", params={"delinquency_min": 7}).status_code == 422
+
+    client.post("/auth/logout")
+    r = client.post("/auth/login", json={"login": "cli_risk_2", "password": "Pass12345"})
+    assert r.status_code == 200
+    body = client.get("/api/client/credit").json()
+    assert body["payment_history"][0] == {"months_ago": 2, "status": "1"}
+    assert (body["worst_delinquency_12m"], body["overdue_months"], body["months_since_last_late"]) == (2, 2, 2)